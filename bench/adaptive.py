@@ -0,0 +1,67 @@
+# bench/adaptive.py
+# Запуск: python -m bench.adaptive
+# Адаптивный режим: выбор следующего задания по навыку из пулов разного
+# размера и стоимость фонового применения пачки ответов.
+
+import asyncio
+import random
+import time
+
+from bot.adaptive import BUCKET, Ratings, expected
+from bot.state import UserState
+from bot.taskbank import BANKS, TaskBank
+
+N = 50_000
+
+
+def make_bank(n: int) -> TaskBank:
+    base = BANKS.current.level("B").tasks
+    pool = [
+        {"id": f"x{i}", "text": t.text, "options": list(t.options), "answer": t.answer}
+        for i, t in ((i, base[i % len(base)]) for i in range(n))
+    ]
+    return TaskBank({"B": pool}, default="B", version=f"bench{n}")
+
+
+def spread(ratings: Ratings, bank: TaskBank, rnd: random.Random) -> None:
+    # рейтинги как после долгой работы: разброс ±600 вокруг уровня
+    for t in bank.levels["B"].tasks:
+        ratings.ratings[t.id] = 1500 + rnd.uniform(-600, 600)
+    ratings.indices.clear()
+
+
+async def bench(n: int) -> None:
+    rnd = random.Random(1)
+    ratings = Ratings()
+    bank = make_bank(n)
+    spread(ratings, bank, rnd)
+    index = ratings.index(bank)
+
+    st = UserState(skill=1500.0, recent=[])
+    t0 = time.perf_counter()
+    for k in range(N):
+        if k % 10 == 0:
+            st.recent = []
+        i = index.pick(st.skill, st.recent, rnd)
+        st.recent.append(i)
+        ratings.observe(st, index.tasks[i].id, index.ratings[i], rnd.random() < 0.7)
+    per = (time.perf_counter() - t0) / N
+
+    # ответ попал в корзину рядом с целью?
+    hit = sum(abs(expected(1500.0, index.ratings[index.pick(1500.0, (), rnd)]) - 0.7) < 0.1
+              for _ in range(1000)) / 1000
+
+    t0 = time.perf_counter()
+    applied = await ratings.flush()
+    flush = time.perf_counter() - t0
+    print(f"pool {n:>7}: {per * 1e6:6.2f} µs/pick+observe | {len(index.keys)} buckets of {BUCKET:.0f} "
+          f"| {hit:.0%} near target | flush {applied} answers in {flush * 1e3:.1f} ms")
+
+
+async def main():
+    for n in (100, 10_000, 200_000):
+        await bench(n)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+# bench/campaigns.py
+# Запуск: python -m bench.campaigns
+# Рассылка по 20k пользователей из user_index: каждый десятый заблокировал
+# бота. Процесс «падает» посреди рассылки и продолжает с контрольной точки.
+# Проверяем: повторов не больше одной страницы, заблокированные помечены,
+# память не растёт с числом получателей.
+
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from bot.campaigns import CampaignRunner, CampaignStore
+from bot.state import SqliteStateStore
+
+from .fake_api import FakeSession, make_fake_bot
+
+USERS, PAGE = 20_000, 500
+BOT_ID = 8222973157
+
+
+class BlockingSession(FakeSession):
+    def __init__(self):
+        super().__init__()
+        self.delivered: Counter = Counter()
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, SendMessage):
+            if int(method.chat_id) % 10 == 0:
+                raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+            self.delivered[int(method.chat_id)] += 1
+        return await super().make_request(bot, method, timeout)
+
+
+async def seed_users(path: str) -> None:
+    store = SqliteStateStore(path)
+    for chat in range(1, USERS + 1):
+        st = store.get(BOT_ID, chat)
+        st.level, st.idx, st.total = "HARD", 11, 10  # дошли до итога
+        store.mark_dirty(BOT_ID, chat)
+    await store.flush()
+    store._db.close()
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        await seed_users(path)
+        store = CampaignStore(path)
+        store.create(BOT_ID, "done", "Новые задания HARD уже здесь!", level="HARD")
+
+        bot = make_fake_bot()
+        bot.session = session = BlockingSession()
+        runner = CampaignRunner(store, bot, workers=16, page=PAGE)
+
+        # первый запуск «падает» примерно на середине
+        t0 = time.perf_counter()
+        task = asyncio.ensure_future(runner.run(store.claim(BOT_ID)))
+        while sum(session.delivered.values()) < USERS * 0.45:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        before = store.list()[0]
+
+        tracemalloc.start()
+        await runner.run(store.claim(BOT_ID))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        total = time.perf_counter() - t0
+
+        c = store.list()[0]
+        dup = sum(n - 1 for n in session.delivered.values() if n > 1)
+        missing = sum(1 for chat in range(1, USERS + 1)
+                      if chat % 10 and session.delivered[chat] == 0)
+        blocked = store._db.execute("SELECT COUNT(*) FROM user_index WHERE blocked = 1").fetchone()[0]
+        print(f"resumed at cursor {before.cursor} | status {c.status} | sent {c.sent}"
+              f" | pruned {c.pruned} (blocked in index: {blocked})")
+        print(f"duplicates {dup} (≤ {PAGE}) | missing {missing}"
+              f" | {c.sent / total:,.0f} msg/s | peak memory on resume {peak / 1024:.0f} KiB")
+        store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
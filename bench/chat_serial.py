@@ -0,0 +1,99 @@
+# bench/chat_serial.py
+# Запуск: python -m bench.chat_serial
+# Стресс гонок: на каждый вопрос приходят два тапа одновременно с разных
+# сообщений (двойная клавиатура, повторная доставка). Без последовательной
+# обработки чата оба читают один st.idx — вопрос засчитывается дважды, а
+# следующий пропускается. Разные чаты при этом должны идти параллельно:
+# при задержке API 5 мс пропускная способность растёт с числом чатов.
+
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+
+from aiogram.types import Update
+
+from bot import bot as app
+
+from .fake_api import make_fake_bot
+
+logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+USERS, ANSWERS, LATENCY = 300, 10, 0.005
+
+
+class Recorder:
+    """Вместо журнала ответов: какие задания засчитаны каждому пользователю."""
+
+    def __init__(self):
+        self.tasks = defaultdict(list)
+
+    def append(self, bot_id, user_id, level, task_id, *rest):
+        self.tasks[user_id].append(task_id)
+
+
+def _start(uid: int, n: int):
+    return {"update_id": n, "message": {
+        "message_id": 1, "date": 0, "chat": {"id": uid, "type": "private"},
+        "from": {"id": uid, "is_bot": False, "first_name": "u"}, "text": "/start",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    }}
+
+
+def _tap(uid: int, n: int, message_id: int, pos: int, bot_id: int):
+    return {"update_id": n, "callback_query": {
+        "id": str(n), "from": {"id": uid, "is_bot": False, "first_name": "u"},
+        "chat_instance": str(uid), "data": f"ans:0:{pos}",
+        "message": {"message_id": message_id, "date": 0, "chat": {"id": uid, "type": "private"},
+                    "from": {"id": bot_id, "is_bot": True, "first_name": "bench"}, "text": "q"},
+    }}
+
+
+async def run(serial: bool):
+    os.environ["CHAT_SERIAL"] = "1" if serial else "0"
+    app.HANDLED.clear()
+    app.THROTTLE.clear()
+    app.EVENTS = rec = Recorder()
+    bot = make_fake_bot(latency=LATENCY)
+    dp = app.build_dispatcher()
+    await dp["identity"].resolve(bot)
+    feed = lambda data: dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+    uids = [50_000 + u for u in range(USERS)]
+    await asyncio.gather(*(feed(_start(uid, uid)) for uid in uids))
+
+    async def user(uid: int):
+        for step in range(1, ANSWERS + 1):
+            # два тапа по текущему вопросу с двух разных сообщений — одновременно
+            await asyncio.gather(
+                feed(_tap(uid, uid * 100 + step * 2, 10 + step * 2, step, bot.id)),
+                feed(_tap(uid, uid * 100 + step * 2 + 1, 11 + step * 2, step, bot.id)),
+            )
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user(uid) for uid in uids))
+    total = time.perf_counter() - t0
+
+    # верно — ровно по одному зачёту на каждое задание теста, без пропусков
+    broken = 0
+    for uid in uids:
+        st = app.STATE.get(bot.id, uid)
+        level = app.get_tasks_by_level(st.level, st.bank)
+        base = st.stream_base()
+        expected = [level.draw(st.seed, base + g).task.id for g in range(ANSWERS)]
+        if rec.tasks[uid] != expected:
+            broken += 1
+    return USERS * ANSWERS * 2 / total, broken
+
+
+async def main():
+    for serial in (False, True):
+        rate, broken = await run(serial)
+        name = "per-chat" if serial else "no lock"
+        print(f"{name:8} {rate:>8,.0f} upd/s | sessions with double-counted/skipped tasks: {broken}/{USERS}")
+    # каждый апдейт делает хотя бы один вызов API — общий замок дал бы не больше 1/LATENCY
+    print(f"global lock would cap at {1 / LATENCY:,.0f} upd/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
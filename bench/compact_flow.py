@@ -0,0 +1,43 @@
+# bench/compact_flow.py
+# Запуск: python -m bench.compact_flow
+# Исходящие вызовы Bot API на ответ: classic vs compact (flow в реестре ботов)
+
+import asyncio
+
+from aiogram.types import Update
+
+from bot import bot as app
+from bot.apicalls import calls_for
+from bot.registry import BotConfig
+
+from .fake_api import BENCH_TOKEN, make_fake_bot, make_updates
+
+USERS, ANSWERS = 200, 10
+
+
+async def run(flow: str):
+    bot = make_fake_bot()
+    app.TENANTS.put(BotConfig(BENCH_TOKEN, flow=flow))
+    app.HANDLED.clear()
+    app.THROTTLE.clear()
+    dp = app.build_dispatcher()
+    on_start = on_answer = 0
+    for data in make_updates(USERS, ANSWERS, bot.id, compact=(flow == "compact")):
+        before = calls_for(bot.id)
+        await dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+        spent = calls_for(bot.id) - before
+        if "callback_query" in data:
+            on_answer += spent
+        else:
+            on_start += spent
+    return on_start / USERS, on_answer / (USERS * ANSWERS)
+
+
+async def main():
+    for flow in ("classic", "compact"):
+        per_start, per_answer = await run(flow)
+        print(f"{flow:8} /start: {per_start:.2f} calls | answer: {per_answer:.2f} calls")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
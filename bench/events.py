@@ -0,0 +1,47 @@
+# bench/events.py
+# Запуск: python -m bench.events [строк]
+# Цена EventLog.append в хендлере и скорость агрегации CLI по миллионам строк
+
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from bot.events import EventLog
+from bot.taskbank import BANKS
+
+
+async def fill(path: str, rows: int) -> None:
+    log = EventLog(path, flush_interval=0.2)
+    await log.start()
+    rnd = random.Random(3)
+    tasks = [(lv, t) for lv, bank in BANKS.current.levels.items() for t in bank.tasks]
+    t0 = time.perf_counter()
+    worst = 0.0
+    for i in range(rows):
+        level, task = tasks[rnd.randrange(len(tasks))]
+        a = time.perf_counter()
+        log.append(8222973157, rnd.randrange(100_000), level, task.id,
+                   rnd.randrange(3), rnd.random() < 0.7, rnd.random() * 20)
+        worst = max(worst, time.perf_counter() - a)
+        if i % 1000 == 0:
+            await asyncio.sleep(0)
+    took = time.perf_counter() - t0
+    await log.close()
+    print(f"append: {took / rows * 1e6:.2f} µs/row avg, worst {worst * 1e6:.0f} µs | "
+          f"file {os.path.getsize(path) / rows:.1f} B/row")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "events.bin")
+        asyncio.run(fill(path, rows))
+        subprocess.run([sys.executable, "-m", "bot.events", "stats", path, "--top", "5"], check=True)
+
+
+if __name__ == "__main__":
+    main()
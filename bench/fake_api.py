@@ -0,0 +1,181 @@
+# bench/fake_api.py
+# Локальная замена Bot API: сессия без сети, фейковый HTTP-сервер
+# и генератор синтетических апдейтов
+
+import asyncio
+import collections
+import itertools
+import os
+import random
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, SendMessage
+from aiogram.types import Chat, Message, User
+
+from bot.outbound import TokenBucket
+
+# Бенчмарки хендлеров меряют сам конвейер, без троттлинга исходящих
+os.environ.setdefault("OUTBOUND_LIMITS", "0")
+
+BENCH_TOKEN = "8222973157:AAbenchbenchbenchbenchbenchbenchbench"
+
+
+class FakeSession(BaseSession):
+    """Отвечает на любой метод без сети и считает вызовы по типу."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._msg_ids = itertools.count(1_000_000)
+
+    async def make_request(self, bot: Bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, GetMe):
+            return User(id=bot.id, is_bot=True, first_name="bench", username="bench_bot")
+        if isinstance(method, SendMessage):
+            return Message(
+                message_id=next(self._msg_ids),
+                date=int(time.time()),
+                chat=Chat(id=int(method.chat_id), type="private"),
+                text=method.text,
+            ).as_(bot)
+        return True
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *a, **kw):  # pragma: no cover
+        raise NotImplementedError
+        yield b""
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+def make_fake_bot(token: str = BENCH_TOKEN, latency: float = 0.0) -> Bot:
+    from bot.bot import make_bot
+    return make_bot(token, session=FakeSession(latency))
+
+
+class FakeTelegram:
+    """Фейковый Bot API по HTTP. limits=True — лимиты Telegram (30 msg/s на бота,
+    1 msg/s на чат со всплеском до 3) и 2% случайных 429."""
+
+    def __init__(self, limits: bool = False):
+        self.limits = limits
+        self.sent = 0
+        self.rejected = 0
+        self.rnd = random.Random(7)
+        self.global_bucket = TokenBucket(30, 30)
+        self.chats = collections.defaultdict(lambda: TokenBucket(1, 3))
+
+    @staticmethod
+    def _take(bucket: TokenBucket, now: float) -> bool:
+        # небольшой допуск на дрожание часов между клиентом и сервером
+        if bucket.reserve(now) > 0.05:
+            bucket.tokens += 1
+            return False
+        return True
+
+    async def handle(self, request: web.Request):
+        method = request.match_info["method"]
+        data = await request.post()
+        now = time.monotonic()
+        if method == "getMe":
+            bot_id = int(request.match_info["token"].split(":")[0])
+            return web.json_response({"ok": True, "result": {
+                "id": bot_id, "is_bot": True, "first_name": "bench", "username": "bench_bot"}})
+        if method != "sendMessage":
+            return web.json_response({"ok": True, "result": True})
+        chat = int(data.get("chat_id", 0))
+        ok = True
+        if self.limits:
+            ok = self._take(self.chats[chat], now)
+            if ok and not self._take(self.global_bucket, now):
+                self.chats[chat].tokens += 1
+                ok = False
+        if not ok or (self.limits and self.rnd.random() < 0.02):
+            self.rejected += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+        self.sent += 1
+        return web.json_response({"ok": True, "result": {
+            "message_id": self.sent, "date": int(time.time()),
+            "chat": {"id": chat, "type": "private"}, "text": data.get("text", ""),
+        }})
+
+
+async def start_fake_server(fake: FakeTelegram, port: int = 0,
+                            reuse_port: bool = False) -> Tuple[web.AppRunner, int]:
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", fake.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port, reuse_port=reuse_port)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+def serve_fake_api(port: int) -> None:
+    """Цель для отдельного процесса: несколько таких делят порт (SO_REUSEPORT)."""
+    async def _run():
+        await start_fake_server(FakeTelegram(), port, reuse_port=True)
+        await asyncio.Event().wait()
+    asyncio.run(_run())
+
+
+def _user(uid: int) -> Dict:
+    return {"id": uid, "is_bot": False, "first_name": f"u{uid}", "language_code": "ru"}
+
+
+def make_updates(users: int = 100, answers: int = 10, bot_id: int = 8222973157,
+                 dup_every: int = 0, compact: bool = False) -> Iterator[Dict]:
+    """По каждому пользователю: /start, затем answers ответов на вопросы.
+    Пользователи чередуются, как в живом трафике. dup_every>0 — повтор тапа.
+    compact=True — все ответы приходят с одного сообщения, как в compact-режиме."""
+    uid_base = 10_000
+    update_ids = itertools.count(1)
+    msg_ids: Dict[int, int] = {}
+    for step in range(answers + 1):
+        for u in range(users):
+            uid = uid_base + u
+            chat = {"id": uid, "type": "private"}
+            if step == 0:
+                msg_ids[uid] = 1
+                yield {"update_id": next(update_ids), "message": {
+                    "message_id": 1, "date": 0, "chat": chat, "from": _user(uid),
+                    "text": "/start",
+                    "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+                }}
+                continue
+            if not compact:
+                msg_ids[uid] += 2
+            upd = {"update_id": next(update_ids), "callback_query": {
+                "id": str(uid * 1000 + step), "from": _user(uid), "chat_instance": str(uid),
+                "data": f"ans:{step % 3}:{step}" if compact else f"ans:{step % 3}",
+                "message": {"message_id": msg_ids[uid], "date": 0, "chat": chat,
+                            "from": {"id": bot_id, "is_bot": True, "first_name": "bench"},
+                            "text": "q"},
+            }}
+            yield upd
+            if dup_every and step % dup_every == 0:
+                dup = dict(upd, update_id=next(update_ids))
+                yield dup
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(q * len(s)))]
@@ -0,0 +1,173 @@
+# bench/i18n.py
+# Запуск: python -m bench.i18n
+# Тексты интерфейса: прежние русские литералы (f-строки, списки строк и
+# клавиатуры, собираемые на каждый вызов — копии из bot/bot.py до каталогов)
+# против каталогов, собранных при старте (bot/i18n.py), для каждого языка.
+#   text   — только тексты ответа: вердикт + «Задание i/N» с текстом задания;
+#   answer — вердикт + следующий вопрос + его клавиатура (горячий путь on_answer);
+#   quiz   — интро, 10 ответов, итог с промахами и клавиатура под ним;
+#   kb     — клавиатуры выбора уровня и под итогом.
+
+import time
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot import bot as app
+from bot.i18n import TEXTS
+from bot.state import UserState
+from bot.taskbank import BANKS, Question
+
+N = 50_000
+QUIZ = 10
+
+
+# ---------- как было ----------
+def old_intro(levels_line: str, total: int = 10) -> str:
+    return (
+        "Готов проверить себя на различение?\n\n"
+        f"• {total} заданий · 2 минуты\n"
+        "• Сразу разбор и советы\n\n"
+        "Сменить уровень — кнопкой <b>«Сменить уровень»</b> или "
+        f"командами: {levels_line}\n\n"
+        "Начинаем! 🧠"
+    )
+
+
+def old_question(pos: int, total: int, q: Question) -> str:
+    return f"Задание {pos}/{total}:\n{q.task.text}"
+
+
+def old_picker(allowed: set) -> InlineKeyboardMarkup:
+    rows = []
+    if "A" in allowed:
+        rows.append([InlineKeyboardButton(text="Уровень A", callback_data="setlvl:A")])
+    if "B" in allowed:
+        rows.append([InlineKeyboardButton(text="Уровень B", callback_data="setlvl:B")])
+    if "HARD" in allowed:
+        rows.append([InlineKeyboardButton(text="Уровень HARD", callback_data="setlvl:HARD")])
+    if "ADAPT" in allowed:
+        rows.append([InlineKeyboardButton(text="Адаптивный", callback_data="setlvl:ADAPT")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def old_restart_kb() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="Пройти ещё раз", callback_data="again")],
+        [InlineKeyboardButton(text="Рейтинг", callback_data="top")],
+        [InlineKeyboardButton(text="Сменить уровень", callback_data="levelpick")],
+        [InlineKeyboardButton(text="Поделиться", callback_data="share")],
+    ])
+
+
+def old_summary(state: UserState, level: str, labels) -> str:
+    lines = [f"Готово! Итог: <b>{state.score}/{state.total}</b>\n"]
+    misses = state.misses
+    if misses and any(misses):
+        lines.append("<b>Где чаще промахи:</b>")
+        for i in sorted((i for i, n in enumerate(misses) if n and i < len(labels)),
+                        key=lambda i: -misses[i]):
+            lines.append(f"• {labels[i]} — {misses[i]}×")
+        lines.append("")
+        lines.append("<b>Советы:</b>")
+        lines.append("• Замедляйся на причинности и выборках.")
+        lines.append("• Ищи альтернативные объяснения и отсутствующие данные.")
+        lines.append("• Проси метод/доказательства, а не статус/популярность.")
+    else:
+        lines.append("Хорошее различение! Иногда можно ловиться на тонкие манипуляции — продолжай тренироваться.")
+    lines.append(f"\nУровень сейчас: <b>{level}</b>")
+    return "\n".join(lines)
+
+
+# ---------- сценарии ----------
+LEVELS_LINE = "<code>/level A</code>, <code>/level B</code>, <code>/level HARD</code>."
+ALLOWED = {"A", "B", "HARD", "ADAPT"}
+
+
+def _state() -> UserState:
+    bank = BANKS.current
+    st = UserState(level="B", idx=QUIZ, score=7, total=QUIZ, seed=12345, bank=bank.version)
+    for label in (0, 3, 3, 5):
+        st.add_miss(label, len(bank.labels))
+    return st
+
+
+def old_answer(st: UserState, i: int):
+    q = BANKS.current.level("B").draw(st.seed, i)
+    verdict = q.task.verdict_right if q.task.is_right(1) else q.task.verdict_wrong
+    return verdict, old_question(i % QUIZ + 1, QUIZ, q), q.keyboard(i % QUIZ + 1)
+
+
+def new_answer(st: UserState, i: int, tr):
+    q = BANKS.current.level("B").draw(st.seed, i, tr.code)
+    verdict = app.render_verdict(q.task.is_right(1), q.task)
+    st.idx = i % QUIZ + 1
+    return verdict, app.render_question(st, q, tr), q.keyboard(st.idx)
+
+
+def text_rows(st: UserState):
+    # вопросы вытянуты заранее: меряется только сборка текста
+    level = BANKS.current.level("B")
+    drawn = {code: [level.draw(st.seed, i, code) for i in range(QUIZ)] for code in ("", *TEXTS)}
+
+    def old(i: int):
+        q = drawn[""][i % QUIZ]
+        verdict = q.task.verdict_right if q.task.is_right(1) else q.task.verdict_wrong
+        return verdict, old_question(i % QUIZ + 1, QUIZ, q)
+
+    def new(tr):
+        qs = drawn[tr.code]
+
+        def one(i: int):
+            q = qs[i % QUIZ]
+            st.idx = i % QUIZ + 1
+            return app.render_verdict(q.task.is_right(1), q.task), app.render_question(st, q, tr)
+        return one
+
+    return old, new
+
+
+def old_quiz(st: UserState, i: int):
+    out = [old_intro(LEVELS_LINE, QUIZ)]
+    for k in range(QUIZ):
+        out.append(old_answer(st, i * QUIZ + k))
+    out.append(old_summary(st, "B", BANKS.current.labels))
+    out.append(old_restart_kb())
+    return out
+
+
+def new_quiz(st: UserState, i: int, tr):
+    out = [app.render_intro(tr, QUIZ)]
+    for k in range(QUIZ):
+        out.append(new_answer(st, i * QUIZ + k, tr))
+    out.append(app.render_summary(st, "B", BANKS.current.labels_for(tr.code), tr))
+    out.append(app.restart_kb(tr))
+    return out
+
+
+def per_call(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main():
+    st = _state()
+    rows = [("text", N, *text_rows(st)),
+            ("answer", N, lambda i: old_answer(st, i), lambda tr: lambda i: new_answer(st, i, tr)),
+            ("quiz", N // QUIZ, lambda i: old_quiz(st, i), lambda tr: lambda i: new_quiz(st, i, tr)),
+            ("kb", N, lambda i: (old_picker(ALLOWED), old_restart_kb()),
+             lambda tr: lambda i: (app.level_picker_kb(tr, ALLOWED), app.restart_kb(tr)))]
+    for name, n, old, new in rows:
+        for fn in (old, *(new(tr) for tr in TEXTS.values())):
+            fn(0)  # прогрев: lru/мемо-словари, как после первых апдейтов
+        inline = per_call(old, n)
+        line = f"{name:6} inline {inline:8.2f} µs"
+        for code, tr in TEXTS.items():
+            us = per_call(new(tr), n)
+            line += f" | {code} {us:8.2f} µs (x{inline / us:.1f})"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
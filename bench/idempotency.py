@@ -0,0 +1,31 @@
+# bench/idempotency.py
+# Запуск: python -m bench.idempotency
+# Поток синтетических callback'ов: память SeenCache должна выйти на плато
+
+import random
+import tracemalloc
+
+from bot.idempotency import SeenCache
+
+
+def main(total: int = 2_000_000, step: int = 250_000):
+    now = [0.0]
+    cache = SeenCache(ttl=600.0, max_size=100_000, clock=lambda: now[0])
+    rnd = random.Random(1)
+    tracemalloc.start()
+    msg_id = 0
+    for i in range(1, total + 1):
+        now[0] += 0.001  # ~1000 callback/сек
+        msg_id += 1
+        user = rnd.randrange(50_000)
+        cache.check_and_add(8222973157, user, msg_id)
+        if rnd.random() < 0.05:  # дубль-тап
+            cache.check_and_add(8222973157, user, msg_id)
+        if i % step == 0:
+            cur, _ = tracemalloc.get_traced_memory()
+            print(f"{i:>9} updates | {cur / 1024 / 1024:7.2f} MiB | {cache.stats()}")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
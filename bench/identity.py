@@ -0,0 +1,64 @@
+# bench/identity.py
+# Запуск: python -m bench.identity
+# Было: каждый хендлер делал await bot.me() (on_start/on_set_level — дважды).
+# Стало: IdentityMiddleware кладёт готовую BotIdentity в data["me"].
+
+import asyncio
+import logging
+import time
+
+from aiogram.types import Update
+
+from bot import bot as app
+
+from .fake_api import make_fake_bot, make_updates, percentile
+
+N = 200_000
+
+
+async def micro(bot):
+    ident = app.build_dispatcher()["identity"]
+    await ident.resolve(bot)
+    data = {"bot": bot}
+
+    async def handler_old(event, data):
+        bot_id = (await bot.me()).id
+        username = (await bot.me()).username
+        return app.policy_for(bot_id).get("default", "A"), username
+
+    async def handler_new(event, data):
+        me = data["me"]
+        return me.policy.get("default", "A"), me.username
+
+    t0 = time.perf_counter()
+    for _ in range(N):
+        await handler_old(None, data)
+    old = (time.perf_counter() - t0) / N
+    t0 = time.perf_counter()
+    for _ in range(N):
+        await ident(handler_new, None, data)
+    new = (time.perf_counter() - t0) / N
+    print(f"per update: 2x await bot.me() {old * 1e6:.2f} µs | IdentityMiddleware {new * 1e6:.2f} µs")
+
+
+async def replay(bot):
+    dp = app.build_dispatcher()
+    lat = []
+    for data in make_updates(200, 10, bot.id):
+        upd = Update.model_validate(data, context={"bot": bot})
+        t = time.perf_counter()
+        await dp.feed_update(bot, upd)
+        if upd.callback_query:
+            lat.append(time.perf_counter() - t)
+    print(f"callback latency: p50 {percentile(lat, .5) * 1e3:.3f} ms | p99 {percentile(lat, .99) * 1e3:.3f} ms")
+
+
+async def main():
+    logging.disable(logging.INFO)
+    bot = make_fake_bot()
+    await micro(bot)
+    await replay(bot)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+# bench/leaderboard.py
+# Запуск: python -m bench.leaderboard
+# Обновление очков и запрос места: дерево Фенвика против пересортировки
+# всех пользователей; загрузка таблиц из LEADERBOARD_DB после рестарта.
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from bot.leaderboard import Board, Leaderboards
+
+ROUNDS = 2_000
+
+
+def naive_rank(values, user_id):
+    order = sorted(values.values(), reverse=True)
+    return order.index(values[user_id]) + 1
+
+
+def bench(n: int) -> None:
+    rnd = random.Random(n)
+    board = Board()
+    for uid in range(n):
+        board.set(uid, rnd.randrange(0, 2_000))
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        uid = rnd.randrange(n)
+        board.add(uid, rnd.randrange(11))
+        board.rank(uid)
+    fast = (time.perf_counter() - t0) / ROUNDS
+    t0 = time.perf_counter()
+    k = max(1, ROUNDS // 100)
+    for _ in range(k):
+        naive_rank(board.values, rnd.randrange(n))
+    slow = (time.perf_counter() - t0) / k
+    board.top(10)  # прогрев
+    t0 = time.perf_counter()
+    board.top(10)
+    top = time.perf_counter() - t0
+    print(f"{n:>9} users: update+rank {fast * 1e6:6.1f} µs | re-sort {slow * 1e3:8.2f} ms"
+          f" | top-10 {top * 1e6:6.1f} µs")
+
+
+async def restart(n: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lb.db")
+        lb = Leaderboards(path)
+        for uid in range(n):
+            lb.record(1, uid, "B", uid % 11, name=f"u{uid}")
+        await lb.flush()
+        rank = lb.board(1, "B").rank(7)
+        await lb.close()
+        t0 = time.perf_counter()
+        again = Leaderboards(path)
+        load = time.perf_counter() - t0
+        assert again.board(1, "B").rank(7) == rank
+        print(f"restart: {n} users reloaded in {load * 1e3:.0f} ms, ranks match")
+        await again.close()
+
+
+def main():
+    for n in (1_000, 100_000, 1_000_000):
+        bench(n)
+    asyncio.run(restart(100_000))
+
+
+if __name__ == "__main__":
+    main()
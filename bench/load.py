@@ -0,0 +1,179 @@
+# bench/load.py
+# Запуск: python -m bench.load [--users 1000] [--answers 10] [--save] [--check]
+# Нагрузочный прогон конвейера хендлеров: синтетические апдейты идут через
+# настоящий Dispatcher из bot.bot, Bot API подменён FakeSession.
+#   sequential — апдейты по одному, пользователи чередуются
+#   concurrent — до --concurrency сессий одновременно (asyncio.gather);
+#                задержка здесь включает ожидание в общем цикле событий
+#   duplicates — каждый второй тап повторён (проверка идемпотентности)
+#   limited    — как sequential, но с планировщиком исходящих (bot/outbound.py):
+#                лимиты на чат как в бою, глобальный — снят (его меряет
+#                bench.outbound); ответы на тапы не должны ждать бакет чата
+# Итог сравнивается с bench/baselines/load.json; --save перезаписывает его,
+# --check завершает с кодом 1 при регрессии.
+
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from aiogram.types import Update
+
+from bot import bot as app
+
+from .fake_api import make_fake_bot, make_updates, percentile
+
+# строка INFO на каждый апдейт от aiogram мерила бы логирование, а не хендлеры
+logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "load.json")
+
+# Допуски регрессии относительно базовой линии
+TOLERANCE = {"upd_per_s": -0.25, "p50_ms": 0.5, "p99_ms": 1.0, "calls_per_upd": 0.01, "rss_mb": 0.5}
+# RSS растёт аренами аллокатора, а не байтами: от прогона к прогону (и от
+# состояния __pycache__) ±1 МБ при той же куче Python — сверх доли ещё столько
+RSS_SLACK_MB = 2.0
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _feed(dp, bot, data, lat: List[float]) -> None:
+    t = time.perf_counter()
+    await dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+    lat.append(time.perf_counter() - t)
+
+
+def _limited_bot():
+    env = {"OUTBOUND_LIMITS": "1", "OUTBOUND_GLOBAL_RATE": "1e9"}
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        return make_fake_bot()
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+async def run(scenario: str, users: int, answers: int, concurrency: int = 50) -> Dict[str, float]:
+    app.HANDLED.clear()
+    app.THROTTLE.clear()
+    bot = _limited_bot() if scenario == "limited" else make_fake_bot()
+    app.OUTBOUND.pop(bot.id, None)
+    dp = app.build_dispatcher()
+    await dp["identity"].resolve(bot)
+    raw = list(make_updates(users, answers, bot.id, dup_every=2 if scenario == "duplicates" else 0))
+    calls0 = bot.session.total()
+    gc.collect()
+    rss0 = rss_mb()
+    lat: List[float] = []
+    t0 = time.perf_counter()
+    if scenario == "concurrent":
+        per_chat: Dict[int, List[dict]] = defaultdict(list)
+        for data in raw:
+            body = data.get("message") or data["callback_query"]["message"]
+            per_chat[body["chat"]["id"]].append(data)
+
+        gate = asyncio.Semaphore(concurrency)
+
+        async def session(items):
+            async with gate:
+                for data in items:
+                    await _feed(dp, bot, data, lat)
+
+        await asyncio.gather(*(session(v) for v in per_chat.values()))
+    else:
+        for data in raw:
+            await _feed(dp, bot, data, lat)
+    total = time.perf_counter() - t0
+    gc.collect()
+    return {
+        "upd_per_s": len(lat) / total,
+        "p50_ms": percentile(lat, .5) * 1e3,
+        "p99_ms": percentile(lat, .99) * 1e3,
+        "calls_per_upd": (bot.session.total() - calls0) / len(lat),
+        "rss_mb": max(0.0, rss_mb() - rss0),
+    }
+
+
+def regressions(name: str, now: Dict[str, float], base: Dict[str, float]) -> List[str]:
+    out = []
+    for key, tol in TOLERANCE.items():
+        if key not in base:
+            continue
+        b, v = base[key], now[key]
+        if tol < 0:
+            bad = v < b * (1 + tol)
+        else:
+            bad = v > b * (1 + tol) + (RSS_SLACK_MB if key == "rss_mb" else 0.0)
+        if bad:
+            out.append(f"{name}.{key}: {v:.3f} vs baseline {b:.3f}")
+    return out
+
+
+def fmt(name: str, r: Dict[str, float]) -> str:
+    return (f"{name:11} {r['upd_per_s']:>9,.0f} upd/s | p50 {r['p50_ms']:6.3f} ms"
+            f" | p99 {r['p99_ms']:6.3f} ms | {r['calls_per_upd']:.2f} calls/upd"
+            f" | RSS +{r['rss_mb']:.1f} MB")
+
+
+async def main(argv=None) -> int:
+    p = argparse.ArgumentParser(prog="python -m bench.load")
+    p.add_argument("--users", type=int, default=1000)
+    p.add_argument("--answers", type=int, default=10)
+    p.add_argument("--concurrency", type=int, default=50)
+    p.add_argument("--save", action="store_true", help="записать результат как базовую линию")
+    p.add_argument("--check", action="store_true", help="код 1 при регрессии")
+    args = p.parse_args(argv)
+
+    results = {}
+    for scenario in ("sequential", "concurrent", "duplicates", "limited"):
+        results[scenario] = r = await run(scenario, args.users, args.answers, args.concurrency)
+        print(fmt(scenario, r))
+
+    if args.save:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump({"users": args.users, "answers": args.answers, "concurrency": args.concurrency,
+                       "results": {k: {m: round(v, 4) for m, v in r.items()} for k, r in results.items()}},
+                      f, indent=2)
+            f.write("\n")
+        print(f"baseline saved: {BASELINE}")
+        return 0
+
+    try:
+        with open(BASELINE, encoding="utf-8") as f:
+            base = json.load(f)
+    except FileNotFoundError:
+        print("no baseline yet (--save to create)")
+        return 0
+    if (base.get("users"), base.get("answers"), base.get("concurrency")) != (
+            args.users, args.answers, args.concurrency):
+        print("baseline was recorded with other --users/--answers/--concurrency, not compared")
+        return 0
+    bad = [line for name, r in results.items()
+           for line in regressions(name, r, base["results"].get(name, {}))]
+    for line in bad:
+        print("REGRESSION", line)
+    if not bad:
+        print("no regressions against baseline")
+    return 1 if bad and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
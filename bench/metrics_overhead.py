@@ -0,0 +1,59 @@
+# bench/metrics_overhead.py
+# Запуск: python -m bench.metrics_overhead
+# Цена HandlerMetrics на апдейт (микробенчмарк) + пример выдачи /metrics после прогона
+
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+
+from aiogram.types import Update
+
+from bot import bot as app
+from bot.metrics import REGISTRY, HandlerMetrics
+
+from .fake_api import make_fake_bot, make_updates
+
+N = 200_000
+
+
+async def _noop(event, data):
+    return None
+
+
+def bench_handler():
+    pass
+
+
+async def micro():
+    mw = HandlerMetrics()
+    data = {"handler": SimpleNamespace(callback=bench_handler)}  # как HandlerObject
+    t0 = time.perf_counter()
+    for _ in range(N):
+        await _noop(None, data)
+    bare = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for _ in range(N):
+        await mw(_noop, None, data)
+    wrapped = time.perf_counter() - t0
+    print(f"HandlerMetrics overhead: {(wrapped - bare) / N * 1e6:.2f} µs/update")
+
+
+async def replay():
+    logging.disable(logging.INFO)
+    bot = make_fake_bot()
+    dp = app.build_dispatcher()
+    for data in make_updates(50, 10, bot.id):
+        await dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+    text = REGISTRY.render()
+    print("\n".join(line for line in text.splitlines()
+                    if line.startswith(("bot_handler_seconds_count", "bot_quiz", "bot_idempotency"))))
+
+
+async def main():
+    await micro()
+    await replay()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
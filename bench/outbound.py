@@ -0,0 +1,57 @@
+# bench/outbound.py
+# Запуск: python -m bench.outbound
+# Локальный фейковый Bot API (aiohttp) с лимитами Telegram: 30 msg/s на бота,
+# 1 msg/s на чат (всплеск до 3), плюс 2% случайных 429 «на всякий случай».
+# Всплеск отправок (рассылка, bulk_priority) без планировщика и с ним.
+
+import asyncio
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from bot.outbound import OutboundScheduler, bulk_priority
+
+from .fake_api import BENCH_TOKEN, FakeTelegram, start_fake_server
+
+CHATS, PER_CHAT = 40, 4
+
+
+async def burst(base: str, scheduler=None):
+    session = AiohttpSession(api=TelegramAPIServer.from_base(base))
+    if scheduler:
+        session.middleware(scheduler)
+    bot = Bot(token=BENCH_TOKEN, session=session)
+    lost = 0
+
+    async def one(chat: int, i: int):
+        nonlocal lost
+        try:
+            await bot.send_message(chat, f"msg {i}")
+        except Exception:
+            lost += 1
+
+    t0 = time.perf_counter()
+    with bulk_priority():
+        await asyncio.gather(*(one(c, i) for c in range(1, CHATS + 1) for i in range(PER_CHAT)))
+    took = time.perf_counter() - t0
+    await session.close()
+    return took, lost
+
+
+async def main():
+    for limited in (False, True):
+        fake = FakeTelegram(limits=True)
+        runner, port = await start_fake_server(fake)
+        sched = OutboundScheduler() if limited else None
+        took, lost = await burst(f"http://127.0.0.1:{port}", sched)
+        name = "scheduler" if limited else "direct"
+        print(f"{name:9} {CHATS * PER_CHAT} sends in {took:5.2f}s | lost {lost:3} | 429 from server {fake.rejected}")
+        if sched:
+            print("          ", sched.stats())
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
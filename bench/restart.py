@@ -0,0 +1,193 @@
+# bench/restart.py
+# Запуск: python -m bench.restart
+# Рестарт во время работы: настоящий `python -m bot.bot` в polling против
+# фейкового Bot API с getUpdates (задержка API 50 мс, чтобы апдейты были «в полёте»).
+#   1. /start от USERS пользователей, затем ответы на вопрос 1 — и сразу остановка;
+#   2. пока процесса нет, пользователи отвечают на вопрос 2 (копятся в очереди);
+#   3. новый процесс: сколько ответов дошло и через сколько после старта первый ответ.
+# legacy — как было: процесс умирает сразу (SIGKILL), очередь выбрасывается
+# (DROP_PENDING_UPDATES=1), сессии в памяти теряются.
+# graceful — SIGTERM с дренажем, снимок STATE_SNAPSHOT, очередь обрабатывается.
+
+import asyncio
+import itertools
+import os
+import signal
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List
+
+from aiohttp import web
+
+from .fake_api import BENCH_TOKEN, FakeTelegram, _user, start_fake_server
+
+USERS = 200
+LATENCY = 0.05
+RESPONSES = {"sendMessage", "editMessageText", "answerCallbackQuery"}
+
+
+class PollingTelegram(FakeTelegram):
+    """FakeTelegram + очередь апдейтов с семантикой getUpdates (offset подтверждает)."""
+
+    def __init__(self):
+        super().__init__()
+        self.queue: List[dict] = []
+        self.ids = itertools.count(1)
+        self.last = 0             # последний поставленный update_id
+        self.arrived = asyncio.Event()
+        self.fetched = 0          # наибольший update_id, отданный боту
+        self.first_poll = 0.0
+        self.first_response = 0.0
+        self.verdicts: Counter = Counter()
+        self.questions: Counter = Counter()
+
+    def push(self, update: dict) -> None:
+        update["update_id"] = self.last = next(self.ids)
+        self.queue.append(update)
+        self.arrived.set()
+
+    def mark(self) -> None:
+        self.first_poll = self.first_response = 0.0
+
+    async def handle(self, request: web.Request):
+        method = request.match_info["method"]
+        if method == "getUpdates":
+            data = await request.post()
+            offset = int(data.get("offset") or 0)
+            self.queue = [u for u in self.queue if u["update_id"] >= offset]
+            if not self.first_poll:
+                self.first_poll = time.monotonic()
+            if not self.queue:
+                self.arrived.clear()
+                try:
+                    await asyncio.wait_for(self.arrived.wait(), min(1.0, float(data.get("timeout") or 0)))
+                except asyncio.TimeoutError:
+                    pass
+            batch = self.queue[:100]
+            if batch:
+                self.fetched = max(self.fetched, batch[-1]["update_id"])
+            return web.json_response({"ok": True, "result": batch})
+        if method == "deleteWebhook":
+            data = await request.post()
+            if data.get("drop_pending_updates") in ("true", "True", "1"):
+                self.queue.clear()
+            return web.json_response({"ok": True, "result": True})
+        if method in RESPONSES:
+            await asyncio.sleep(LATENCY)
+            if not self.first_response:
+                self.first_response = time.monotonic()
+        if method == "sendMessage":
+            data = await request.post()
+            text = data.get("text", "")
+            chat = int(data.get("chat_id", 0))
+            if text.startswith(("✅", "❌")):
+                self.verdicts[chat] += 1
+            elif text.startswith("Задание"):
+                self.questions[chat] += 1
+        return await super().handle(request)
+
+
+def _start(uid: int) -> dict:
+    return {"message": {
+        "message_id": 1, "date": int(time.time()), "chat": {"id": uid, "type": "private"},
+        "from": _user(uid), "text": "/start",
+        "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+    }}
+
+
+def _tap(uid: int, pos: int, bot_id: int) -> dict:
+    return {"callback_query": {
+        "id": f"{uid}-{pos}", "from": _user(uid), "chat_instance": str(uid),
+        "data": f"ans:0:{pos}",
+        "message": {"message_id": 100 + pos, "date": int(time.time()),
+                    "chat": {"id": uid, "type": "private"},
+                    "from": {"id": bot_id, "is_bot": True, "first_name": "bench"}, "text": "q"},
+    }}
+
+
+async def spawn(port: int, env_extra: Dict[str, str]) -> asyncio.subprocess.Process:
+    env = {k: v for k, v in os.environ.items() if not k.startswith("BOT_TOKEN")}
+    env.update(BOT_TOKEN=BENCH_TOKEN, TELEGRAM_API_BASE=f"http://127.0.0.1:{port}",
+               OUTBOUND_LIMITS="0", STATE_IDLE_TTL="0", **env_extra)
+    env.pop("STATE_DB", None)
+    env.pop("WEBHOOK_BASE", None)
+    return await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "bot.bot", env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=open(os.environ.get("BENCH_LOG", os.devnull), "ab"),
+    )
+
+
+async def until(cond, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        await asyncio.sleep(0.01)
+
+
+async def run(graceful: bool, tmp: str) -> Dict[str, float]:
+    fake = PollingTelegram()
+    runner, port = await start_fake_server(fake)
+    bot_id = int(BENCH_TOKEN.split(":")[0])
+    uids = [70_000 + u for u in range(USERS)]
+    env = ({"STATE_SNAPSHOT": os.path.join(tmp, "snapshot.bin"), "SHUTDOWN_TIMEOUT": "20"}
+           if graceful else {"DROP_PENDING_UPDATES": "1"})
+    try:
+        a = await spawn(port, env)
+        await until(lambda: fake.first_poll)  # deleteWebhook уже был
+        for uid in uids:
+            fake.push(_start(uid))
+        await until(lambda: sum(fake.questions.values()) >= USERS)
+
+        # ответы на вопрос 1 — и остановка, как только бот их забрал
+        for uid in uids:
+            fake.push(_tap(uid, 1, bot_id))
+        await until(lambda: fake.fetched >= fake.last)
+        t_stop = time.monotonic()
+        a.send_signal(signal.SIGTERM if graceful else signal.SIGKILL)
+        await a.wait()
+        stop_s = time.monotonic() - t_stop
+        answered_1 = sum(1 for uid in uids if fake.verdicts[uid] >= 1)
+
+        # пока процесса нет — ответы на вопрос 2
+        for uid in uids:
+            fake.push(_tap(uid, 2, bot_id))
+        fake.mark()
+        t0 = time.monotonic()
+        b = await spawn(port, env)
+        try:
+            with_q2 = lambda: sum(1 for uid in uids if fake.verdicts[uid] >= 2)
+            await until(lambda: fake.first_poll)
+            try:
+                await until(lambda: with_q2() >= USERS, timeout=5)
+            except TimeoutError:
+                pass  # legacy: очередь выброшена, ответов не будет
+            await asyncio.sleep(0.5)  # повторы, если есть, успеют прийти
+            ready = fake.first_poll - t0 if fake.first_poll else float("nan")
+            first = fake.first_response - t0 if fake.first_response else float("nan")
+            dup = sum(max(0, n - 2) for n in fake.verdicts.values())
+            return {"stop_s": stop_s, "answered_1": answered_1, "answered_2": with_q2(),
+                    "ready_s": ready, "first_s": first, "dup": dup}
+        finally:
+            b.send_signal(signal.SIGTERM)
+            await b.wait()
+    finally:
+        await runner.cleanup()
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for graceful in (False, True):
+            r = await run(graceful, tmp)
+            name = "graceful" if graceful else "legacy"
+            first = f"{r['first_s']:5.2f}s" if r["first_s"] == r["first_s"] else "never"
+            print(f"{name:8} stop {r['stop_s']:5.2f}s | in flight answered {r['answered_1']}/{USERS}"
+                  f" | queued during restart answered {r['answered_2']}/{USERS}"
+                  f" | restart→polling {r['ready_s']:5.2f}s | restart→first response {first}"
+                  f" | duplicate verdicts {r['dup']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+# bench/review.py
+# Запуск: python -m bench.review [сессий]
+# Повторение промахов (/review):
+#   flow      — 200 пользователей проходят тест через диспетчер (фейковый Bot
+#               API), часы переводятся на сутки вперёд: тик напоминаний, затем
+#               /review и ответы — сколько напоминаний, повторений и карточек;
+#   due       — ближайшие карточки одной колоды: куча против просмотра всех;
+#   reminders — тик планировщика на N сессиях с колодами: колесо времени
+#               против полного обхода сессий.
+
+import sys
+import time
+import random
+import asyncio
+
+from aiogram.types import Update
+
+from bot import bot as app
+from bot.apicalls import calls_for
+from bot.registry import BotConfig
+from bot.review import INTERVALS, Deck, Reminders, ReviewWheel
+from bot.state import MemoryStateStore, UserState
+
+from .fake_api import BENCH_TOKEN, make_fake_bot, make_updates
+
+USERS, ANSWERS = 200, 10
+SESSIONS = 200_000
+DAY = 86400
+
+
+def _review_update(uid: int, n: int, bot_id: int, data: str = "") -> dict:
+    chat = {"id": uid, "type": "private"}
+    user = {"id": uid, "is_bot": False, "first_name": f"u{uid}"}
+    if not data:
+        return {"update_id": n, "message": {
+            "message_id": 10_000 + n, "date": 0, "chat": chat, "from": user, "text": "/review",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 7}]}}
+    return {"update_id": n, "callback_query": {
+        "id": str(n), "from": user, "chat_instance": str(uid), "data": data,
+        "message": {"message_id": 10_000 + n, "date": 0, "chat": chat,
+                    "from": {"id": bot_id, "is_bot": True, "first_name": "bench"}, "text": "q"}}}
+
+
+async def flow() -> None:
+    bot = make_fake_bot()
+    app.TENANTS.put(BotConfig(BENCH_TOKEN))
+    app.TENANTS.bots[bot.id] = bot
+    dp = app.build_dispatcher()
+    for data in make_updates(USERS, ANSWERS, bot.id):
+        await dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+    keys = [(bot.id, 10_000 + u) for u in range(USERS)]
+    cards = sum(len(app.STATE.get(*k).deck or ()) for k in keys)
+
+    # сутки спустя
+    real = time.time
+    time.time = lambda: real() + DAY + 2 * app.REVIEWS.slot
+    try:
+        before = calls_for(bot.id)
+        t0 = time.perf_counter()
+        reminded = await app.REMINDERS.tick()
+        tick_ms = (time.perf_counter() - t0) * 1e3
+        again = await app.REMINDERS.tick()  # тот же час — второй раз не напоминаем
+        sent = calls_for(bot.id) - before
+        n = 1_000_000
+        finished = 0
+        for uid in range(10_000, 10_000 + USERS):
+            n += 1
+            await dp.feed_update(bot, Update.model_validate(_review_update(uid, n, bot.id),
+                                                            context={"bot": bot}))
+            st = app.STATE.get(bot.id, uid)
+            while st.level == "REVIEW" and st.idx <= st.total:
+                n += 1
+                q = app.current_question(st)
+                right = q.order.index(q.task.answer_idx)
+                await dp.feed_update(bot, Update.model_validate(
+                    _review_update(uid, n, bot.id, f"ans:{right}"), context={"bot": bot}))
+            finished += st.level == "REVIEW"
+        boxes = {}
+        for k in keys:
+            for box, n in (app.STATE.get(*k).deck or Deck()).boxes().items():
+                boxes[box] = boxes.get(box, 0) + n
+        left = sum(boxes.values())
+    finally:
+        time.time = real
+    print(f"flow      {USERS} users: {cards} missed task(s) in decks | next day: {reminded} reminder(s)"
+          f" in {tick_ms:.1f} ms ({sent} API calls), repeat tick {again} | reviews done {finished}"
+          f" | cards after all-right review: {left}, by box {dict(sorted(boxes.items()))}")
+
+
+def due_bench() -> None:
+    rnd = random.Random(1)
+    now = 10 * DAY
+    for n in (25, 1_000, 10_000):
+        deck = Deck.load([[[f"t{i}", 0, rnd.randrange(now - DAY, now + 30 * DAY)] for i in range(n)], 0])
+        reps = max(200, 200_000 // n)
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            deck.next_due()
+            deck.due(now, 10)
+        heap_us = (time.perf_counter() - t0) / reps * 1e6
+        cards = deck.cards
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            min(c >> 3 for c in cards.values())
+            sorted((c >> 3, t) for t, c in cards.items() if c >> 3 <= now)[:10]
+        scan_us = (time.perf_counter() - t0) / reps * 1e6
+        print(f"due       deck {n:>6} cards | heap {heap_us:8.2f} µs | scan {scan_us:9.2f} µs"
+              f" | x{scan_us / heap_us:.0f}")
+
+
+def reminders_bench(sessions: int) -> None:
+    rnd = random.Random(2)
+    now = 100 * DAY
+    store = MemoryStateStore()
+    wheel = ReviewWheel(slot=60)
+    for chat in range(sessions):
+        st = UserState()
+        if rnd.random() < 0.6:  # у остальных промахов не было
+            st.deck = Deck.load([[[f"t{j}", rnd.randrange(len(INTERVALS)), now + rnd.randrange(7 * DAY)]
+                                  for j in range(rnd.randint(1, 8))], 0])
+            wheel.add((1, chat), st.deck.remind_at())
+        store.items[(1, chat)] = st
+    rem = Reminders(wheel, store, lambda bot_id: None, owns=lambda key: True)
+    ticks = 60
+    t0 = time.perf_counter()
+    hits = 0
+    for i in range(1, ticks + 1):
+        hits += len(rem.collect(now + i * 60))
+    wheel_ms = (time.perf_counter() - t0) / ticks * 1e3
+    t0 = time.perf_counter()
+    scanned = 0
+    for i in range(1, 4):
+        t = now + i * 60
+        scanned += sum(1 for st in store.items.values() if st.deck and st.deck.remind_at() <= t)
+    scan_ms = (time.perf_counter() - t0) / 3 * 1e3
+    print(f"reminders {sessions} sessions, {len(wheel)} scheduled | per 60 s tick: wheel {wheel_ms:6.2f} ms"
+          f" ({hits / ticks:.0f} due) | full scan {scan_ms:7.1f} ms | x{scan_ms / wheel_ms:.0f}")
+
+
+async def main():
+    await flow()
+    due_bench()
+    reminders_bench(int(sys.argv[1]) if len(sys.argv) > 1 else SESSIONS)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+# bench/sharding.py
+# Запуск: python -m bench.sharding [макс. число воркеров]
+# Супервизор в режиме раздачи по chat_id + фейковый Bot API в отдельных процессах.
+# Меряем updates/sec при 1, 2, 4… воркерах. Масштабирование ограничено числом ядер.
+# restart — перезапуск упавшего воркера на фейковых часах и процессах: за две
+# минуты тиков монитора (0.5 с) воркер, падающий сразу после старта, должен
+# подниматься с паузой 1, 2, 4 … 30 с, а не ни разу.
+
+import multiprocessing as mp
+import os
+import socket
+import sys
+import time
+
+from bot.registry import bot_id_of
+from bot.supervisor import Supervisor
+
+from .fake_api import BENCH_TOKEN, make_updates, serve_fake_api
+
+USERS, ANSWERS = 400, 10
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run(workers: int, updates) -> float:
+    sup = Supervisor(1, workers, fanout=True)
+    sup.start()
+    time.sleep(3.0)  # прогрев: импорт aiogram в воркерах
+    bot_id = bot_id_of(BENCH_TOKEN)
+    t0 = time.perf_counter()
+    for raw in updates:
+        sup.submit(bot_id, raw)
+    while sup.summary()["updates"] < len(updates):
+        time.sleep(0.05)
+        sup.poll()
+        if time.perf_counter() - t0 > 300:
+            raise RuntimeError(f"timeout: {sup.summary()}")
+    took = time.perf_counter() - t0
+    sup.stop()
+    return len(updates) / took
+
+
+class _DeadProcess:
+    """Воркер, который падает сразу после старта."""
+    exitcode = 1
+    pid = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def is_alive(self) -> bool:
+        return False
+
+
+class _FakeContext:
+    Process = _DeadProcess
+
+    @staticmethod
+    def Queue():
+        return mp.get_context("spawn").Queue()
+
+
+def restart_check(ticks: int = 240, tick: float = 0.5) -> None:
+    now = [0.0]
+    sup = Supervisor(1, 1, fanout=False, ctx=_FakeContext(), clock=lambda: now[0])
+    spawned = []
+    spawn = sup._spawn
+    sup._spawn = lambda shard: (spawned.append(now[0]), spawn(shard))
+    sup.start()
+    for _ in range(ticks):
+        now[0] += tick
+        sup.poll()
+    gaps = [b - a for a, b in zip(spawned, spawned[1:])]
+    print(f"restart  {ticks} ticks x {tick}s | respawns {len(spawned) - 1}"
+          f" | gaps {', '.join(f'{g:.1f}' for g in gaps)} s")
+    if len(spawned) < 5:
+        raise SystemExit("упавший воркер не перезапускается")
+
+
+def main():
+    restart_check()
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    port = _free_port()
+    ctx = mp.get_context("spawn")
+    servers = [ctx.Process(target=serve_fake_api, args=(port,), daemon=True)
+               for _ in range(max(1, max_workers // 2))]
+    for p in servers:
+        p.start()
+    os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{port}"
+    os.environ["WORKER_STATS_INTERVAL"] = "0.2"
+    os.environ["OUTBOUND_LIMITS"] = "0"
+    os.environ["BOT_TOKEN"] = BENCH_TOKEN  # воркеры берут ботов из окружения
+    os.environ.pop("BOT_REGISTRY", None)
+    updates = list(make_updates(USERS, ANSWERS))
+    print(f"cores: {os.cpu_count()} | updates: {len(updates)}")
+    base = None
+    w = 1
+    while w <= max_workers:
+        rate = run(w, updates)
+        base = base or rate
+        print(f"workers {w}: {rate:8,.0f} upd/s | x{rate / base:.2f}")
+        w *= 2
+    for p in servers:
+        p.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# bench/state_memory.py
+# Запуск: python -m bench.state_memory
+# Память на 100k сессий после завершённого теста (2–3 промаха, курсор уровня):
+#   before   — прежний @dataclass: словари misses/cursor, список recent у каждой
+#   after    — UserState со __slots__, код уровня, промахи — bytearray по меткам
+#   spilled  — MemoryStateStore после вытеснения простаивающих (упакованные байты)
+#   sqlite   — SqliteStateStore после вытеснения: в памяти ничего, всё в базе
+# И цена «подъёма» вытесненной сессии при следующем обращении.
+
+import asyncio
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Dict, List
+
+from bot.state import MemoryStateStore, SqliteStateStore
+from bot.taskbank import BANKS
+
+N = 100_000
+BOT_ID = 8222973157
+
+
+@dataclass
+class LegacyUserState:
+    """Форма сессии до __slots__ — только для сравнения."""
+    level: str = "A"
+    idx: int = 0
+    score: int = 0
+    total: int = 0
+    misses: Dict[str, int] = None
+    asked_at: float = 0.0
+    bank: str = ""
+    seed: int = 0
+    cursor: Dict[str, int] = None
+    skill: float = 1400.0
+    pick: int = -1
+    recent: List[int] = None
+
+
+def _fill(st, i: int, labels) -> None:
+    if isinstance(st, LegacyUserState):
+        st.cursor = {"B": 10 * (i % 5 + 1)}
+    else:
+        st.level, st.idx, st.total = "B", 10 * (i % 5 + 1), 10 * (i % 5 + 1)
+        st.reset()  # прошлые тесты сдвинули курсор уровня
+    st.level, st.idx, st.score, st.total = "B", 11, 7, 10
+    st.asked_at = time.time()
+    st.bank = BANKS.current.version
+    st.seed = (i * 0x9E3779B97F4A7C15) & (2 ** 63 - 1) | 1
+    st.skill = 1400.0 + i % 300
+    if isinstance(st, LegacyUserState):
+        st.misses = {labels[i % len(labels)]: 1, labels[(i + 7) % len(labels)]: 2}
+        st.recent = []
+    else:
+        st.add_miss(i % len(labels), len(labels))
+        st.add_miss((i + 7) % len(labels), len(labels))
+        st.add_miss((i + 7) % len(labels), len(labels))
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    keep = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used, keep
+
+
+def fill_store(store) -> None:
+    labels = BANKS.current.labels
+    for i in range(N):
+        _fill(store.get(BOT_ID, i), i, labels)
+        store.mark_dirty(BOT_ID, i)
+
+
+async def main():
+    labels = BANKS.current.labels
+
+    def before():
+        items = {}
+        for i in range(N):
+            st = items[(BOT_ID, i)] = LegacyUserState()
+            _fill(st, i, labels)
+        return items
+
+    def after():
+        store = MemoryStateStore(idle_ttl=60)
+        fill_store(store)
+        return store
+
+    def spilled():
+        store = after()
+        store.sweep()
+        store.sweep()  # два обхода без обращений — всё вытеснено
+        return store
+
+    rows = [("before", *measure(before)), ("after", *measure(after)), ("spilled", *measure(spilled))]
+
+    with tempfile.TemporaryDirectory() as d:
+        store = SqliteStateStore(os.path.join(d, "state.db"), idle_ttl=60)
+
+        async def sqlite():
+            fill_store(store)
+            await store.flush()
+            store.sweep()
+            store.sweep()
+            return store
+
+        gc.collect()
+        tracemalloc.start()
+        await sqlite()
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rows.append(("sqlite", used, store))
+
+        base = rows[0][1]
+        for name, used, _ in rows:
+            print(f"{name:8} {used / 2**20:7.1f} MiB per {N // 1000}k sessions"
+                  f" | {used / N:6.0f} B/session | {base / max(used, 1):5.1f}x smaller than before")
+
+        # цена подъёма: первое обращение к вытесненной сессии
+        mem = rows[2][2]
+        for name, s in (("spilled", mem), ("sqlite", store)):
+            t0 = time.perf_counter()
+            for i in range(0, N, 10):
+                s.get(BOT_ID, i)
+            per = (time.perf_counter() - t0) / (N // 10)
+            print(f"rehydrate from {name:8} {per * 1e6:6.2f} µs/session")
+        store._db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
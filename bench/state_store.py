@@ -0,0 +1,64 @@
+# bench/state_store.py
+# Запуск: python -m bench.state_store
+# Сравнение answers/sec: голый dict (как раньше) vs MemoryStateStore vs SQLite write-behind
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from bot.state import MemoryStateStore, SqliteStateStore, UserState
+from bot.taskbank import BANKS
+
+BOT_ID = 8222973157
+LABELS = len(BANKS.current.labels)  # промахи — bytearray по меткам банка, как в боте
+
+
+def _answer(st: UserState, right: bool):
+    if right:
+        st.score += 1
+    else:
+        st.add_miss(3, LABELS)
+    st.idx = st.idx % 10 + 1
+
+
+async def run_dict(n: int, users: int) -> float:
+    state = {}
+    rnd = random.Random(1)
+    t0 = time.perf_counter()
+    for i in range(n):
+        st = state.setdefault((BOT_ID, rnd.randrange(users)), UserState())
+        _answer(st, i & 1 == 0)
+        if i % 256 == 0:
+            await asyncio.sleep(0)
+    return n / (time.perf_counter() - t0)
+
+
+async def run_store(store, n: int, users: int) -> float:
+    rnd = random.Random(1)
+    await store.start()
+    t0 = time.perf_counter()
+    for i in range(n):
+        chat = rnd.randrange(users)
+        st = store.get(BOT_ID, chat)
+        _answer(st, i & 1 == 0)
+        store.mark_dirty(BOT_ID, chat)
+        if i % 256 == 0:
+            await asyncio.sleep(0)
+    await store.close()
+    return n / (time.perf_counter() - t0)
+
+
+async def main(n: int = 300_000, users: int = 20_000):
+    print(f"dict            : {await run_dict(n, users):>10,.0f} answers/s")
+    print(f"MemoryStateStore: {await run_store(MemoryStateStore(), n, users):>10,.0f} answers/s")
+    with tempfile.TemporaryDirectory() as d:
+        store = SqliteStateStore(os.path.join(d, "state.db"), flush_interval=0.05)
+        rate = await run_store(store, n, users)
+        print(f"SqliteStateStore: {rate:>10,.0f} answers/s "
+              f"({store.flushes} flushes, {store.rows_written} rows)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+# bench/taskbank.py
+# Запуск: python -m bench.taskbank
+# Горячий путь on_answer: старая сборка (копия списка, клавиатура, f-строки)
+# против готового TaskBank. Время на ответ и аллокации.
+# draw: выбор задания из пулов разного размера — время не зависит от N.
+
+import json
+import os
+import time
+import tracemalloc
+
+from bot.i18n import BASE_LOCALE, TEXTS
+from bot.taskbank import BANK_DIR, BANKS, LevelBank, _norm, _verdict, answers_kb, load_bank
+
+N = 50_000
+
+with open(os.path.join(BANK_DIR, "B.json"), encoding="utf-8") as f:
+    TASKS_B = json.load(f)["tasks"]
+
+
+def old_path(i: int):
+    tasks = list(TASKS_B)
+    pos = i % len(tasks) + 1
+    task = tasks[pos - 1]
+    chosen = task["options"][1]
+    is_right = _norm(chosen) == _norm(task["answer"])
+    verdict = _verdict(is_right, task.get("answer", ""), task.get("explain", ""), TEXTS[BASE_LOCALE])
+    nxt = tasks[pos % len(tasks)]
+    text = f"Задание {pos}/{len(tasks)}:\n{nxt['text']}"
+    kb = answers_kb(nxt["options"])
+    return verdict, text, kb
+
+
+def new_path(i: int):
+    tasks = BANKS.current.level("B")
+    pos = i % tasks.total + 1
+    task = tasks.draw(12345, i).task
+    is_right = task.is_right(1)
+    verdict = task.verdict_right if is_right else task.verdict_wrong
+    q = tasks.draw(12345, i + 1)
+    return verdict, TEXTS[BASE_LOCALE].question_text(pos, tasks.total, q.task.text_html), q.keyboard()
+
+
+def measure(fn):
+    t0 = time.perf_counter()
+    for i in range(N):
+        fn(i)
+    per = (time.perf_counter() - t0) / N
+    tracemalloc.start()
+    snap0 = tracemalloc.take_snapshot()
+    keep = [fn(i) for i in range(1000)]
+    snap1 = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snap1.compare_to(snap0, "filename")
+    blocks = sum(s.count_diff for s in stats)
+    size = sum(s.size_diff for s in stats)
+    del keep
+    return per, blocks / 1000, size / 1000
+
+
+def load_times(rounds: int = 20):
+    # холодная сборка из JSON против загрузки снимка из .cache
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        load_bank(BANK_DIR, use_cache=False)
+    cold = (time.perf_counter() - t0) / rounds
+    load_bank(BANK_DIR)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        load_bank(BANK_DIR)
+    cached = (time.perf_counter() - t0) / rounds
+    print(f"load     {cold * 1e3:7.2f} ms from JSON | {cached * 1e3:7.2f} ms from cache")
+
+
+def draw_times():
+    for n in (10, 1_000, 100_000):
+        pool = [dict(TASKS_B[i % len(TASKS_B)], id=str(i), topic=f"t{i % 7}") for i in range(n)]
+        level = LevelBank("B", pool, sample=10)
+        t0 = time.perf_counter()
+        for g in range(N):
+            level.draw(g, g)
+        per = (time.perf_counter() - t0) / N
+        print(f"draw     {per * 1e6:7.2f} µs from a pool of {n}")
+
+
+def main():
+    load_times()
+    draw_times()
+    for name, fn in (("old", old_path), ("TaskBank", new_path)):
+        per, blocks, size = measure(fn)
+        print(f"{name:8} {per * 1e6:7.2f} µs/answer | {blocks:6.1f} blocks | {size:8.0f} B retained per answer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# bench/tenants.py
+# Запуск: python -m bench.tenants [число ботов]
+# Сотни ботов в одном процессе против фейкового Bot API по HTTP.
+#   per-bot — как было: у каждого бота свой Bot, своя AiohttpSession (пул и
+#             SSL-контекст) и свой Dispatcher;
+#   tenants — реестр + TENANTS: общий Dispatcher и одна сессия на всех.
+# Каждый режим — в отдельном процессе (RSS не возвращается): время подключения,
+# прирост RSS, открытые TCP-соединения после трёх кругов запросов (по 20 в
+# параллель). Затем бот добавляется в SQLite-реестр на ходу: через сколько он
+# запущен и не тронуты ли остальные.
+
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+from .fake_api import BENCH_TOKEN, FakeTelegram, start_fake_server
+
+BOTS = 300
+ROUNDS, CONCURRENCY = 3, 20
+
+
+def _tokens(n: int):
+    secret = BENCH_TOKEN.split(":", 1)[1]
+    return [f"{7_000_000_000 + i}:{secret}" for i in range(n)]
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class CountingTelegram(FakeTelegram):
+    """+ число разных клиентских соединений."""
+
+    def __init__(self):
+        super().__init__()
+        self.peers = set()
+
+    async def handle(self, request: web.Request):
+        self.peers.add(request.transport.get_extra_info("peername"))
+        return await super().handle(request)
+
+
+async def _traffic(bots) -> None:
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(bot, chat):
+        async with sem:
+            await bot.send_message(chat, "hi")
+
+    for r in range(ROUNDS):
+        await asyncio.gather(*(one(b, 10_000 + r) for b in bots))
+
+
+async def _run(mode: str, n: int, tmp: str) -> dict:
+    fake = CountingTelegram()
+    runner, port = await start_fake_server(fake)
+    os.environ["TELEGRAM_API_BASE"] = f"http://127.0.0.1:{port}"
+    from bot import bot as app
+    from bot.registry import BotConfig, JsonRegistry, SqliteRegistry
+
+    tokens = _tokens(n)
+    rss0, t0 = _rss_kb(), time.perf_counter()
+    if mode == "per-bot":
+        pairs = [(app.make_bot(t), app.build_dispatcher()) for t in tokens]
+        bots = [b for b, _ in pairs]
+    else:
+        path = os.path.join(tmp, "bots.json")
+        with open(path, "w") as f:
+            json.dump({"bots": [{"token": t} for t in tokens]}, f)
+        dp = app.build_dispatcher()
+        app.wire_tenants(dp)
+        await app.TENANTS.open(JsonRegistry(path), dp, app.make_session())
+        bots = [app.TENANTS.bot(bid) for bid in app.TENANTS.configs]
+    onboard = time.perf_counter() - t0
+    await _traffic(bots)
+    res = {"mode": mode, "onboard_ms": onboard * 1e3, "rss_kb": _rss_kb() - rss0,
+           "connections": len(fake.peers), "sent": fake.sent}
+
+    if mode == "per-bot":
+        for b in bots:
+            await b.session.close()
+    else:
+        # добавить бота на ходу: SQLite-реестр, изменения из «CLI» (другое соединение)
+        db = os.path.join(tmp, "registry.db")
+        reg, cli = SqliteRegistry(db), SqliteRegistry(db)
+        for t in tokens:
+            cli.put(BotConfig(t))
+        await app.TENANTS.apply({})  # сброс JSON-набора
+        app.TENANTS.registry = reg
+        await app.TENANTS.reload()
+        before = dict(app.TENANTS.bots)
+        started = asyncio.Event()
+        app.TENANTS.on_attach.append(lambda bot: started.set())
+        watch = asyncio.ensure_future(app.TENANTS.watch(0.05))
+        new = f"{7_100_000_000}:{BENCH_TOKEN.split(':', 1)[1]}"
+        t0 = time.perf_counter()
+        cli.put(BotConfig(new, default="HARD", flow="compact"))
+        await asyncio.wait_for(started.wait(), 10)
+        res["add_ms"] = (time.perf_counter() - t0) * 1e3
+        res["untouched"] = sum(app.TENANTS.bots.get(i) is b for i, b in before.items())
+        res["before"] = len(before)
+        watch.cancel()
+        await app.TENANTS.close()
+        reg.close()
+        cli.close()
+    await runner.cleanup()
+    return res
+
+
+def _child(mode: str, n: int, tmp: str, out) -> None:
+    import logging
+    logging.disable(logging.INFO)
+    out.put(asyncio.run(_run(mode, n, tmp)))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else BOTS
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("per-bot", "tenants"):
+            q = ctx.Queue()
+            p = ctx.Process(target=_child, args=(mode, n, tmp, q))
+            p.start()
+            r = q.get()
+            p.join()
+            print(f"{mode:8} {n} bots | onboard {r['onboard_ms']:7.1f} ms | RSS +{r['rss_kb'] / 1024:6.1f} MiB"
+                  f" ({r['rss_kb'] / n:5.1f} KiB/bot) | TCP connections {r['connections']:>4}"
+                  f" for {r['sent']} requests")
+            if "add_ms" in r:
+                print(f"         runtime add via registry: started in {r['add_ms']:.0f} ms"
+                      f" | other bots untouched {r['untouched']}/{r['before']}")
+
+
+if __name__ == "__main__":
+    main()
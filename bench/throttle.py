@@ -0,0 +1,117 @@
+# bench/throttle.py
+# Запуск: python -m bench.throttle
+# Входящий троттлинг (bot/throttle.py):
+#   flood  — 200 пользователей проходят тест через диспетчер, между их апдейтами
+#            один пользователь шлёт по 10 апдейтов (/start, «Пройти ещё раз»,
+#            смена уровня, тапы): вызовы Bot API и пройденные тесты без
+#            троттлинга и с ним;
+#   check  — цена Throttle.check на апдейт (100k пользователей в окне);
+#   memory — байт на отслеживаемого пользователя и самоочистка: через два окна
+#            без апдейтов записей не остаётся.
+
+import asyncio
+import logging
+import os
+import time
+import tracemalloc
+
+from aiogram.types import Update
+
+from bot import bot as app
+from bot.apicalls import calls_for
+from bot.throttle import QUIZ, Throttle
+
+from .fake_api import make_fake_bot, make_updates
+
+logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+logging.getLogger("bot.throttle").setLevel(logging.WARNING)
+
+USERS, ANSWERS, FLOOD = 200, 10, 10
+ABUSER = 99_999
+N = 100_000
+
+
+def _abuser_updates(n: int, bot_id: int):
+    chat = {"id": ABUSER, "type": "private"}
+    user = {"id": ABUSER, "is_bot": False, "first_name": "spam", "language_code": "ru"}
+    kinds = ("/start", "again", "setlvl:B", "ans:0", "/level")
+    for i in range(n):
+        kind = kinds[i % len(kinds)]
+        uid = 5_000_000 + i
+        if kind.startswith("/"):
+            yield {"update_id": uid, "message": {
+                "message_id": 100 + i, "date": 0, "chat": chat, "from": user, "text": kind,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(kind)}]}}
+        else:
+            yield {"update_id": uid, "callback_query": {
+                "id": str(uid), "from": user, "chat_instance": "spam", "data": kind,
+                "message": {"message_id": 100 + i, "date": 0, "chat": chat,
+                            "from": {"id": bot_id, "is_bot": True, "first_name": "bench"}, "text": "q"}}}
+
+
+async def flood(throttle: bool) -> str:
+    os.environ["THROTTLE"] = "1" if throttle else "0"
+    app.HANDLED.clear()
+    app.THROTTLE.clear()
+    bot = make_fake_bot()
+    dp = app.build_dispatcher()
+    normal = list(make_updates(USERS, ANSWERS, bot.id))
+    spam = _abuser_updates(len(normal) * FLOOD, bot.id)
+    before = calls_for(bot.id)
+    abuse_calls = 0
+    t0 = time.perf_counter()
+    for data in normal:
+        await dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+        for _ in range(FLOOD):
+            mark = calls_for(bot.id)
+            await dp.feed_update(bot, Update.model_validate(next(spam), context={"bot": bot}))
+            abuse_calls += calls_for(bot.id) - mark
+    elapsed = time.perf_counter() - t0
+    total = calls_for(bot.id) - before
+    done = sum(app.STATE.get(bot.id, 10_000 + u).status() == "done" for u in range(USERS))
+    updates = len(normal) * (FLOOD + 1)
+    return (f"flood     throttle {'on ' if throttle else 'off'} | {updates} updates in {elapsed:5.2f} s"
+            f" | Bot API calls {total:>6} (abuser {abuse_calls:>6}) | quizzes done {done}/{USERS}"
+            f" | {app.THROTTLE.stats() if throttle else ''}")
+
+
+def check_bench() -> None:
+    now = [1000.0]
+    th = Throttle(clock=lambda: now[0])
+    for u in range(N):
+        th.check(1, u)
+    t0 = time.perf_counter()
+    for r in range(5):
+        now[0] += 0.5
+        for u in range(N):
+            th.check(1, u, restart=0 if u % 10 else QUIZ)
+    per = (time.perf_counter() - t0) / (5 * N) * 1e6
+    print(f"check     {per:6.3f} µs/update over {N} users | {th.stats()}")
+
+
+def memory_bench() -> None:
+    now = [1000.0]
+    th = Throttle(window=10.0, clock=lambda: now[0])
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    for u in range(N):
+        th.check(8222973157, 10_000 + u, restart=QUIZ)
+    used, _ = tracemalloc.get_traced_memory()
+    tracked = len(th)
+    now[0] += 25  # два окна тишины
+    th.check(8222973157, 1)
+    left = len(th)
+    tracemalloc.stop()
+    print(f"memory    {tracked} users tracked: {(used - base) / tracked:5.0f} B/user"
+          f" | after two idle windows: {left} tracked")
+
+
+async def main():
+    print(await flood(False))
+    print(await flood(True))
+    check_bench()
+    memory_bench()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+# bench/webapp.py
+# Запуск: python -m bench.webapp
+# Один и тот же тест (200 пользователей × 10 вопросов) двумя путями через
+# одно ASGI-приложение: чат (POST /webhook — /start и тап на каждый вопрос)
+# и WebApp (POST /webapp/.../start и один POST .../answers на весь тест).
+# Печатаем запросы/с, тесты/с и сколько HTTP-запросов уходит на тест.
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from urllib.parse import urlencode
+
+import httpx
+
+from bot import bot as app
+from bot.webapp import mount_webapp
+from bot.webhook import SECRET_HEADER, build_app
+
+from .fake_api import BENCH_TOKEN, make_fake_bot, make_updates, percentile
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+USERS, ANSWERS = 200, 10
+SECRET = "bench-secret"
+
+
+def sign_init_data(user_id: int, token: str = BENCH_TOKEN) -> str:
+    """initData так, как его подписывает Telegram."""
+    fields = {"auth_date": str(int(time.time())), "query_id": f"q{user_id}",
+              "user": json.dumps({"id": user_id, "first_name": "u"}, separators=(",", ":"))}
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def build():
+    app.HANDLED.clear()
+    app.THROTTLE.clear()
+    bot = make_fake_bot()
+    asgi = build_app({bot.id: (bot, app.build_dispatcher())}, secret=SECRET)
+    mount_webapp(asgi, app, {bot.id: BENCH_TOKEN})
+    return bot, asgi
+
+
+async def run_chat():
+    bot, asgi = build()
+    lat = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi), base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        for data in make_updates(USERS, ANSWERS, bot.id):
+            t = time.perf_counter()
+            r = await client.post(f"/webhook/{bot.id}", json=data, headers={SECRET_HEADER: SECRET})
+            r.raise_for_status()
+            lat.append(time.perf_counter() - t)
+        total = time.perf_counter() - t0
+    return total, lat, bot.session.total()
+
+
+async def run_webapp():
+    bot, asgi = build()
+    lat, done = [], 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi), base_url="http://bench") as client:
+
+        async def post(path, body):
+            t = time.perf_counter()
+            r = await client.post(f"/webapp/{bot.id}/{path}", json=body)
+            r.raise_for_status()
+            lat.append(time.perf_counter() - t)
+            return r.json()
+
+        t0 = time.perf_counter()
+        for u in range(USERS):
+            init = sign_init_data(20_000 + u)
+            quiz = await post("start", {"initData": init})
+            answers = [{"pos": q["pos"], "option": 0} for q in quiz["questions"]]
+            res = await post("answers", {"initData": init, "answers": answers})
+            done += res["summary"] is not None
+        total = time.perf_counter() - t0
+    assert done == USERS, f"завершено {done}/{USERS}"
+    return total, lat, bot.session.total()
+
+
+def report(name, total, lat, calls):
+    n = len(lat)
+    print(f"{name:8} {n / total:>7,.0f} req/s | {USERS / total:>6,.0f} quizzes/s"
+          f" | {n / USERS:4.1f} req/quiz | p50 {percentile(lat, .5) * 1e3:6.3f} ms"
+          f" | p99 {percentile(lat, .99) * 1e3:6.3f} ms | bot api calls {calls}")
+
+
+async def main():
+    report("chat", *await run_chat())
+    report("webapp", *await run_webapp())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+# bench/webhook_replay.py
+# Запуск: python -m bench.webhook_replay [updates.jsonl]
+# Прогон записанных (или синтетических) апдейтов без сети:
+#   polling — dp.feed_update напрямую (то, что делает start_polling после getUpdates)
+#   webhook — POST /webhook/{bot_id} через ASGI-приложение bot.webhook
+
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+
+from bot.bot import HANDLED, THROTTLE, build_dispatcher
+from bot.webhook import SECRET_HEADER, build_app
+from aiogram.types import Update
+
+from .fake_api import make_fake_bot, make_updates, percentile
+
+SECRET = "bench-secret"
+
+
+def load_updates(path: str = ""):
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    return list(make_updates(users=200, answers=10))
+
+
+async def run_polling(raw):
+    bot = make_fake_bot()
+    dp = build_dispatcher()
+    lat = []
+    t0 = time.perf_counter()
+    for data in raw:
+        t = time.perf_counter()
+        await dp.feed_update(bot, Update.model_validate(data, context={"bot": bot}))
+        lat.append(time.perf_counter() - t)
+    return time.perf_counter() - t0, lat, bot.session.total()
+
+
+async def run_webhook(raw):
+    HANDLED.clear()
+    THROTTLE.clear()
+    bot = make_fake_bot()
+    app = build_app({bot.id: (bot, build_dispatcher())}, secret=SECRET)
+    lat = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t0 = time.perf_counter()
+        for data in raw:
+            t = time.perf_counter()
+            r = await client.post(f"/webhook/{bot.id}", json=data, headers={SECRET_HEADER: SECRET})
+            r.raise_for_status()
+            lat.append(time.perf_counter() - t)
+        total = time.perf_counter() - t0
+    return total, lat, bot.session.total()
+
+
+def report(name, total, lat, calls):
+    n = len(lat)
+    print(f"{name:8} {n / total:>9,.0f} upd/s | p50 {percentile(lat, .5) * 1e3:6.3f} ms"
+          f" | p99 {percentile(lat, .99) * 1e3:6.3f} ms | api calls {calls}")
+
+
+async def main():
+    raw = load_updates(sys.argv[1] if len(sys.argv) > 1 else "")
+    report("polling", *await run_polling(raw))
+    report("webhook", *await run_webhook(raw))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
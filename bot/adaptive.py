@@ -0,0 +1,208 @@
+# bot/adaptive.py
+# ==========================================================
+# Адаптивный режим: рейтинги заданий (Эло) и подбор следующего вопроса
+# Навык пользователя меняется сразу в UserState, рейтинги заданий — пачками
+# в фоне; индекс сложности (корзины по рейтингу) пересобирается после пачки.
+# ==========================================================
+
+import os
+import json
+import math
+import random
+import asyncio
+import contextlib
+import logging
+from bisect import bisect_left
+from typing import Container, Dict, List, Optional, Tuple
+
+from .sampling import mix
+from .taskbank import Question, Task, TaskBank
+
+log = logging.getLogger("bot.adaptive")
+
+ADAPTIVE = "ADAPT"   # псевдо-уровень в UserState.level
+QUIZ_LEN = 10        # вопросов в адаптивном тесте
+
+# Стартовые рейтинги заданий по уровню файла (навык нового — UserState.skill)
+PRIORS: Dict[str, float] = {"A": 1300.0, "B": 1500.0, "HARD": 1700.0}
+DEFAULT_RATING = 1500.0
+
+K_USER = 32.0
+K_TASK = 8.0
+BUCKET = 50.0        # ширина корзины индекса, очки Эло
+TARGET = 0.7         # желаемая вероятность верного ответа
+
+# Сдвиг «навык -> сложность» для TARGET: E(s, d) = TARGET при d = s - OFFSET
+OFFSET = 400.0 * math.log10(TARGET / (1.0 - TARGET))
+
+
+def expected(skill: float, difficulty: float) -> float:
+    """Вероятность верного ответа по Эло."""
+    return 1.0 / (1.0 + 10.0 ** ((difficulty - skill) / 400.0))
+
+
+class DifficultyIndex:
+    """Все задания банка, разложенные по корзинам рейтинга.
+
+    Выбор — bisect по отсортированным номерам корзин и шаг наружу,
+    пока не найдётся непоказанное задание: O(log B) + размер корзины."""
+
+    __slots__ = ("bank", "tasks", "ratings", "keys", "buckets", "positions", "locales")
+
+    def __init__(self, bank: TaskBank, ratings: Dict[str, float]):
+        tasks: List[Task] = []
+        values: List[float] = []
+        for name, level in bank.levels.items():
+            prior = PRIORS.get(name, DEFAULT_RATING)
+            for t in level.tasks:
+                tasks.append(t)
+                values.append(ratings.get(t.id, prior))
+        buckets: Dict[int, List[int]] = {}
+        for i, r in enumerate(values):
+            buckets.setdefault(int(r // BUCKET), []).append(i)
+        self.bank = bank
+        self.tasks: Tuple[Task, ...] = tuple(tasks)
+        self.ratings: Tuple[float, ...] = tuple(values)
+        self.keys: List[int] = sorted(buckets)
+        self.buckets: Dict[int, Tuple[int, ...]] = {k: tuple(v) for k, v in buckets.items()}
+        self.positions: Dict[str, int] = {t.id: i for i, t in enumerate(tasks)}  # для /review
+        # язык -> tasks в переводе (номера те же)
+        self.locales: Dict[str, Tuple[Task, ...]] = {
+            lang: tuple(tr.get(t.id, t) for t in tasks) for lang, tr in bank.translated.items()}
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def _from_bucket(self, key: int, exclude: Container[int], rnd: random.Random) -> int:
+        members = self.buckets[key]
+        start = rnd.randrange(len(members))
+        for j in range(len(members)):
+            i = members[(start + j) % len(members)]
+            if i not in exclude:
+                return i
+        return -1
+
+    def pick(self, skill: float, exclude: Container[int] = (),
+             rnd: Optional[random.Random] = None) -> int:
+        """Индекс задания с рейтингом ближе всего к skill - OFFSET."""
+        rnd = rnd or random
+        target = (skill - OFFSET) / BUCKET
+        keys = self.keys
+        hi = bisect_left(keys, math.floor(target))
+        lo = hi - 1
+        while lo >= 0 or hi < len(keys):
+            # ближайшая по расстоянию корзина из двух соседних
+            if hi >= len(keys) or (lo >= 0 and target - (keys[lo] + 0.5) < (keys[hi] + 0.5) - target):
+                key, lo = keys[lo], lo - 1
+            else:
+                key, hi = keys[hi], hi + 1
+            i = self._from_bucket(key, exclude, rnd)
+            if i >= 0:
+                return i
+        return rnd.randrange(len(self.tasks))  # всё показано — повтор
+
+    def question(self, i: int, seed: int, pos: int, lang: str = "") -> Question:
+        task = (self.locales.get(lang) or self.tasks)[i]
+        return Question(task, task.orders[mix(seed, i, pos) % len(task.orders)])
+
+
+class Ratings:
+    """Рейтинги заданий. observe() — O(1) в хендлере: навык пользователя
+    обновляется на месте, ответ копится в буфере. Раз в flush_interval
+    буфер применяется к рейтингам и индексы пересобираются."""
+
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 5.0,
+                 max_pending: int = 1_000_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.ratings: Dict[str, float] = self._load()
+        self.pending: List[Tuple[str, float, float, bool]] = []
+        self.indices: Dict[str, DifficultyIndex] = {}
+        self.applied = 0
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._wakeup = asyncio.Event()
+
+    def _load(self) -> Dict[str, float]:
+        if self.path:
+            with contextlib.suppress(FileNotFoundError, ValueError):
+                with open(self.path, encoding="utf-8") as f:
+                    return {str(k): float(v) for k, v in json.load(f).items()}
+        return {}
+
+    def index(self, bank: TaskBank) -> DifficultyIndex:
+        idx = self.indices.get(bank.version)
+        if idx is None:
+            idx = self.indices[bank.version] = DifficultyIndex(bank, self.ratings)
+            while len(self.indices) > 4:
+                self.indices.pop(next(iter(self.indices)))
+        return idx
+
+    def difficulty(self, task_id: str, level: str) -> float:
+        return self.ratings.get(task_id, PRIORS.get(level, DEFAULT_RATING))
+
+    def observe(self, st, task_id: str, difficulty: float, correct: bool) -> None:
+        """Навык — сразу (нужен для выбора следующего вопроса), задание — в буфер."""
+        skill = st.skill
+        st.skill = skill + K_USER * ((1.0 if correct else 0.0) - expected(skill, difficulty))
+        if len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self.pending.append((task_id, difficulty, skill, correct))
+
+    def apply(self) -> int:
+        pending, self.pending = self.pending, []
+        if not pending:
+            return 0
+        ratings = self.ratings
+        for task_id, difficulty, skill, correct in pending:
+            d = ratings.get(task_id, difficulty)
+            ratings[task_id] = d + K_TASK * (expected(skill, d) - (1.0 if correct else 0.0))
+        self.applied += len(pending)
+        return len(pending)
+
+    def _save(self, snapshot: Dict[str, float]) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({k: round(v, 2) for k, v in snapshot.items()}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    async def flush(self) -> int:
+        n = self.apply()
+        if not n:
+            return 0
+        snapshot = dict(self.ratings)
+        banks = [idx.bank for idx in self.indices.values()]
+        # сборка индексов — в потоке; подмена — одним update() в цикле событий
+        rebuilt = await asyncio.to_thread(
+            lambda: {b.version: DifficultyIndex(b, snapshot) for b in banks}
+        )
+        self.indices.update(rebuilt)
+        if self.path:
+            await asyncio.to_thread(self._save, snapshot)
+        return n
+
+    async def _loop(self) -> None:
+        while not self._closing:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning("ratings flush failed: %s", e)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
@@ -0,0 +1,25 @@
+# bot/apicalls.py
+# ==========================================================
+# Счётчик исходящих вызовов Bot API (middleware сессии aiogram)
+# ==========================================================
+
+from collections import Counter
+from typing import Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+# (bot_id, имя метода) -> число вызовов
+API_CALLS: "Counter[Tuple[int, str]]" = Counter()
+
+
+class ApiCallCounter(BaseRequestMiddleware):
+    def __init__(self, counter: Counter = API_CALLS):
+        self.counter = counter
+
+    async def __call__(self, make_request, bot, method):
+        self.counter[(bot.id, type(method).__name__)] += 1
+        return await make_request(bot, method)
+
+
+def calls_for(bot_id: int) -> int:
+    return sum(v for (b, _), v in API_CALLS.items() if b == bot_id)
@@ -1,15 +1,19 @@
 # bot/bot.py
 # ==========================================================
-# Multi-bot | уровни A / B / HARD | aiogram v3
+# Multi-bot | уровни A / B / HARD, повторение /review | aiogram v3
 # Стабильные ответы: idempotency по message_id + safe_answer
 # ==========================================================
 
 import os
+import sys
+import html
+import time
+import random
+import signal
 import asyncio
 import logging
 import contextlib
-from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional, Set
+from typing import Callable, Dict, Tuple, Optional
 
 from aiogram import Bot, Dispatcher, F
 from aiogram.filters import CommandStart
@@ -18,80 +22,51 @@ from aiogram.types import (
     Message,
     CallbackQuery,
     InlineKeyboardMarkup,
-    InlineKeyboardButton,
 )
 from aiogram.client.default import DefaultBotProperties
-from aiogram.exceptions import TelegramRetryAfter, TelegramBadRequest
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramBadRequest
 from dotenv import load_dotenv
 
-# ---------- Пулы вопросов ----------
-try:
-    from .tasks import TASKS as TASKS_A
-except Exception:
-    from .tasks import TASKS_A  # type: ignore
-
-try:
-    from .tasks_b import TASKS as TASKS_B
-except Exception:
-    from .tasks_b import TASKS_B  # type: ignore
-
-try:
-    from .tasks_hard import TASKS as TASKS_HARD
-except Exception:
-    try:
-        from .tasks_hard import TASKS_HARD  # type: ignore
-    except Exception:
-        TASKS_HARD = []
+from .adaptive import ADAPTIVE, QUIZ_LEN, Ratings
+from .apicalls import API_CALLS, ApiCallCounter
+from .campaigns import CampaignRunner, CampaignStore
+from .chatlock import ChatSerialMiddleware, KeyedLock
+from .events import make_event_log
+from .identity import BotIdentity, IdentityMiddleware
+from .idempotency import SeenCache
+from .leaderboard import ALL_TIME, ANY_LEVEL, Leaderboards, week_of
+from .lifecycle import Lifecycle, load_snapshot, save_snapshot
+from .metrics import REGISTRY, QUIZ_COMPLETED, ApiMetrics, HandlerMetrics, start_metrics_server
+from .outbound import OutboundScheduler, PerBotOutbound
+from .registry import ALL_LEVELS, BotRegistry, make_registry
+from .i18n import LocaleMiddleware, Texts, texts
+from .review import REVIEW, Deck, Reminders, ReviewWheel
+from .state import SqliteStateStore, UserState, make_store
+from .taskbank import BANKS, LevelBank, Question, Task
+from .tenants import Tenants
+from .throttle import Throttle, ThrottleMiddleware
 
 # ---------- Логирование ----------
 logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
 log = logging.getLogger("bot")
 
 # ---------- Хелперы ----------
-def _norm(s: str) -> str:
-    return (s or "").strip().casefold()
-
-# Политика уровней по ботам (замени id при необходимости)
-BOT_LEVEL_POLICY: Dict[int, Dict[str, object]] = {
-    # @tod_discern_bot
-    8222973157: {"default": "A", "allowed": {"A", "B", "HARD"}},
-    # @discernment_test_bot
-    8416181261: {"default": "B", "allowed": {"B", "HARD"}},
-}
-ALL_LEVELS: Tuple[str, ...] = ("A", "B", "HARD")
+# Боты и их политика уровней (default, allowed, flow) — в реестре (BOT_REGISTRY)
+DEFAULTS = DefaultBotProperties(parse_mode="HTML")
+TENANTS = Tenants(default=DEFAULTS)
+
+def policy_for(bot_id: int) -> Dict[str, object]:
+    return TENANTS.policy_for(bot_id)
 
 # ---------- Клавиатуры ----------
-def answers_kb(options: List[str]) -> InlineKeyboardMarkup:
-    rows = [[InlineKeyboardButton(text=opt, callback_data=f"ans:{i}")]
-            for i, opt in enumerate(options)]
-    return InlineKeyboardMarkup(inline_keyboard=rows)
-
-def level_picker_kb(allowed: Optional[set] = None) -> InlineKeyboardMarkup:
-    allowed = allowed or set(ALL_LEVELS)
-    rows = []
-    if "A" in allowed:
-        rows.append([InlineKeyboardButton(text="Уровень A", callback_data="setlvl:A")])
-    if "B" in allowed:
-        rows.append([InlineKeyboardButton(text="Уровень B", callback_data="setlvl:B")])
-    if "HARD" in allowed:
-        rows.append([InlineKeyboardButton(text="Уровень HARD", callback_data="setlvl:HARD")])
-    return InlineKeyboardMarkup(inline_keyboard=rows)
-
-def restart_kb() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="Пройти ещё раз", callback_data="again")],
-            [InlineKeyboardButton(text="Сменить уровень", callback_data="levelpick")],
-            [InlineKeyboardButton(text="Поделиться", callback_data="share")],
-        ]
-    )
+# Собраны заранее на каждый язык (bot/i18n.py): здесь только выбор готовой
+def level_picker_kb(tr: Texts, allowed: Optional[set] = None) -> InlineKeyboardMarkup:
+    return tr.picker(frozenset(allowed or ALL_LEVELS))
 
-def share_kb(username: str) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[[InlineKeyboardButton(
-            text="Поделиться ботом", url=f"https://t.me/{username}?start=share"
-        )]]
-    )
+def restart_kb(tr: Texts, review: bool = False) -> InlineKeyboardMarkup:
+    return tr.restart_review_kb if review else tr.restart_kb
 
 # ---------- safe utils ----------
 async def safe_answer(cq: CallbackQuery, text: Optional[str] = None, *, cache_time: int = 0, show_alert: bool = False):
@@ -108,272 +83,672 @@ async def safe_edit_text(msg: Message, text: str, reply_markup=None, parse_mode=
         if "message is not modified" in (str(e) or "").lower():
             return msg
         raise
-    except TelegramRetryAfter as e:
-        await asyncio.sleep(e.retry_after + 0.5)
-        return await msg.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
     except Exception as e:
         log.warning("safe_edit_text failed: %s", e)
         return msg
 
 # ---------- Состояние пользователя ----------
-@dataclass
-class UserState:
-    level: str = "A"
-    idx: int = 0
-    score: int = 0
-    total: int = 0
-    misses: Dict[str, int] = None
-
-    def reset(self, level: Optional[str] = None):
-        if level:
-            self.level = level
-        self.idx = 0
-        self.score = 0
-        self.total = 0
-        self.misses = {}
-
-# Ключ: (bot_id, chat_id)
-STATE: Dict[Tuple[int, int], UserState] = {}
-
-# Идемпотентность ответов: (bot_id, user_id, message_id)
-HANDLED: Set[Tuple[int, int, int]] = set()
-
-def _key(bot_id: int, chat_id: int) -> Tuple[int, int]:
-    return (bot_id, chat_id)
-
-def get_tasks_by_level(level: str) -> List[dict]:
-    if level == "A":
-        return list(TASKS_A)
-    if level == "B":
-        return list(TASKS_B)
-    if level == "HARD":
-        return list(TASKS_HARD)
-    return list(TASKS_A)
-
-def render_intro(levels_line: str) -> str:
-    return (
-        "Готов проверить себя на различение?\n\n"
-        "• 10 заданий · 2 минуты\n"
-        "• Сразу разбор и советы\n\n"
-        "Сменить уровень — кнопкой <b>«Сменить уровень»</b> или "
-        f"командами: {levels_line}\n\n"
-        "Начинаем! 🧠"
-    )
+# Ключ: (bot_id, chat_id). STATE_DB=path — SQLite с пакетной записью, иначе память.
+# STATE_IDLE_TTL — через сколько секунд без обращений сессия уходит из памяти
+STATE = make_store(
+    os.environ.get("STATE_DB"),
+    flush_interval=float(os.environ.get("STATE_FLUSH_INTERVAL", "0.5")),
+    idle_ttl=float(os.environ.get("STATE_IDLE_TTL", "1800")),
+)
 
-def render_question(task: dict, idx: int, total: int) -> str:
-    return f"Задание {idx}/{total}:\n{task['text']}"
+# Журнал ответов (EVENT_LOG=path), пишется пачками в фоне
+EVENTS = make_event_log(os.environ.get("EVENT_LOG"))
 
-def render_verdict(is_right: bool, task: dict) -> str:
-    prefix = "✅ Верно!" if is_right else "❌ Неверно."
-    ans = task.get("answer", "")
-    explain = task.get("explain", "")
-    if explain:
-        return f"{prefix} Правильный ответ: <b>{ans}</b>.\n{explain}"
-    else:
-        return f"{prefix} Правильный ответ: <b>{ans}</b>."
-
-def render_summary(state: UserState, level: str) -> str:
-    lines = [f"Готово! Итог: <b>{state.score}/{state.total}</b>\n"]
-    if state.misses:
-        lines.append("<b>Где чаще промахи:</b>")
-        for k, v in state.misses.items():
-            lines.append(f"• {k} — {v}×")
+# Рейтинги заданий для адаптивного режима (RATINGS_DB=path — сохранять между рестартами)
+RATINGS = Ratings(
+    os.environ.get("RATINGS_DB"),
+    flush_interval=float(os.environ.get("RATINGS_FLUSH_INTERVAL", "5")),
+)
+
+# Апдейты одного чата — строго по очереди (CHAT_SERIAL=0 выключает)
+CHAT_LOCKS = KeyedLock()
+
+# Таблицы лидеров (LEADERBOARD_DB=path — сохранять между рестартами)
+LEADERBOARDS = Leaderboards(
+    os.environ.get("LEADERBOARD_DB"),
+    shared=os.environ.get("LEADERBOARD_SHARED") == "1",
+)
+
+# Идемпотентность ответов: (bot_id, user_id, message_id), с TTL и лимитом размера
+HANDLED = SeenCache(
+    ttl=float(os.environ.get("HANDLED_TTL", "3600")),
+    max_size=int(os.environ.get("HANDLED_MAX", "200000")),
+)
+
+# Входящий троттлинг по пользователю (THROTTLE=0 выключает): THROTTLE_LIMIT
+# апдейтов за THROTTLE_WINDOW сек, сверх — коробка на THROTTLE_PENALTY сек;
+# повторный перезапуск теста чаще раза в THROTTLE_COLLAPSE сек отбрасывается
+THROTTLE = Throttle(
+    window=float(os.environ.get("THROTTLE_WINDOW", "10")),
+    limit=int(os.environ.get("THROTTLE_LIMIT", "30")),
+    collapse=float(os.environ.get("THROTTLE_COLLAPSE", "3")),
+    penalty=float(os.environ.get("THROTTLE_PENALTY", "60")),
+)
+
+# Остановка по SIGTERM: приём закрывается, начатые апдейты дорабатывают
+# (SHUTDOWN_TIMEOUT), STATE и HANDLED уходят в снимок STATE_SNAPSHOT
+LIFECYCLE = Lifecycle(drain_timeout=float(os.environ.get("SHUTDOWN_TIMEOUT", "25")))
+
+# Повторение промахов (/review): напоминания из колеса раз в REVIEW_SLOT сек
+# (REVIEW_REMINDERS=0 — без напоминаний, только по команде)
+REVIEWS = ReviewWheel(slot=float(os.environ.get("REVIEW_SLOT", "60")))
+REMINDERS = Reminders(
+    REVIEWS, STATE, TENANTS.bot,
+    owns=lambda key: key[0] in TENANTS.configs,
+    batch=QUIZ_LEN,
+    workers=int(os.environ.get("REVIEW_WORKERS", "8")),
+)
+
+def get_tasks_by_level(level: str, version: str = "") -> LevelBank:
+    # начатый тест остаётся на своей версии банка даже после перезагрузки
+    return BANKS.get(version).level(level) if version else BANKS.current.level(level)
+
+# Тексты — из каталога языка пользователя (tr); задания — на языке сессии (st.lang)
+def render_intro(tr: Texts, total: int = 10) -> str:
+    return tr.intro_text(total)
+
+def render_verdict(is_right: bool, task: Task) -> str:
+    return task.verdict_right if is_right else task.verdict_wrong
+
+def render_question(st: UserState, q: Question, tr: Texts) -> str:
+    return tr.question_text(st.idx, st.total, q.task.text_html)
+
+def render_rank(bot_id: int, user_id: int, level: str, tr: Texts) -> str:
+    place, n = LEADERBOARDS.board(bot_id, level, week_of()).rank(user_id)
+    if not place:
+        return ""
+    top = max(1, -(-100 * place // n))  # вверх до целого процента
+    return tr.rank(place=place, n=n, top=top)
+
+def render_top(bot_id: int, level: str, tr: Texts, n: int = 10) -> str:
+    lines = []
+    for title, lv, period in (
+        (tr.top_week(level=level), level, week_of()),
+        (tr.top_all(level=level), level, ALL_TIME),
+        (tr.top_any, ANY_LEVEL, ALL_TIME),
+    ):
+        top = LEADERBOARDS.board(bot_id, lv, period).top(n)
+        lines.append(f"<b>{title}</b>")
+        lines.extend(f"{i}. {html.escape(LEADERBOARDS.name(bot_id, uid))} — {v}"
+                     for i, (uid, v) in enumerate(top, 1))
+        if not top:
+            lines.append(tr.top_empty)
+        lines.append("")
+    return "\n".join(lines).strip()
+
+def render_review_line(st: UserState, now: float, tr: Texts) -> str:
+    deck = st.deck
+    if not deck:
+        return ""
+    due = deck.next_due()
+    when = tr.right_now if due <= now else tr.until(due - now)
+    return tr.review_line(tasks=tr.count(len(deck), tr.tasks), when=when)
+
+def render_summary(state: UserState, level: str, labels: Tuple[str, ...] = (),
+                   tr: Optional[Texts] = None) -> str:
+    tr = tr or texts(state.lang)
+    if level == REVIEW:
+        return (tr.summary_head(state.score, state.total, review=True) + "\n"
+                + (render_review_line(state, time.time(), tr) or tr.review_cleared))
+    lines = [tr.summary_head(state.score, state.total)]
+    misses = state.misses
+    if misses and any(misses):
+        lines.append(tr.misses_head)
+        for i in sorted((i for i, n in enumerate(misses) if n and i < len(labels)),
+                        key=lambda i: -misses[i]):
+            lines.append(tr.miss_line(label=labels[i], n=misses[i]))
         lines.append("")
-        lines.append("<b>Советы:</b>")
-        lines.append("• Замедляйся на причинности и выборках.")
-        lines.append("• Ищи альтернативные объяснения и отсутствующие данные.")
-        lines.append("• Проси метод/доказательства, а не статус/популярность.")
+        lines.append(tr.tips)
     else:
-        lines.append("Хорошее различение! Иногда можно ловиться на тонкие манипуляции — продолжай тренироваться.")
-    lines.append(f"\nУровень сейчас: <b>{level}</b>")
+        lines.append(tr.all_good)
+    review = render_review_line(state, time.time(), tr)
+    if review:
+        lines.append("\n" + review)
+    if level == ADAPTIVE:
+        lines.append(tr.skill_line(skill=f"{state.skill:.0f}"))
+    else:
+        lines.append(tr.level_line(level=level))
     return "\n".join(lines)
 
-# ---------- Хендлеры ----------
-async def start_quiz(msg: Message, bot_id: int, username: str):
-    k = _key(bot_id, msg.chat.id)
-    st = STATE.setdefault(k, UserState())
-
-    policy = BOT_LEVEL_POLICY.get(bot_id, {"default": "A", "allowed": set(ALL_LEVELS)})
+# ---------- Движок теста: общий для чата и WebApp (bot/webapp.py) ----------
+def review_question(st: UserState, pos: int) -> Question:
+    """Вопрос pos (≥ 1) повторения: задания выбраны заранее, в st.recent."""
+    return RATINGS.index(BANKS.get(st.bank)).question(st.recent[pos - 1], st.seed, pos, st.lang)
+
+def current_question(st: UserState) -> Question:
+    if st.level == REVIEW:
+        return review_question(st, st.idx)
+    if st.level == ADAPTIVE:
+        return RATINGS.index(BANKS.get(st.bank)).question(st.pick, st.seed, st.idx, st.lang)
+    return get_tasks_by_level(st.level, st.bank).draw(st.seed, st.stream_pos(), st.lang)
+
+def next_question(st: UserState) -> Question:
+    st.idx += 1
+    if st.level == REVIEW:
+        st.pick = st.recent[st.idx - 1]
+        return review_question(st, st.idx)
+    if st.level == ADAPTIVE:
+        # задание с рейтингом под текущий навык, без повторов внутри теста
+        index = RATINGS.index(BANKS.get(st.bank))
+        st.pick = index.pick(st.skill, st.recent)
+        st.recent.append(st.pick)
+        return index.question(st.pick, st.seed, st.idx, st.lang)
+    return get_tasks_by_level(st.level, st.bank).draw(st.seed, st.stream_pos(), st.lang)
+
+def begin_quiz(st: UserState, policy: Dict[str, object]) -> Question:
+    st.reset()  # задания прерванного теста тоже считаются показанными
     if st.level not in policy.get("allowed", set(ALL_LEVELS)):
         st.level = policy.get("default", "A")
+    if not st.seed:
+        st.seed = random.getrandbits(63) | 1
+    st.bank = BANKS.current.version
+    if st.level == ADAPTIVE:
+        st.recent = []
+        st.total = min(QUIZ_LEN, len(RATINGS.index(BANKS.current)))
+    else:
+        st.total = get_tasks_by_level(st.level, st.bank).sample
+    q = next_question(st)
+    st.asked_at = time.time()
+    return q
+
+def begin_review(st: UserState, now: Optional[float] = None) -> Optional[Question]:
+    """Тест из созревших карточек колоды (всех уровней, самые просроченные
+    первыми); None — повторять пока нечего."""
+    now = time.time() if now is None else now
+    deck = st.deck
+    if not deck:
+        return None
+    index = RATINGS.index(BANKS.current)
+    picks = []
+    for task_id in deck.due(now, QUIZ_LEN):
+        i = index.positions.get(task_id)
+        if i is None:
+            deck.drop(task_id)  # задание убрали из банка
+        else:
+            picks.append(i)
+    if not picks:
+        return None
+    st.reset(level=REVIEW)
+    if not st.seed:
+        st.seed = random.getrandbits(63) | 1
+    st.bank = BANKS.current.version
+    st.recent = picks
+    st.total = len(picks)
+    deck.reminded = 0  # повторяет сам — следующее напоминание по сроку карточек
+    q = next_question(st)
+    st.asked_at = now
+    return q
+
+def grade(st: UserState, q: Question, button: int, bot_id: int, user_id: int,
+          chat_id: Optional[int] = None) -> bool:
+    """Зачёт ответа на текущий вопрос: счёт, промахи, колода, рейтинги, журнал."""
+    task = q.task
+    idx = q.original(button)  # кнопки перемешаны — сверяем с исходным вариантом
+    is_right = task.is_right(idx)
+    now = time.time()
+    if is_right:
+        st.score += 1
+        if st.level == REVIEW and st.deck is not None:
+            st.deck.hit(task.id, now)
+    else:
+        _record_miss(st, task, now)
+    if st.deck is not None:
+        st.deck.unmute(now)  # раз отвечает — бот снова не заблокирован
+        REVIEWS.add((bot_id, user_id if chat_id is None else chat_id), st.deck.remind_at())
+    _observe(st, task, is_right)
+    EVENTS.append(bot_id, user_id, st.level, task.id, idx, is_right,
+                  now - st.asked_at if st.asked_at else 0.0)
+    st.asked_at = now
+    return is_right
+
+def _observe(st: UserState, task: Task, is_right: bool):
+    if st.level in (ADAPTIVE, REVIEW):
+        difficulty = RATINGS.index(BANKS.get(st.bank)).ratings[st.pick]
+    else:
+        difficulty = RATINGS.difficulty(task.id, st.level)
+    RATINGS.observe(st, task.id, difficulty, is_right)
+
+def finish_quiz(st: UserState, bot_id: int, user_id: int, name: str = "",
+                tr: Optional[Texts] = None) -> str:
+    st.idx += 1  # за итогом: ответы на последний вопрос больше не принимаются
+    QUIZ_COMPLETED.inc(bot_id, st.level)
+    tr = tr or texts(st.lang)
+    if st.level == REVIEW:
+        return render_summary(st, REVIEW, tr=tr)  # повторение в таблицы лидеров не идёт
+    LEADERBOARDS.record(bot_id, user_id, st.level, st.score, name=name)
+    rank = render_rank(bot_id, user_id, st.level, tr)
+    summary = render_summary(st, st.level, BANKS.get(st.bank).labels_for(tr.code), tr)
+    return summary + ("\n" + rank if rank else "")
+
+def _record_miss(st: UserState, task: Task, now: float):
+    if task.label >= 0:
+        st.add_miss(task.label, len(BANKS.get(st.bank).labels))
+    if st.deck is None:
+        st.deck = Deck()
+    st.deck.miss(task.id, now)
 
-    tasks = get_tasks_by_level(st.level)
-    st.idx = 0
-    st.score = 0
-    st.total = len(tasks)
-    st.misses = {}
+# ---------- Хендлеры ----------
+# tr — каталог языка пользователя (LocaleMiddleware)
+async def start_quiz(msg: Message, me: BotIdentity, tr: Texts):
+    bot_id = me.id
+    st = STATE.get(bot_id, msg.chat.id)
+    st.lang = tr.code
+    q = begin_quiz(st, me.policy)
+    STATE.mark_dirty(bot_id, msg.chat.id)
+
+    text = render_question(st, q, tr)
+
+    if me.compact:
+        # Интро и первый вопрос — одним сообщением, дальше оно правится на месте
+        await msg.answer(
+            render_intro(tr, st.total) + "\n\n" + text,
+            reply_markup=q.keyboard(st.idx),
+            parse_mode="HTML",
+        )
+        return
 
-    levels_line = "<code>/level A</code>, <code>/level B</code>, <code>/level HARD</code>."
-    await msg.answer(render_intro(levels_line), parse_mode="HTML")
+    await msg.answer(render_intro(tr, st.total), parse_mode="HTML")
 
     # Первый вопрос
-    st.idx = 1
-    task = tasks[0]
-    await msg.answer(
-        render_question(task, st.idx, st.total),
-        reply_markup=answers_kb(task["options"]),
-        parse_mode="HTML",
-    )
-
-def _current_task(bot_id: int, chat_id: int) -> Tuple[UserState, dict, List[dict]]:
-    k = _key(bot_id, chat_id)
-    st = STATE.setdefault(k, UserState())
-    tasks = get_tasks_by_level(st.level)
-    cur = tasks[st.idx - 1]
-    return st, cur, tasks
-
-def _record_miss(st: UserState, label: str):
-    if not label:
-        return
-    st.misses[label] = st.misses.get(label, 0) + 1
+    await msg.answer(text, reply_markup=q.keyboard(st.idx), parse_mode="HTML")
 
 # /start
-async def on_start(message: Message, bot: Bot):
-    bot_id = (await bot.me()).id
-    username = (await bot.me()).username
-    k = _key(bot_id, message.chat.id)
-    st = STATE.setdefault(k, UserState())
-    st.reset(level=BOT_LEVEL_POLICY.get(bot_id, {}).get("default", "A"))
-    await start_quiz(message, bot_id, username)
+async def on_start(message: Message, me: BotIdentity, tr: Texts):
+    st = STATE.get(me.id, message.chat.id)
+    st.reset(level=me.policy.get("default", "A"))
+    await start_quiz(message, me, tr)
 
 # Команда выбора уровня
-async def on_level_command(msg: Message, bot: Bot):
-    bot_id = (await bot.me()).id
-    allowed = BOT_LEVEL_POLICY.get(bot_id, {}).get("allowed", set(ALL_LEVELS))
-    await msg.answer("Выбери уровень:", reply_markup=level_picker_kb(set(allowed)))
+async def on_level_command(msg: Message, me: BotIdentity, tr: Texts):
+    allowed = me.policy.get("allowed", set(ALL_LEVELS))
+    await msg.answer(tr.pick_level, reply_markup=level_picker_kb(tr, allowed))
 
 # Смена уровня (кнопка)
-async def on_set_level(cq: CallbackQuery, bot: Bot):
+async def on_set_level(cq: CallbackQuery, me: BotIdentity, tr: Texts):
     await safe_answer(cq, cache_time=0)
-    bot_id = (await bot.me()).id
+    bot_id = me.id
 
     level = cq.data.split(":")[1]
-    policy = BOT_LEVEL_POLICY.get(bot_id, {"allowed": set(ALL_LEVELS)})
-    allowed = policy.get("allowed", set(ALL_LEVELS))
+    allowed = me.policy.get("allowed", set(ALL_LEVELS))
     if level not in allowed:
-        await cq.message.answer("Этот уровень недоступен для данного бота.")
+        await cq.message.answer(tr.level_denied)
         return
 
-    k = _key(bot_id, cq.message.chat.id)
-    st = STATE.setdefault(k, UserState())
+    st = STATE.get(bot_id, cq.message.chat.id)
     st.reset(level=level)
+    STATE.mark_dirty(bot_id, cq.message.chat.id)
 
     with contextlib.suppress(Exception):
         await cq.message.edit_reply_markup()
 
-    await cq.message.answer(f"Уровень переключён на <b>{level}</b>.", parse_mode="HTML")
-    await start_quiz(cq.message, bot_id, (await bot.me()).username)
+    await cq.message.answer(tr.level_switched(level=html.escape(level)), parse_mode="HTML")
+    await start_quiz(cq.message, me, tr)
 
 # Ответ на вариант
-async def on_answer(cq: CallbackQuery, bot: Bot):
+async def on_answer(cq: CallbackQuery, me: BotIdentity, tr: Texts):
     await safe_answer(cq, cache_time=0)
-    bot_id = (await bot.me()).id
-    key = (bot_id, cq.from_user.id, cq.message.message_id)
-
-    # Идемпотентность по message_id: один вопрос — один зачёт
-    if key in HANDLED:
-        await safe_answer(cq, text="Ответ уже принят ✅", cache_time=1)
-        return
-    HANDLED.add(key)
-
-    k = _key(bot_id, cq.message.chat.id)
-    st, task, tasks = _current_task(bot_id, cq.message.chat.id)
-
-    # снимаем клавиатуру у старого вопроса
-    with contextlib.suppress(Exception):
-        await cq.message.edit_reply_markup()
+    bot_id = me.id
 
     try:
-        idx = int(cq.data.split(":")[1])
+        parts = cq.data.split(":")
+        idx = int(parts[1])
+        pos = int(parts[2]) if len(parts) > 2 else 0
     except Exception:
-        idx = -1
+        idx, pos = -1, 0
 
-    chosen = task["options"][idx] if 0 <= idx < len(task["options"]) else ""
-    is_right = _norm(chosen) == _norm(task["answer"])
-    if is_right:
-        st.score += 1
-    else:
-        _record_miss(st, _norm(task.get("answer", "")))
+    # Идемпотентность по message_id (+ номер вопроса): один вопрос — один зачёт
+    if HANDLED.check_and_add(bot_id, cq.from_user.id, cq.message.message_id, pos):
+        await safe_answer(cq, text=tr.already_accepted, cache_time=1)
+        return
+
+    st = STATE.get(bot_id, cq.message.chat.id)
+    compact = me.compact
+    if st.idx > st.total or ((compact or pos) and pos != st.idx):
+        return  # тест окончен или тап по клавиатуре уже пройденного вопроса
+    st.lang = tr.code
+    q = current_question(st)
+    task = q.task
+
+    if not compact:
+        # снимаем клавиатуру у старого вопроса
+        with contextlib.suppress(Exception):
+            await cq.message.edit_reply_markup()
+
+    is_right = grade(st, q, idx, bot_id, cq.from_user.id, cq.message.chat.id)
+    STATE.mark_dirty(bot_id, cq.message.chat.id)
+
+    if compact:
+        # Вердикт + следующий вопрос (или итог) — одной правкой того же сообщения
+        verdict = render_verdict(is_right, task)
+        if st.idx < st.total:
+            q = next_question(st)
+            await safe_edit_text(
+                cq.message,
+                verdict + "\n\n" + render_question(st, q, tr),
+                reply_markup=q.keyboard(st.idx),
+            )
+        else:
+            await safe_edit_text(
+                cq.message,
+                verdict + "\n\n" + finish_quiz(st, bot_id, cq.from_user.id, cq.from_user.full_name, tr),
+                reply_markup=restart_kb(tr, review=bool(st.deck)),
+            )
+        return
 
     await cq.message.answer(render_verdict(is_right, task), parse_mode="HTML")
 
     # следующий вопрос или финал
     if st.idx < st.total:
-        st.idx += 1
-        next_task = tasks[st.idx - 1]
+        q = next_question(st)
+        STATE.mark_dirty(bot_id, cq.message.chat.id)
         await cq.message.answer(
-            render_question(next_task, st.idx, st.total),
-            reply_markup=answers_kb(next_task["options"]),
+            render_question(st, q, tr),
+            reply_markup=q.keyboard(st.idx),
             parse_mode="HTML",
         )
     else:
-        summary = render_summary(st, st.level)
-        await cq.message.answer(summary, reply_markup=restart_kb(), parse_mode="HTML")
+        summary = finish_quiz(st, bot_id, cq.from_user.id, cq.from_user.full_name, tr)
+        STATE.mark_dirty(bot_id, cq.message.chat.id)
+        await cq.message.answer(summary, reply_markup=restart_kb(tr, review=bool(st.deck)), parse_mode="HTML")
 
 # Пройти ещё раз
-async def on_again(cq: CallbackQuery, bot: Bot):
+async def on_again(cq: CallbackQuery, me: BotIdentity, tr: Texts):
     await safe_answer(cq, cache_time=0)
-    bot_id = (await bot.me()).id
-    k = _key(bot_id, cq.message.chat.id)
-    st = STATE.setdefault(k, UserState())
+    st = STATE.get(me.id, cq.message.chat.id)
+    with contextlib.suppress(Exception):
+        await cq.message.edit_reply_markup()
+    # после повторения — следующая порция, если созрела; иначе обычный тест
+    if st.level == REVIEW and st.deck and st.deck.due(time.time(), 1):
+        await start_review(cq.message, me, tr)
+        return
     st.reset(level=st.level)
+    STATE.mark_dirty(me.id, cq.message.chat.id)
+    await start_quiz(cq.message, me, tr)
+
+# Повторение промахов: /review, кнопка из напоминания или под итогом
+async def start_review(msg: Message, me: BotIdentity, tr: Texts):
+    st = STATE.get(me.id, msg.chat.id)
+    st.lang = tr.code
+    now = time.time()
+    q = begin_review(st, now)
+    if q is None:
+        if st.deck:
+            await msg.answer(tr.review_wait(tasks=tr.count(len(st.deck), tr.tasks),
+                                            when=tr.until(st.deck.next_due() - now)))
+        else:
+            await msg.answer(tr.review_nothing)
+        return
+    STATE.mark_dirty(me.id, msg.chat.id)
+    intro = tr.review_intro(tasks=tr.count(st.total, tr.tasks))
+    text = render_question(st, q, tr)
+    if me.compact:
+        await msg.answer(intro + "\n\n" + text, reply_markup=q.keyboard(st.idx), parse_mode="HTML")
+        return
+    await msg.answer(intro)
+    await msg.answer(text, reply_markup=q.keyboard(st.idx), parse_mode="HTML")
+
+async def on_review(msg: Message, me: BotIdentity, tr: Texts):
+    await start_review(msg, me, tr)
+
+async def on_review_button(cq: CallbackQuery, me: BotIdentity, tr: Texts):
+    await safe_answer(cq, cache_time=0)
     with contextlib.suppress(Exception):
         await cq.message.edit_reply_markup()
-    await start_quiz(cq.message, bot_id, (await bot.me()).username)
+    await start_review(cq.message, me, tr)
 
 # Сменить уровень (под итогом)
-async def on_level_pick(cq: CallbackQuery, bot: Bot):
+async def on_level_pick(cq: CallbackQuery, me: BotIdentity, tr: Texts):
     await safe_answer(cq, cache_time=0)
-    bot_id = (await bot.me()).id
-    allowed = BOT_LEVEL_POLICY.get(bot_id, {}).get("allowed", set(ALL_LEVELS))
-    await cq.message.answer("Выбери уровень:", reply_markup=level_picker_kb(set(allowed)))
+    allowed = me.policy.get("allowed", set(ALL_LEVELS))
+    await cq.message.answer(tr.pick_level, reply_markup=level_picker_kb(tr, allowed))
+
+# Таблица лидеров: /top или кнопка под итогом
+async def on_top(msg: Message, me: BotIdentity, tr: Texts):
+    st = STATE.get(me.id, msg.chat.id)
+    level = st.level if st.level != REVIEW else me.policy.get("default", "A")
+    await msg.answer(render_top(me.id, level, tr), parse_mode="HTML")
+
+async def on_top_button(cq: CallbackQuery, me: BotIdentity, tr: Texts):
+    await safe_answer(cq, cache_time=0)
+    await on_top(cq.message, me, tr)
 
 # Поделиться
-async def on_share(cq: CallbackQuery, bot: Bot):
+async def on_share(cq: CallbackQuery, me: BotIdentity, tr: Texts):
     await safe_answer(cq, cache_time=0)
-    me = await bot.me()
-    kb = share_kb(me.username or "discernment_test_bot")
-    await cq.message.answer("Кинь другу — пусть тоже проверит различение:", reply_markup=kb)
+    kb = tr.share_kb(me.username or "discernment_test_bot")
+    await cq.message.answer(tr.share_text, reply_markup=kb)
 
-# ------- Запуск одного бота -------
-async def run_single_bot(token: str):
-    bot = Bot(token=token, default=DefaultBotProperties(parse_mode="HTML"))
+# ------- Сборка диспетчера -------
+def build_dispatcher() -> Dispatcher:
     dp = Dispatcher(storage=MemoryStorage())
+    dp.update.outer_middleware(LIFECYCLE)
+    dp["identity"] = identity = IdentityMiddleware(policy_for)
+    dp.update.outer_middleware(identity)
+    dp.update.outer_middleware(LocaleMiddleware())
+    if os.environ.get("THROTTLE", "1") != "0":
+        dp.update.outer_middleware(ThrottleMiddleware(
+            THROTTLE, notice=os.environ.get("THROTTLE_NOTICE", "1") != "0"))
+    if os.environ.get("CHAT_SERIAL", "1") != "0":
+        dp.update.outer_middleware(ChatSerialMiddleware(CHAT_LOCKS))
+    dp.message.middleware(HandlerMetrics())
+    dp.callback_query.middleware(HandlerMetrics())
 
     dp.message.register(on_start, CommandStart())
     dp.message.register(on_level_command, F.text.startswith("/level"))
+    dp.message.register(on_top, F.text.startswith("/top"))
+    dp.message.register(on_review, F.text.startswith("/review"))
 
     dp.callback_query.register(on_set_level, F.data.startswith("setlvl:"))
     dp.callback_query.register(on_answer, F.data.startswith("ans:"))
     dp.callback_query.register(on_again, F.data == "again")
     dp.callback_query.register(on_level_pick, F.data == "levelpick")
+    dp.callback_query.register(on_top_button, F.data == "top")
     dp.callback_query.register(on_share, F.data == "share")
-
-    # Сносим вебхук и «хвост» апдейтов, чтобы не ловить протухшие query
-    with contextlib.suppress(Exception):
-        await bot.delete_webhook(drop_pending_updates=True)
-
-    me = await bot.me()
-    log.info("Starting polling for bot @%s (id=%s)", me.username, me.id)
-    await dp.start_polling(bot)
+    dp.callback_query.register(on_review_button, F.data == "review")
+    return dp
+
+# Планировщики исходящих по ботам (лимиты Telegram считаются на токен)
+OUTBOUND: Dict[int, OutboundScheduler] = {}
+
+def make_session(session=None):
+    """Сессия Bot API со слоями бота. Одна на все боты процесса: общий пул
+    соединений (HTTP_POOL_LIMIT, 0 — без предела: polling держит по соединению
+    на бота) и один SSL-контекст вместо своих на каждого."""
+    if session is None:
+        api_base = os.environ.get("TELEGRAM_API_BASE")
+        # локальный Bot API server (или фейковый — для нагрузочных тестов)
+        api = {"api": TelegramAPIServer.from_base(api_base)} if api_base else {}
+        session = AiohttpSession(limit=int(os.environ.get("HTTP_POOL_LIMIT", "0")), **api)
+    session.middleware(ApiCallCounter())
+    if os.environ.get("OUTBOUND_LIMITS", "1") != "0":
+        session.middleware(PerBotOutbound(
+            OUTBOUND,
+            global_rate=float(os.environ.get("OUTBOUND_GLOBAL_RATE", "30")),
+            chat_rate=float(os.environ.get("OUTBOUND_CHAT_RATE", "1")),
+        ))
+    # внутренний слой: чистое время HTTP-запроса, без ожидания в планировщике
+    session.middleware(ApiMetrics())
+    return session
+
+def make_bot(token: str, session=None) -> Bot:
+    """Отдельный бот со своей сессией (бенчи); боты из реестра — TENANTS.bot(id)."""
+    return Bot(token=token, session=make_session(session), default=DEFAULTS)
+
+def _forget_outbound(bot_id: int) -> None:
+    # только при удалении бота: лимиты не зависят от политики, а close() роняет
+    # ждущие отправки (SchedulerClosed) — на перенастройке их не трогаем
+    sched = OUTBOUND.pop(bot_id, None)
+    if sched is not None:
+        sched.close()
+
+def _collect_metrics():
+    calls: Dict[Tuple, float] = {}
+    for (bot_id, method), n in API_CALLS.items():
+        calls[(str(bot_id), method)] = n
+    yield ("bot_telegram_api_calls_total", "counter", "Bot API calls",
+           ("bot_id", "method"), calls)
+    yield ("bot_idempotency_total", "counter", "Duplicate-callback check outcomes",
+           ("result",), {(k,): v for k, v in HANDLED.stats().items() if k != "size"})
+    yield ("bot_idempotency_size", "gauge", "Remembered callback keys", (),
+           {(): len(HANDLED)})
+    yield ("bot_sessions", "gauge", "Sessions in memory and evicted since start", ("stat",),
+           {(k,): v for k, v in STATE.stats().items()})
+    yield ("bot_chat_locks", "gauge", "Per-chat serialization: active keys and totals",
+           ("stat",), {(k,): v for k, v in CHAT_LOCKS.stats().items()})
+    outbound: Dict[Tuple, float] = {}
+    for bot_id, sched in OUTBOUND.items():
+        for k, v in sched.stats().items():
+            outbound[(str(bot_id), k)] = v
+    yield ("bot_outbound", "gauge", "Outbound scheduler state", ("bot_id", "stat"), outbound)
+    yield ("bot_tenants", "gauge", "Bots from the registry: configured, with a Bot instance, running",
+           ("stat",), {(k,): v for k, v in TENANTS.stats().items()})
+    yield ("bot_throttle_total", "counter", "Inbound updates: passed, collapsed restarts, limited;"
+           " penalty box entries", ("result",), {(k,): v for k, v in THROTTLE.stats().items()})
+    yield ("bot_throttle_users", "gauge", "Users with live throttle counters and in the penalty box",
+           ("stat",), {(k,): v for k, v in THROTTLE.sizes().items()})
+    yield ("bot_review_reminders", "gauge", "Review reminders: scheduled sessions, sent, muted",
+           ("stat",), {(k,): v for k, v in REMINDERS.stats().items()})
+
+REGISTRY.add_collector(_collect_metrics)
+
+# ------- Рассылки (нужен STATE_DB: получатели берутся из user_index) -------
+# Одно соединение на все боты: их раннеры останавливаются с ботом, а хранилище
+# живёт до остановки процесса (close_campaigns)
+CAMPAIGNS: Optional[CampaignStore] = None
+
+def start_campaigns(bot: Bot) -> Optional[asyncio.Task]:
+    global CAMPAIGNS
+    if not isinstance(STATE, SqliteStateStore):
+        return None
+    if CAMPAIGNS is None:
+        CAMPAIGNS = CampaignStore(STATE.path)
+    runner = CampaignRunner(
+        CAMPAIGNS, bot,
+        workers=int(os.environ.get("CAMPAIGN_WORKERS", "8")),
+    )
+    return asyncio.ensure_future(runner.watch(float(os.environ.get("CAMPAIGN_POLL", "30"))))
+
+def close_campaigns() -> None:
+    global CAMPAIGNS
+    if CAMPAIGNS is not None:
+        CAMPAIGNS.close()
+        CAMPAIGNS = None
+
+# ------- Боты из реестра: общий диспетчер, хуки на запуск и удаление -------
+def wire_tenants(dp: Dispatcher) -> None:
+    TENANTS.on_forget.append(dp["identity"].forget)  # политика/username перечитаются
+    TENANTS.on_remove.append(_forget_outbound)
+    TENANTS.on_attach.append(start_campaigns)
+
+# ------- Webhook: все боты в одном ASGI-приложении -------
+async def run_webhook():
+    import uvicorn
+    from .webapp import mount_webapp
+    from .webhook import build_app
+
+    # маршруты — сам TENANTS: Bot создаётся при первом апдейте своего бота
+    app = build_app(TENANTS, secret=TENANTS.webhook_secret)
+    mount_webapp(app, sys.modules[__name__], TENANTS.tokens)
+    config = uvicorn.Config(
+        app, host="0.0.0.0", port=int(os.environ.get("PORT", "8080")), log_level="warning",
+        timeout_graceful_shutdown=int(LIFECYCLE.drain_timeout),
+    )
+    await _serve(uvicorn.Server(config))
+
+async def _serve(server):
+    # uvicorn на SIGTERM сам перестаёт принимать и дожидается запросов
+    LIFECYCLE.on_stop(lambda: setattr(server, "should_exit", True))
+    await server.serve()
+
+# ------- WebApp в polling-режиме (в webhook-режиме — на том же сервере) -------
+async def run_webapp(port: int):
+    import uvicorn
+    from .webapp import build_webapp
+
+    app = build_webapp(sys.modules[__name__], TENANTS.tokens)
+    config = uvicorn.Config(app, host="0.0.0.0", port=port, log_level="warning",
+                            timeout_graceful_shutdown=int(LIFECYCLE.drain_timeout))
+    await _serve(uvicorn.Server(config))
+
+# ------- Горячая перезагрузка банка заданий -------
+def _install_bank_reload():
+    loop = asyncio.get_running_loop()
+    with contextlib.suppress(NotImplementedError, AttributeError):
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(BANKS.reload()))
+    watch = float(os.environ.get("BANK_WATCH", "0"))
+    if watch > 0:
+        asyncio.ensure_future(BANKS.watch(watch))
 
 # ------- main -------
-async def main():
+async def main(registry: Optional[BotRegistry] = None,
+               setup: Optional[Callable[[Dispatcher], object]] = None):
     load_dotenv()
-    tokens: List[str] = []
-    for k, v in os.environ.items():
-        if k.startswith("BOT_TOKEN") and v:
-            tokens.append(v)
-    if not tokens and os.environ.get("BOT_TOKEN"):
-        tokens.append(os.environ["BOT_TOKEN"])
-    if not tokens:
-        raise RuntimeError("Не найден ни один BOT_TOKEN* в переменных окружения")
-
-    log.info("Starting polling for %d bot(s): %s", len(tokens), ["***" + t[-5:] for t in tokens])
-    await asyncio.gather(*(run_single_bot(t) for t in tokens))
+    registry = registry or make_registry(os.environ.get("BOT_REGISTRY"))
+
+    webhook_base = os.environ.get("WEBHOOK_BASE")
+    mode = "webhook" if webhook_base else "polling"
+    snapshot = os.environ.get("STATE_SNAPSHOT")
+    if snapshot:
+        load_snapshot(snapshot, STATE, HANDLED, LIFECYCLE, REVIEWS)
+    REVIEWS.restore(STATE.reviews())  # SQLite: сроки из user_index
+    LIFECYCLE.install_signals()
+    await STATE.start()
+    await EVENTS.start()
+    await RATINGS.start()
+    await LEADERBOARDS.start()
+    _install_bank_reload()
+    if os.environ.get("METRICS_PORT") and not webhook_base:
+        await start_metrics_server(int(os.environ["METRICS_PORT"]))
+
+    dp = build_dispatcher()
+    if setup:
+        setup(dp)
+    wire_tenants(dp)
+    TENANTS.polling = not webhook_base
+    TENANTS.drop_pending = os.environ.get("DROP_PENDING_UPDATES") == "1"
+    TENANTS.webhook_url = webhook_base
+    TENANTS.webhook_secret = os.environ.get("WEBHOOK_SECRET", "")
+    LIFECYCLE.on_stop(TENANTS.stop)
+    watch = None
+    try:
+        n = await TENANTS.open(registry, dp, make_session())
+        if not n and TENANTS.shards == 1:
+            # у воркера супервизора шард может быть пуст — ждёт новых ботов
+            raise RuntimeError("Не найден ни один бот: задай BOT_REGISTRY или BOT_TOKEN*")
+        log.info("Starting %s for %d bot(s)", mode, n)
+        watch = asyncio.ensure_future(TENANTS.watch(float(os.environ.get("REGISTRY_POLL", "5"))))
+        if os.environ.get("REVIEW_REMINDERS", "1") != "0":
+            await REMINDERS.start()
+        if webhook_base:
+            await run_webhook()
+        else:
+            jobs = [TENANTS.run()]
+            if os.environ.get("WEBAPP_PORT"):
+                jobs.append(run_webapp(int(os.environ["WEBAPP_PORT"])))
+            await asyncio.gather(*jobs)
+    finally:
+        if watch is not None:
+            watch.cancel()
+        await REMINDERS.close()
+        await LIFECYCLE.drain()
+        await TENANTS.close()
+        close_campaigns()
+        await LEADERBOARDS.close()
+        await RATINGS.close()
+        await EVENTS.close()
+        if snapshot:
+            save_snapshot(snapshot, STATE, HANDLED, LIFECYCLE, REVIEWS)
+        await STATE.close()
+        registry.close()
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
-        log.info("Stopped.")
+        pass
+    log.info("Stopped.")
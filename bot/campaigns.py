@@ -0,0 +1,269 @@
+# bot/campaigns.py
+# ==========================================================
+# Рассылки по индексу пользователей (user_index в базе STATE_DB)
+# Получатели читаются страницами по chat_id, отправка — пулом воркеров с
+# приоритетом bulk (интерактив идёт первым), прогресс — после каждой
+# страницы. Заблокировавшие бота помечаются blocked и больше не выбираются.
+# CLI: python -m bot.campaigns create --bot-id ID --segment done --level HARD --text "..."
+#      python -m bot.campaigns list | pause ID | resume ID
+# ==========================================================
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from .outbound import bulk_priority
+
+log = logging.getLogger("bot.campaigns")
+
+# Сегменты: условие на user_index.status
+SEGMENTS = {
+    "done": "status = 'done'",          # дошли до итога
+    "abandoned": "status = 'active'",   # бросили посреди теста
+    "all": "status != ''",
+}
+
+LEASE = 120.0  # сек: столько рассылка закреплена за процессом без продлений
+
+
+@dataclass
+class Campaign:
+    id: int
+    bot_id: int
+    segment: str
+    level: str
+    text: str
+    status: str
+    cursor: int
+    sent: int
+    failed: int
+    pruned: int
+
+
+class CampaignStore:
+    """Таблица campaigns рядом с user_index; соединение своё (WAL), одно на все
+    рассылки процесса."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.owner = f"{os.uname().nodename}:{os.getpid()}"
+        # одно соединение на все боты процесса: запросы из потоков — по очереди
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS campaigns ("
+            " id INTEGER PRIMARY KEY, bot_id INTEGER NOT NULL, segment TEXT NOT NULL,"
+            " level TEXT NOT NULL DEFAULT '', text TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'running', cursor INTEGER NOT NULL DEFAULT -9223372036854775808,"
+            " sent INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0,"
+            " pruned INTEGER NOT NULL DEFAULT 0, created INTEGER NOT NULL,"
+            " owner TEXT NOT NULL DEFAULT '', lease_until REAL NOT NULL DEFAULT 0)"
+        )
+
+    def create(self, bot_id: int, segment: str, text: str, level: str = "") -> int:
+        with self._lock:
+            if segment not in SEGMENTS:
+                raise ValueError(f"неизвестный сегмент {segment!r}: {', '.join(SEGMENTS)}")
+            cur = self._db.execute(
+                "INSERT INTO campaigns (bot_id, segment, level, text, created) VALUES (?, ?, ?, ?, ?)",
+                (bot_id, segment, level, text, int(time.time())),
+            )
+            return cur.lastrowid
+
+    def list(self, bot_id: Optional[int] = None) -> List[Campaign]:
+        with self._lock:
+            where, args = ("WHERE bot_id = ?", (bot_id,)) if bot_id is not None else ("", ())
+            rows = self._db.execute(
+                "SELECT id, bot_id, segment, level, text, status, cursor, sent, failed, pruned"
+                f" FROM campaigns {where} ORDER BY id", args,
+            ).fetchall()
+            return [Campaign(*r) for r in rows]
+
+    def set_status(self, campaign_id: int, status: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE campaigns SET status = ? WHERE id = ?", (status, campaign_id))
+
+    def claim(self, bot_id: int) -> Optional[Campaign]:
+        """Свободная (или своя) запущенная рассылка бота; аренда не даёт
+        двум воркерам слать одно и то же."""
+        with self._lock:
+            now = time.time()
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT id, bot_id, segment, level, text, status, cursor, sent, failed, pruned"
+                    " FROM campaigns WHERE bot_id = ? AND status = 'running'"
+                    " AND (lease_until < ? OR owner = ?) ORDER BY id LIMIT 1",
+                    (bot_id, now, self.owner),
+                ).fetchone()
+                if row:
+                    db.execute("UPDATE campaigns SET owner = ?, lease_until = ? WHERE id = ?",
+                               (self.owner, now + LEASE, row[0]))
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return Campaign(*row) if row else None
+
+    def recipients(self, c: Campaign, page: int) -> List[int]:
+        with self._lock:
+            sql = (f"SELECT chat_id FROM user_index WHERE bot_id = ? AND {SEGMENTS[c.segment]}"
+                   " AND blocked = 0 AND chat_id > ?")
+            args: list = [c.bot_id, c.cursor]
+            if c.level:
+                sql += " AND level = ?"
+                args.append(c.level)
+            sql += " ORDER BY chat_id LIMIT ?"
+            args.append(page)
+            return [r[0] for r in self._db.execute(sql, args)]
+
+    def checkpoint(self, c: Campaign, blocked: List[int]) -> None:
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN")
+            try:
+                if blocked:
+                    db.executemany(
+                        "UPDATE user_index SET blocked = 1 WHERE bot_id = ? AND chat_id = ?",
+                        [(c.bot_id, chat) for chat in blocked],
+                    )
+                # статус не трогаем: его мог поменять `pause` из CLI
+                db.execute(
+                    "UPDATE campaigns SET cursor = ?, sent = ?, failed = ?, pruned = ?,"
+                    " lease_until = ? WHERE id = ? AND owner = ?",
+                    (c.cursor, c.sent, c.failed, c.pruned, time.time() + LEASE, c.id, self.owner),
+                )
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def is_running(self, campaign_id: int) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+            return bool(row) and row[0] == "running"
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class CampaignRunner:
+    """Рассылки одного бота. Страница = единица прогресса: после сбоя
+    страница повторится целиком (at-least-once), остальные — нет."""
+
+    def __init__(self, store: CampaignStore, bot: Bot, workers: int = 8, page: int = 500):
+        self.store = store
+        self.bot = bot
+        self.workers = workers
+        self.page = page
+
+    async def _send(self, c: Campaign, chat_id: int, blocked: List[int]) -> None:
+        try:
+            await self.bot.send_message(chat_id, c.text)
+            c.sent += 1
+        except TelegramForbiddenError:
+            blocked.append(chat_id)  # бот заблокирован / пользователь удалён
+        except TelegramBadRequest as e:
+            if "chat not found" in (str(e) or "").lower():
+                blocked.append(chat_id)
+            else:
+                c.failed += 1
+        except Exception as e:
+            log.warning("campaign %s: send to %s failed: %s", c.id, chat_id, e)
+            c.failed += 1
+
+    async def run(self, c: Campaign) -> None:
+        log.info("campaign %s started at cursor %s", c.id, c.cursor)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        blocked: List[int] = []
+
+        async def worker():
+            with bulk_priority():
+                while True:
+                    chat_id = await queue.get()
+                    try:
+                        await self._send(c, chat_id, blocked)
+                    finally:
+                        queue.task_done()
+
+        pool = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            while True:
+                chats = await asyncio.to_thread(self.store.recipients, c, self.page)
+                if not chats:
+                    c.status = "done"
+                    await asyncio.to_thread(self.store.set_status, c.id, "done")
+                    break
+                for chat_id in chats:
+                    await queue.put(chat_id)
+                await queue.join()
+                c.cursor = chats[-1]
+                c.pruned += len(blocked)
+                await asyncio.to_thread(self.store.checkpoint, c, blocked)
+                blocked.clear()
+                if not await asyncio.to_thread(self.store.is_running, c.id):
+                    log.info("campaign %s paused at cursor %s", c.id, c.cursor)
+                    return
+        finally:
+            for t in pool:
+                t.cancel()
+        log.info("campaign %s done: sent %s, failed %s, pruned %s", c.id, c.sent, c.failed, c.pruned)
+
+    async def watch(self, interval: float = 30.0) -> None:
+        """Подхватывает новые и недоделанные (после рестарта) рассылки."""
+        while True:
+            try:
+                c = await asyncio.to_thread(self.store.claim, self.bot.id)
+                if c is not None:
+                    await self.run(c)
+                    continue
+            except Exception as e:
+                log.warning("campaign runner error: %s", e)
+            await asyncio.sleep(interval)
+
+
+# ---------- CLI ----------
+def main(argv: Optional[List[str]] = None) -> None:
+    p = argparse.ArgumentParser(prog="python -m bot.campaigns")
+    p.add_argument("--db", default=os.environ.get("STATE_DB"), help="база сессий (STATE_DB)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("create", help="новая рассылка; её подхватит запущенный бот")
+    c.add_argument("--bot-id", type=int, required=True)
+    c.add_argument("--segment", choices=sorted(SEGMENTS), required=True)
+    c.add_argument("--level", default="")
+    c.add_argument("--text", required=True)
+    ls = sub.add_parser("list")
+    ls.add_argument("--bot-id", type=int)
+    for name in ("pause", "resume"):
+        sub.add_parser(name).add_argument("id", type=int)
+    args = p.parse_args(argv)
+    if not args.db:
+        p.error("нужен --db или STATE_DB")
+
+    store = CampaignStore(args.db)
+    if args.cmd == "create":
+        print(store.create(args.bot_id, args.segment, args.text, args.level))
+    elif args.cmd == "list":
+        for x in store.list(args.bot_id):
+            print(f"{x.id:>4} bot={x.bot_id} {x.segment}/{x.level or '*'} {x.status:<8}"
+                  f" sent={x.sent} failed={x.failed} pruned={x.pruned}")
+    else:
+        store.set_status(args.id, "paused" if args.cmd == "pause" else "running")
+    store.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,79 @@
+# bot/chatlock.py
+# ==========================================================
+# Последовательная обработка апдейтов одного чата
+# Замок на (bot_id, chat_id) создаётся при первом апдейте и удаляется,
+# как только его никто не держит и не ждёт; разные чаты не блокируют друг друга.
+# ==========================================================
+
+import asyncio
+from typing import Dict, Hashable
+
+from aiogram import BaseMiddleware
+
+
+class _Slot:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # держит + ждут
+
+
+class KeyedLock:
+    """Словарь замков с подсчётом ссылок: памяти — по числу активных ключей."""
+
+    __slots__ = ("_slots", "acquired", "contended")
+
+    def __init__(self):
+        self._slots: Dict[Hashable, _Slot] = {}
+        self.acquired = 0
+        self.contended = 0  # сколько раз пришлось ждать
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    async def acquire(self, key: Hashable) -> None:
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _Slot()
+        slot.users += 1
+        if slot.lock.locked():
+            self.contended += 1
+        try:
+            await slot.lock.acquire()
+        except BaseException:
+            self._drop(key, slot)
+            raise
+        self.acquired += 1
+
+    def release(self, key: Hashable) -> None:
+        slot = self._slots[key]
+        slot.lock.release()
+        self._drop(key, slot)
+
+    def _drop(self, key: Hashable, slot: _Slot) -> None:
+        slot.users -= 1
+        if not slot.users:
+            del self._slots[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": len(self._slots), "acquired": self.acquired, "contended": self.contended}
+
+
+class ChatSerialMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: апдейты одного чата идут по одному,
+    в порядке прихода (asyncio.Lock честный — FIFO)."""
+
+    def __init__(self, locks: KeyedLock):
+        self.locks = locks
+
+    async def __call__(self, handler, event, data):
+        chat = data.get("event_chat")  # ставит встроенный UserContextMiddleware
+        if chat is None:
+            return await handler(event, data)
+        key = (data["bot"].id, chat.id)
+        await self.locks.acquire(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self.locks.release(key)
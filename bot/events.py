@@ -0,0 +1,260 @@
+# bot/events.py
+# ==========================================================
+# Журнал ответов: append-only файл из колоночных блоков
+# Запись — через буфер и фоновый сброс пачками, хендлер не ждёт диска.
+# CLI: python -m bot.events stats events.bin [events.bin.w1 ...] [--level A] [--top 20]
+# ==========================================================
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import asyncio
+import argparse
+import contextlib
+import logging
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger("bot.events")
+
+MAGIC = b"EVB1"
+_HEADER = struct.Struct("<4sI")
+
+# Колонки блока: имя, typecode array
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("bot_id", "q"),
+    ("user_id", "q"),
+    ("ts", "I"),          # unix-время, сек
+    ("level", "B"),       # код уровня, см. LEVEL_CODES
+    ("task", "I"),        # crc32(task id); имена — в <path>.tasks.json
+    ("chosen", "b"),      # индекс выбранного варианта, -1 если мусор
+    ("correct", "B"),
+    ("latency_ms", "I"),  # от отправки вопроса до ответа
+)
+
+LEVEL_CODES: Dict[str, int] = {"A": 0, "B": 1, "HARD": 2, "ADAPT": 3, "REVIEW": 4}
+LEVEL_NAMES: Dict[int, str] = {v: k for k, v in LEVEL_CODES.items()}
+
+def task_key(task_id: str) -> int:
+    return zlib.crc32(task_id.encode("utf-8"))
+
+
+# ---------- Запись ----------
+class NullEventLog:
+    def append(self, *args, **kwargs) -> None:
+        pass
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class EventLog(NullEventLog):
+    def __init__(self, path: str, flush_interval: float = 1.0,
+                 batch: int = 4096, max_pending: int = 1_000_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch = batch
+        self.max_pending = max_pending
+        # буфер сразу колоночный: массивы не отслеживаются GC и не плодят кортежи
+        self.pending: List[array] = self._empty()
+        self.pending_rows = 0
+        self.names: Dict[int, str] = self._load_names()
+        self._names_dirty = False
+        self.written = 0
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _empty() -> List[array]:
+        return [array(code) for _, code in COLUMNS]
+
+    def _load_names(self) -> Dict[int, str]:
+        with contextlib.suppress(FileNotFoundError, ValueError):
+            with open(self.path + ".tasks.json", encoding="utf-8") as f:
+                return {int(k): v for k, v in json.load(f).items()}
+        return {}
+
+    def append(self, bot_id: int, user_id: int, level: str, task_id: str,
+               chosen: int, correct: bool, latency: float) -> None:
+        """O(1), без ввода-вывода: строка уходит в буфер."""
+        key = task_key(task_id)
+        if key not in self.names:
+            self.names[key] = task_id
+            self._names_dirty = True
+        if self.pending_rows >= self.max_pending:
+            self.dropped += 1
+            return
+        c = self.pending
+        c[0].append(bot_id)
+        c[1].append(user_id)
+        c[2].append(int(time.time()))
+        c[3].append(LEVEL_CODES.get(level, 255))
+        c[4].append(key)
+        c[5].append(max(-1, min(chosen, 127)))
+        c[6].append(1 if correct else 0)
+        c[7].append(max(0, min(int(latency * 1000), 0xFFFFFFFF)))
+        self.pending_rows += 1
+        if self.pending_rows >= self.batch:
+            self._wakeup.set()
+
+    def _write(self, cols: List[array], n: int) -> None:
+        parts = [_HEADER.pack(MAGIC, n)] + [col.tobytes() for col in cols]
+        view = memoryview(b"".join(parts))  # блок целиком одной записью
+        with open(self.path, "ab", buffering=0) as f:
+            start = f.seek(0, os.SEEK_END)
+            try:
+                while view:
+                    view = view[f.write(view):]
+            except BaseException:
+                # диск кончился посреди блока: обрезаем хвост, иначе повтор
+                # лёг бы за битым блоком и read_blocks на нём бы остановился
+                with contextlib.suppress(OSError):
+                    f.truncate(start)
+                raise
+
+    def _write_names(self, names: Dict[int, str]) -> None:
+        tmp = self.path + ".tasks.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in names.items()}, f, ensure_ascii=False)
+        os.replace(tmp, self.path + ".tasks.json")
+
+    async def flush(self) -> int:
+        async with self._lock:
+            n = self.pending_rows
+            if not n:
+                return 0
+            cols, self.pending, self.pending_rows = self.pending, self._empty(), 0
+            names = dict(self.names) if self._names_dirty else None
+            self._names_dirty = False
+            try:
+                await asyncio.to_thread(self._write, cols, n)
+            except Exception:
+                # диск полон и т.п.: блок — обратно в начало буфера (порядок строк
+                # сохраняется), повторим в следующий раз
+                for col, newer in zip(cols, self.pending):
+                    col.extend(newer)
+                self.pending = cols
+                self.pending_rows += n
+                self._names_dirty = self._names_dirty or names is not None
+                raise
+            self.written += n
+            if names is not None:
+                try:
+                    await asyncio.to_thread(self._write_names, names)
+                except Exception:
+                    self._names_dirty = True
+                    raise
+            return n
+
+    async def _loop(self) -> None:
+        while not self._closing:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning("event log flush failed: %s", e)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        # без cancel(): wait_for в 3.11 может проглотить отмену
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+def make_event_log(path: Optional[str]) -> NullEventLog:
+    return EventLog(path) if path else NullEventLog()
+
+
+# ---------- Чтение ----------
+def read_blocks(path: str) -> Iterator[Dict[str, array]]:
+    sizes = [array(code).itemsize for _, code in COLUMNS]
+    with open(path, "rb") as f:
+        while True:
+            head = f.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                return
+            magic, n = _HEADER.unpack(head)
+            if magic != MAGIC:
+                raise ValueError(f"{path}: битый блок на позиции {f.tell() - _HEADER.size}")
+            block = {}
+            for (name, code), size in zip(COLUMNS, sizes):
+                col = array(code)
+                col.frombytes(f.read(n * size))
+                block[name] = col
+            if len(block[COLUMNS[-1][0]]) < n:
+                return  # недописанный хвост после аварийной остановки
+            yield block
+
+
+def task_accuracy(path: str, level: Optional[str] = None) -> Dict[int, Tuple[int, int]]:
+    """crc32(task id) -> (ответов, верных)."""
+    want = LEVEL_CODES.get(level) if level else None
+    totals: Counter = Counter()
+    right: Counter = Counter()
+    for b in read_blocks(path):
+        tasks, correct = b["task"], b["correct"]
+        if want is not None:
+            pairs = [(t, c) for t, c, lv in zip(tasks, correct, b["level"]) if lv == want]
+        else:
+            pairs = zip(tasks, correct)
+        counts = Counter(pairs)
+        for (t, c), n in counts.items():
+            totals[t] += n
+            if c:
+                right[t] += n
+    return {t: (n, right[t]) for t, n in totals.items()}
+
+
+def _cmd_stats(args) -> None:
+    t0 = time.perf_counter()
+    acc: Dict[int, Tuple[int, int]] = {}
+    names: Dict[int, str] = {}
+    for path in args.paths:
+        for key, (n, r) in task_accuracy(path, args.level).items():
+            n0, r0 = acc.get(key, (0, 0))
+            acc[key] = (n0 + n, r0 + r)
+        with contextlib.suppress(FileNotFoundError):
+            with open(path + ".tasks.json", encoding="utf-8") as f:
+                names.update({int(k): v for k, v in json.load(f).items()})
+    rows = sorted(acc.items(), key=lambda kv: kv[1][1] / kv[1][0])
+    total = sum(n for n, _ in acc.values())
+    print(f"{'task':<12}{'answers':>10}{'accuracy':>10}")
+    for key, (n, r) in rows[: args.top]:
+        print(f"{names.get(key, hex(key)):<12}{n:>10}{r / n:>10.1%}")
+    print(f"\n{total} answers, {len(acc)} tasks, {time.perf_counter() - t0:.2f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    p = argparse.ArgumentParser(prog="python -m bot.events")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("stats", help="точность по заданиям, худшие сверху")
+    s.add_argument("paths", nargs="+")
+    s.add_argument("--level", choices=sorted(LEVEL_CODES))
+    s.add_argument("--top", type=int, default=20)
+    s.set_defaults(func=_cmd_stats)
+    args = p.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
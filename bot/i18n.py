@@ -0,0 +1,203 @@
+# bot/i18n.py
+# ==========================================================
+# Языки интерфейса: строки из bot/locales/<lang>.json
+# Каталог собирается один раз при старте в Texts: статичные строки
+# интернированы, клавиатуры построены заранее, шаблоны с небольшим набором
+# значений (номер вопроса, счёт) отдаются готовыми из словаря, остальные —
+# str.format, привязанный к строке каталога. Язык — по language_code
+# пользователя (LocaleMiddleware -> data["tr"]) и хранится в сессии для
+# напоминаний. Задания переводятся в банке: bot/banks/<lang>/*.json.
+# ==========================================================
+
+import os
+import sys
+import glob
+import json
+import string
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+LOCALE_DIR = os.environ.get("LOCALE_DIR") or os.path.join(os.path.dirname(__file__), "locales")
+BASE_LOCALE = "ru"  # язык bot/banks/*.json; его каталог — эталон ключей
+DEFAULT_LOCALE = os.environ.get("DEFAULT_LOCALE", BASE_LOCALE)  # language_code не пришёл
+FALLBACK_LOCALE = os.environ.get("FALLBACK_LOCALE", "en")      # языка нет среди каталогов
+
+
+class LocaleError(ValueError):
+    pass
+
+
+def _plural_ru(n: int) -> int:
+    if n % 10 == 1 and n % 100 != 11:
+        return 0
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return 1
+    return 2
+
+
+# правило -> (номер формы по числу, сколько форм)
+PLURALS: Dict[str, Tuple[Callable[[int], int], int]] = {
+    "ru": (_plural_ru, 3),
+    "en": (lambda n: 0 if n == 1 else 1, 2),
+}
+
+# кнопки уровней в порядке показа
+PICKER_LEVELS = ("A", "B", "HARD", "ADAPT")
+
+
+def _fields(s: str) -> Set[str]:
+    return {name for _, name, _, _ in string.Formatter().parse(s) if name is not None}
+
+
+def load_catalogs(directory: str = LOCALE_DIR) -> Dict[str, Dict]:
+    """Все <lang>.json; ключи и подстановки каждого — как в каталоге BASE_LOCALE."""
+    catalogs: Dict[str, Dict] = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            try:
+                catalogs[os.path.basename(path)[:-5]] = json.load(f)
+            except ValueError as e:
+                raise LocaleError(f"{path}: {e}") from None
+    base = catalogs.get(BASE_LOCALE)
+    if base is None:
+        raise LocaleError(f"{directory}: нет каталога {BASE_LOCALE}.json")
+    for code, cat in catalogs.items():
+        where = os.path.join(directory, f"{code}.json")
+        if cat.keys() != base.keys():
+            diff = sorted(cat.keys() ^ base.keys())
+            raise LocaleError(f"{where}: ключи расходятся с {BASE_LOCALE}.json: {', '.join(diff)}")
+        rule = PLURALS.get(cat["plural"])
+        if rule is None:
+            raise LocaleError(f"{where}: plural — одно из {', '.join(PLURALS)}")
+        for key, value in cat.items():
+            if isinstance(value, list):
+                if len(value) != rule[1] or not all(isinstance(v, str) for v in value):
+                    raise LocaleError(f"{where}: {key} — {rule[1]} формы по числу")
+            elif not isinstance(value, str):
+                raise LocaleError(f"{where}: {key} — строка")
+            elif _fields(value) != _fields(base[key]):
+                raise LocaleError(f"{where}: {key}: подстановки {sorted(_fields(base[key]))}")
+    return catalogs
+
+
+def _kb(rows: Iterable[Tuple[str, str]]) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=text, callback_data=data)] for text, data in rows])
+
+
+class Texts:
+    """Собранный каталог одного языка. Ключ каталога — атрибут: строка без
+    подстановок — сама строка, с подстановками — её str.format, формы по
+    числу — кортеж (см. count)."""
+
+    def __init__(self, code: str, catalog: Dict):
+        self.code = sys.intern(code)
+        self._form, _ = PLURALS[catalog["plural"]]
+        for key, value in catalog.items():
+            if isinstance(value, list):
+                value = tuple(sys.intern(v) for v in value)
+            elif _fields(value):
+                value = value.format
+            else:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        # готовые клавиатуры: объект на язык, а не на сообщение
+        head = [(self.again_button, "again")]
+        tail = [(self.top_button, "top"), (self.levelpick_button, "levelpick"),
+                (self.share_button, "share")]
+        self.restart_kb = _kb(head + tail)
+        self.restart_review_kb = _kb(head + [(self.review_button, "review")] + tail)
+        self.remind_kb = _kb([(self.remind_button, "review")])
+        self._pickers: Dict[FrozenSet[str], InlineKeyboardMarkup] = {}
+        self._shares: Dict[str, InlineKeyboardMarkup] = {}
+        # подстановки с малым набором значений — строка на значение
+        self._intros: Dict[int, str] = {}
+        self._questions: Dict[Tuple[int, int], str] = {}
+        self._summaries: Dict[Tuple[int, int, bool], str] = {}
+
+    def __repr__(self) -> str:
+        return f"Texts({self.code!r})"
+
+    # ---------- числа ----------
+    def count(self, n: int, forms: Tuple[str, ...]) -> str:
+        return f"{n} {forms[self._form(n)]}"
+
+    def until(self, seconds: float) -> str:
+        if seconds < 3600:
+            return self.in_minutes(n=max(1, int(seconds // 60)))
+        if seconds < 86400:
+            return self.in_hours(n=int(seconds // 3600))
+        return self.in_days(days=self.count(round(seconds / 86400), self.days))
+
+    # ---------- шаблоны ----------
+    def intro_text(self, total: int) -> str:
+        text = self._intros.get(total)
+        if text is None:
+            text = self._intros[total] = self.intro(total=self.count(total, self.tasks),
+                                                    levels=self.levels_line)
+        return text
+
+    def question_text(self, pos: int, total: int, task_html: str) -> str:
+        key = (pos, total)
+        head = self._questions.get(key)
+        if head is None:
+            head = self._questions[key] = self.question(pos=pos, total=total)
+        return head + task_html
+
+    def summary_head(self, score: int, total: int, review: bool = False) -> str:
+        key = (score, total, review)
+        text = self._summaries.get(key)
+        if text is None:
+            tpl = self.review_summary if review else self.summary
+            text = self._summaries[key] = tpl(score=score, total=total)
+        return text
+
+    # ---------- клавиатуры ----------
+    def picker(self, allowed: FrozenSet[str]) -> InlineKeyboardMarkup:
+        kb = self._pickers.get(allowed)
+        if kb is None:
+            kb = self._pickers[allowed] = _kb(
+                (getattr(self, f"level_{lv}"), f"setlvl:{lv}") for lv in PICKER_LEVELS if lv in allowed)
+        return kb
+
+    def share_kb(self, username: str) -> InlineKeyboardMarkup:
+        kb = self._shares.get(username)
+        if kb is None:
+            kb = self._shares[username] = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(
+                text=self.share_bot_button, url=f"https://t.me/{username}?start=share")]])
+        return kb
+
+
+CATALOGS = load_catalogs()
+TEXTS: Dict[str, Texts] = {code: Texts(code, cat) for code, cat in CATALOGS.items()}
+if DEFAULT_LOCALE not in TEXTS or FALLBACK_LOCALE not in TEXTS:
+    raise LocaleError(f"DEFAULT_LOCALE/FALLBACK_LOCALE: одно из {', '.join(TEXTS)}")
+
+
+@lru_cache(maxsize=256)
+def resolve(language_code: Optional[str]) -> str:
+    """language_code Telegram ("en", "pt-br", …) -> язык каталога."""
+    if not language_code:
+        return DEFAULT_LOCALE
+    code = language_code.split("-", 1)[0].lower()
+    if code in TEXTS:
+        return code
+    # языки, на которых обычно читают по-русски
+    return BASE_LOCALE if code in ("uk", "be", "kk", "ky", "uz") else FALLBACK_LOCALE
+
+
+def texts(code: Optional[str]) -> Texts:
+    """Каталог по коду из сессии (пустой — DEFAULT_LOCALE)."""
+    return TEXTS.get(code) or TEXTS[DEFAULT_LOCALE]
+
+
+class LocaleMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: data["tr"] — каталог языка пользователя."""
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        data["tr"] = TEXTS[resolve(user.language_code if user is not None else None)]
+        return await handler(event, data)
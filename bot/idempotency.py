@@ -0,0 +1,93 @@
+# bot/idempotency.py
+# ==========================================================
+# Ограниченное хранилище идемпотентности с TTL
+# Ключ (bot_id, user_id, message_id, seq) упаковывается в одно int
+# ==========================================================
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Telegram id помещаются в 64 бита, message_id — в 32, seq (номер вопроса) — в 16
+_MSG_SHIFT = 16
+_USER_SHIFT = 48
+_BOT_SHIFT = 112
+
+
+def pack_key(bot_id: int, user_id: int, message_id: int, seq: int = 0) -> int:
+    return (bot_id << _BOT_SHIFT) | (user_id << _USER_SHIFT) | (message_id << _MSG_SHIFT) | seq
+
+
+class SeenCache:
+    """LRU по времени вставки: запись живёт не дольше ttl секунд,
+    а при переполнении вытесняется самая старая."""
+
+    __slots__ = ("ttl", "max_size", "hits", "misses", "evictions", "_clock", "_items")
+
+    def __init__(self, ttl: float = 3600.0, max_size: int = 200_000,
+                 clock: Optional[Callable[[], float]] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock or time.monotonic
+        # packed key -> момент вставки; порядок = порядок вставки
+        self._items: "OrderedDict[int, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _expire(self, now: float) -> None:
+        items = self._items
+        deadline = now - self.ttl
+        while items:
+            k, ts = next(iter(items.items()))
+            if ts > deadline:
+                break
+            del items[k]
+            self.evictions += 1
+
+    def check_and_add(self, bot_id: int, user_id: int, message_id: int, seq: int = 0) -> bool:
+        """True — ключ уже видели (дубль), False — ключ новый и записан."""
+        now = self._clock()
+        self._expire(now)
+        k = pack_key(bot_id, user_id, message_id, seq)
+        if k in self._items:
+            self.hits += 1
+            return True
+        self.misses += 1
+        self._items[k] = now
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def export(self) -> List[Tuple[int, float]]:
+        """(ключ, возраст в секундах) — часы другого процесса не совпадут."""
+        now = self._clock()
+        self._expire(now)
+        return [(k, now - ts) for k, ts in self._items.items()]
+
+    def restore(self, entries: Iterable[Tuple[int, float]]) -> int:
+        """Вставка в том же порядке (от старых к новым); протухшие пропускаются."""
+        now = self._clock()
+        n = 0
+        for k, age in entries:
+            if age < self.ttl and k not in self._items:
+                self._items[k] = now - age
+                n += 1
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return n
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,52 @@
+# bot/identity.py
+# ==========================================================
+# Идентичность бота (id, username, политика уровней) — один раз на бота,
+# дальше хендлеры получают её готовой через data["me"]
+# ==========================================================
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot
+
+
+@dataclass(frozen=True, slots=True)
+class BotIdentity:
+    id: int
+    username: str
+    policy: Dict[str, object]
+
+    @property
+    def compact(self) -> bool:
+        return self.policy.get("flow") == "compact"
+
+
+class IdentityMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: getMe делается один раз на бота."""
+
+    def __init__(self, policy_for: Callable[[int], Dict[str, object]]):
+        self.policy_for = policy_for
+        self.cache: Dict[int, BotIdentity] = {}
+
+    async def resolve(self, bot: Bot) -> BotIdentity:
+        ident = self.cache.get(bot.id)
+        if ident is None:
+            me = await bot.me()
+            ident = self.cache[bot.id] = BotIdentity(
+                me.id, me.username or "", self.policy_for(me.id)
+            )
+        return ident
+
+    def forget(self, bot_id: Optional[int] = None) -> None:
+        if bot_id is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(bot_id, None)
+
+    async def __call__(self, handler, event, data):
+        bot = data["bot"]
+        ident = self.cache.get(bot.id)
+        if ident is None:
+            ident = await self.resolve(bot)
+        data["me"] = ident
+        return await handler(event, data)
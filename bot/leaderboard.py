@@ -0,0 +1,271 @@
+# bot/leaderboard.py
+# ==========================================================
+# Таблицы лидеров: по уровню и по боту, за неделю и за всё время
+# Очки — сумма верных ответов в завершённых тестах. Ранг и процентиль —
+# дерево Фенвика над гистограммой очков: O(log V) на обновление и запрос,
+# без сортировки пользователей. SQLite (LEADERBOARD_DB) — пакетная запись.
+# ==========================================================
+
+import time
+import heapq
+import asyncio
+import contextlib
+import logging
+import sqlite3
+from array import array
+from typing import Dict, List, Optional, Set, Tuple
+
+log = logging.getLogger("bot.leaderboard")
+
+ALL_TIME = "all"
+ANY_LEVEL = "*"
+
+# (bot_id, level, period)
+BoardKey = Tuple[int, str, str]
+
+
+def week_of(ts: Optional[float] = None) -> str:
+    return time.strftime("%G-W%V", time.gmtime(ts))
+
+
+class Fenwick:
+    """Счётчики по значениям 0..size-1; растёт удвоением."""
+
+    __slots__ = ("size", "tree", "total")
+
+    def __init__(self, size: int = 64):
+        self.size = size
+        self.tree = array("I", bytes(4 * (size + 1)))
+        self.total = 0
+
+    def _grow(self, value: int) -> None:
+        size = self.size
+        while size <= value:
+            size *= 2
+        counts = [self.count_at(v) for v in range(self.size)]
+        self.size, self.tree, self.total = size, array("I", bytes(4 * (size + 1))), 0
+        for v, n in enumerate(counts):
+            if n:
+                self.add(v, n)
+
+    def add(self, value: int, delta: int) -> None:
+        if value >= self.size:
+            self._grow(value)
+        self.total += delta
+        i = value + 1
+        tree = self.tree
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, value: int) -> int:
+        """Сколько значений ≤ value."""
+        i = min(value + 1, self.size)
+        s = 0
+        tree = self.tree
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def count_at(self, value: int) -> int:
+        return self.prefix(value) - (self.prefix(value - 1) if value else 0)
+
+    def kth(self, k: int) -> int:
+        """Наименьшее значение v, при котором prefix(v) ≥ k (1-based)."""
+        pos, step = 0, 1 << (self.size.bit_length() - 1)
+        tree = self.tree
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and tree[nxt] < k:
+                pos = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return pos  # индекс дерева pos + 1 -> значение pos
+
+
+class Board:
+    __slots__ = ("values", "members", "hist")
+
+    def __init__(self):
+        self.values: Dict[int, int] = {}           # user_id -> очки
+        self.members: Dict[int, Set[int]] = {}     # очки -> пользователи
+        self.hist = Fenwick()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def set(self, user_id: int, value: int) -> None:
+        old = self.values.get(user_id)
+        if old is not None:
+            self.hist.add(old, -1)
+            group = self.members[old]
+            group.discard(user_id)
+            if not group:
+                del self.members[old]
+        self.values[user_id] = value
+        self.hist.add(value, 1)
+        self.members.setdefault(value, set()).add(user_id)
+
+    def add(self, user_id: int, delta: int) -> int:
+        value = self.values.get(user_id, 0) + delta
+        self.set(user_id, value)
+        return value
+
+    def rank(self, user_id: int) -> Tuple[int, int]:
+        """(место, участников); место 1 — лучший, равные очки делят место."""
+        n = self.hist.total
+        value = self.values.get(user_id)
+        if value is None:
+            return 0, n
+        return n - self.hist.prefix(value) + 1, n
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        out: List[Tuple[int, int]] = []
+        total = self.hist.total
+        k = total
+        while k > 0 and len(out) < n:
+            value = self.hist.kth(k)  # k-е по возрастанию = (total-k+1)-е сверху
+            group = self.members[value]
+            out.extend((uid, value) for uid in heapq.nsmallest(n - len(out), group))
+            k -= len(group)
+        return out[:n]
+
+
+class Leaderboards:
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 2.0, shared: bool = False):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.shared = shared  # в базу пишут и другие процессы — перечитываем после сброса
+        self.boards: Dict[BoardKey, Board] = {}
+        self.names: Dict[Tuple[int, int], str] = {}
+        self.pending: Dict[Tuple[BoardKey, int], int] = {}  # дельты для базы
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS leaderboard ("
+                " bot_id INTEGER NOT NULL, level TEXT NOT NULL, period TEXT NOT NULL,"
+                " user_id INTEGER NOT NULL, value INTEGER NOT NULL, name TEXT NOT NULL DEFAULT '',"
+                " PRIMARY KEY (bot_id, level, period, user_id)) WITHOUT ROWID"
+            )
+            self._apply(*self._read())
+
+    def _read(self) -> Tuple[Dict[BoardKey, Board], Dict[Tuple[int, int], str]]:
+        """Таблицы из базы — в потоке; присваивает их _apply() в цикле событий."""
+        boards: Dict[BoardKey, Board] = {}
+        names: Dict[Tuple[int, int], str] = {}
+        rows = self._db.execute(
+            "SELECT bot_id, level, period, user_id, value, name FROM leaderboard"
+            " WHERE period IN (?, ?)", (ALL_TIME, week_of()),
+        )
+        for bot_id, level, period, user_id, value, name in rows:
+            board = boards.get((bot_id, level, period))
+            if board is None:
+                board = boards[(bot_id, level, period)] = Board()
+            board.set(user_id, value)
+            if name:
+                names[(bot_id, user_id)] = name
+        return boards, names
+
+    def _apply(self, boards: Dict[BoardKey, Board], names: Dict[Tuple[int, int], str]) -> None:
+        # результаты, записанные после чтения, в базе ещё нет — докладываем их
+        for ((b, lv, p), uid), delta in self.pending.items():
+            board = boards.get((b, lv, p))
+            if board is None:
+                board = boards[(b, lv, p)] = Board()
+            board.add(uid, delta)
+        self.names.update(names)
+        self.boards = boards
+
+    def board(self, bot_id: int, level: str, period: str = ALL_TIME) -> Board:
+        key = (bot_id, level, period)
+        board = self.boards.get(key)
+        if board is None:
+            board = self.boards[key] = Board()
+            if period != ALL_TIME:
+                self._drop_old_weeks(period)
+        return board
+
+    def _drop_old_weeks(self, current: str) -> None:
+        for key in [k for k in self.boards if k[2] not in (ALL_TIME, current)]:
+            del self.boards[key]
+
+    def record(self, bot_id: int, user_id: int, level: str, score: int, name: str = "") -> None:
+        """Завершённый тест: O(log V) на каждую из четырёх таблиц."""
+        week = week_of()
+        if name:
+            self.names[(bot_id, user_id)] = name
+        for lv in (level, ANY_LEVEL):
+            for period in (ALL_TIME, week):
+                key = (bot_id, lv, period)
+                self.board(*key).add(user_id, score)
+                if self._db is not None:
+                    pk = (key, user_id)
+                    self.pending[pk] = self.pending.get(pk, 0) + score
+
+    def name(self, bot_id: int, user_id: int) -> str:
+        return self.names.get((bot_id, user_id)) or str(user_id)
+
+    # ---------- запись ----------
+    def _write(self, rows) -> None:
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            # дельты, а не итог: так несколько воркеров не затирают друг друга
+            db.executemany(
+                "INSERT INTO leaderboard (bot_id, level, period, user_id, value, name)"
+                " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (bot_id, level, period, user_id)"
+                " DO UPDATE SET value = value + excluded.value,"
+                " name = CASE WHEN excluded.name != '' THEN excluded.name ELSE name END",
+                rows,
+            )
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if self._db is None or not self.pending:
+                return 0
+            pending, self.pending = self.pending, {}
+            rows = [(b, lv, p, uid, delta, self.names.get((b, uid), ""))
+                    for ((b, lv, p), uid), delta in pending.items()]
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception:
+                for k, v in pending.items():
+                    self.pending[k] = self.pending.get(k, 0) + v
+                raise
+            if self.shared:
+                self._apply(*await asyncio.to_thread(self._read))
+            return len(rows)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning("leaderboard flush failed: %s", e)
+
+    async def start(self) -> None:
+        if self._task is None and self._db is not None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # отмена не останавливает запись в потоке — ждём её конца под замком
+            async with self._lock:
+                self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
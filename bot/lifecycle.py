@@ -0,0 +1,176 @@
+# bot/lifecycle.py
+# ==========================================================
+# Остановка и рестарт без потерь
+# SIGTERM/SIGINT -> приём апдейтов прекращается (polling/uvicorn), начатые
+# апдейты дорабатывают не дольше SHUTDOWN_TIMEOUT, затем снимок: сессии,
+# которых нет на диске, ключи идемпотентности и последний update_id по ботам
+# (STATE_SNAPSHOT). При старте снимок читается; накопившиеся за рестарт
+# апдейты обрабатываются, уже обработанные — пропускаются. Метка update_id
+# двигается по завершённым апдейтам, а не по принятым: оборванный по таймауту
+# апдейт (и всё, что после него) после рестарта обработается заново.
+# С формата 2 в снимке и колесо напоминаний о повторении (bot/review.py).
+# ==========================================================
+
+import os
+import time
+import zlib
+import heapq
+import signal
+import asyncio
+import marshal
+import logging
+import contextlib
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from .idempotency import SeenCache
+from .review import ReviewWheel
+from .state import StateStore, level_names
+
+log = logging.getLogger("bot.lifecycle")
+
+SNAPSHOT_FORMAT = 2  # 1 — без колеса напоминаний, читается
+
+
+class Lifecycle(BaseMiddleware):
+    """Outer-middleware на dp.update (самое внешнее): считает апдейты в работе
+    и отбрасывает те, что прошлый процесс уже обработал."""
+
+    def __init__(self, drain_timeout: float = 25.0):
+        self.drain_timeout = drain_timeout
+        self.inflight = 0
+        # bot_id -> наибольший update_id, до которого всё принятое обработано
+        self.last_update: Dict[int, int] = {}
+        self.replayed: Dict[int, int] = {}     # то же из снимка: до него — повторы
+        self._open: Dict[int, List[int]] = {}  # bot_id -> куча принятых update_id
+        self._closed: Dict[int, Set[int]] = {}  # …завершённые, но ещё в куче
+        self.skipped = 0
+        self.stopping = False
+        self._stoppers: List[Callable[[], Optional[Awaitable[None]]]] = []
+        self._idle: Optional[asyncio.Event] = None
+
+    async def __call__(self, handler, event: Update, data):
+        bot_id = data["bot"].id
+        uid = event.update_id
+        if uid <= self.replayed.get(bot_id, -1):
+            self.skipped += 1
+            return None
+        heapq.heappush(self._open.setdefault(bot_id, []), uid)
+        self.inflight += 1
+        if self._idle is not None:
+            self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self._finish(bot_id, uid)
+            self.inflight -= 1
+            if not self.inflight and self._idle is not None:
+                self._idle.set()
+
+    def _finish(self, bot_id: int, uid: int) -> None:
+        # метка — до первого ещё не завершённого апдейта бота
+        heap = self._open[bot_id]
+        closed = self._closed.setdefault(bot_id, set())
+        closed.add(uid)
+        last = self.last_update.get(bot_id, -1)
+        while heap and heap[0] in closed:
+            top = heapq.heappop(heap)
+            closed.discard(top)
+            if top > last:
+                last = top
+        self.last_update[bot_id] = last
+
+    # ---------- остановка ----------
+    def on_stop(self, stopper: Callable[[], Optional[Awaitable[None]]]) -> None:
+        """Как прекратить приём: dp.stop_polling, server.should_exit = True, …"""
+        self._stoppers.append(stopper)
+        if self.stopping:
+            self._call(stopper)
+
+    def _call(self, stopper) -> None:
+        res = stopper()
+        if asyncio.iscoroutine(res):
+            fut = asyncio.ensure_future(res)
+            # stop_polling бросает RuntimeError, если polling ещё не запущен
+            fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def request_stop(self, sig: Optional[int] = None) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        log.info("stopping (%s): intake closed, %d update(s) in flight",
+                 signal.Signals(sig).name if sig else "request", self.inflight)
+        for stopper in self._stoppers:
+            self._call(stopper)
+
+    def install_signals(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            with contextlib.suppress(NotImplementedError, AttributeError):
+                loop.add_signal_handler(sig, self.request_stop, sig)
+
+    async def drain(self) -> int:
+        """Ждёт конца начатых апдейтов; возвращает, сколько не успело."""
+        if self.inflight:
+            self._idle = self._idle or asyncio.Event()
+            self._idle.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._idle.wait(), self.drain_timeout)
+        if self.inflight:
+            log.warning("drain timeout: %d update(s) cut off", self.inflight)
+        return self.inflight
+
+
+# ---------- Снимок ----------
+def save_snapshot(path: str, store: StateStore, seen: SeenCache, lifecycle: Lifecycle,
+                  wheel: Optional[ReviewWheel] = None) -> int:
+    """zlib(marshal(...)) во временный файл и os.replace — снимок либо целый, либо старый."""
+    t0 = time.perf_counter()
+    sessions = [(b, c, raw) for (b, c), raw in store.export()]
+    payload = (SNAPSHOT_FORMAT, level_names(), sessions, seen.export(),
+               dict(lifecycle.last_update), time.time(), wheel.export() if wheel is not None else [])
+    data = zlib.compress(marshal.dumps(payload), 1)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    log.info("snapshot: %d session(s), %d seen key(s), %d KiB in %.0f ms",
+             len(sessions), len(payload[3]), len(data) // 1024, (time.perf_counter() - t0) * 1e3)
+    return len(data)
+
+
+def load_snapshot(path: str, store: StateStore, seen: SeenCache, lifecycle: Lifecycle,
+                  wheel: Optional[ReviewWheel] = None) -> bool:
+    """Снимок читается один раз и удаляется: после падения старые сессии
+    не должны вернуться поверх новых."""
+    t0 = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            payload = marshal.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError, EOFError, TypeError, zlib.error) as e:
+        log.warning("snapshot %s unreadable, ignored: %s", path, e)
+        return False
+    finally:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+    if payload[0] not in (1, SNAPSHOT_FORMAT):
+        log.warning("snapshot %s: format %s, expected %s — ignored", path, payload[0], SNAPSHOT_FORMAT)
+        return False
+    _, levels, sessions, keys, marks, saved_at = payload[:6]
+    if wheel is not None and len(payload) > 6:
+        wheel.restore(payload[6])
+    n = store.restore((((b, c), raw) for b, c, raw in sessions), levels)
+    # часы идемпотентности шли и пока процесса не было
+    gap = max(0.0, time.time() - saved_at)
+    k = seen.restore((key, age + gap) for key, age in keys)
+    if gap < 86400:
+        # после недели тишины Telegram начинает update_id заново — метки старше суток не берём
+        lifecycle.replayed.update(marks)
+        lifecycle.last_update.update(marks)
+    log.info("snapshot restored: %d session(s), %d seen key(s) in %.0f ms (saved %.0fs ago)",
+             n, k, (time.perf_counter() - t0) * 1e3, gap)
+    return True
@@ -0,0 +1,177 @@
+# bot/metrics.py
+# ==========================================================
+# Метрики в текстовом формате Prometheus, без внешних зависимостей
+# Латентность хендлеров и вызовов Bot API, ошибки, завершённые тесты
+# ==========================================================
+
+import time
+import logging
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from aiohttp import web
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+log = logging.getLogger("bot.metrics")
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels, n: float = 1) -> None:
+        key = tuple(str(v) for v in labels)
+        self.values[key] = self.values.get(key, 0) + n
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self.values.items()):
+            out.append(f"{self.name}{_fmt_labels(self.label_names, key)} {v:g}")
+        return out
+
+
+class _HistChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        self.children: Dict[Tuple[str, ...], _HistChild] = {}
+
+    def labels(self, *values) -> _HistChild:
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = _HistChild(self.buckets)
+        return child
+
+    def render(self) -> List[str]:
+        n = self.name
+        out = [f"# HELP {n} {self.help}", f"# TYPE {n} histogram"]
+        for key, ch in sorted(self.children.items()):
+            acc = 0
+            for bound, c in zip(self.buckets, ch.counts):
+                acc += c
+                le = 'le="%g"' % bound
+                out.append(f"{n}_bucket{_fmt_labels(self.label_names, key, le)} {acc}")
+            le = 'le="+Inf"'
+            out.append(f"{n}_bucket{_fmt_labels(self.label_names, key, le)} {ch.count}")
+            out.append(f"{n}_sum{_fmt_labels(self.label_names, key)} {ch.sum:.6f}")
+            out.append(f"{n}_count{_fmt_labels(self.label_names, key)} {ch.count}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[object] = []
+        # коллекторы отдают (имя, тип, help, имена меток, {значения меток: число})
+        self.collectors: List[Callable[[], Iterable[tuple]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn) -> None:
+        self.collectors.append(fn)
+
+    def render(self) -> str:
+        out: List[str] = []
+        for m in self.metrics:
+            out.extend(m.render())
+        for fn in self.collectors:
+            for name, kind, help, label_names, samples in fn():
+                out.append(f"# HELP {name} {help}")
+                out.append(f"# TYPE {name} {kind}")
+                for key, v in samples.items():
+                    out.append(f"{name}{_fmt_labels(label_names, key)} {v:g}")
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.register(Histogram(
+    "bot_handler_seconds", "Handler latency", ("handler",)))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    "bot_handler_errors_total", "Unhandled handler exceptions", ("handler", "error")))
+API_LATENCY = REGISTRY.register(Histogram(
+    "bot_telegram_api_seconds", "Bot API call duration", ("method",)))
+API_ERRORS = REGISTRY.register(Counter(
+    "bot_telegram_api_errors_total", "Bot API call errors", ("method", "error")))
+QUIZ_COMPLETED = REGISTRY.register(Counter(
+    "bot_quiz_completed_total", "Finished quizzes", ("bot_id", "level")))
+
+
+# ---------- Middleware ----------
+class HandlerMetrics(BaseMiddleware):
+    """Inner-middleware для dp.message / dp.callback_query: имя хендлера
+    берётся из data["handler"], который к этому моменту уже выбран."""
+
+    async def __call__(self, handler, event, data):
+        h = data.get("handler")
+        name = h.callback.__name__ if h is not None else "unknown"
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_LATENCY.labels(name).observe(time.perf_counter() - t0)
+
+
+class ApiMetrics(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        t0 = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_LATENCY.labels(name).observe(time.perf_counter() - t0)
+
+
+# ---------- /metrics для polling-режима ----------
+async def start_metrics_server(port: int) -> web.AppRunner:
+    async def metrics(_request):
+        return web.Response(text=REGISTRY.render(), content_type="text/plain")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    log.info("Metrics on :%d/metrics", port)
+    return runner
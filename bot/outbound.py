@@ -0,0 +1,224 @@
+# bot/outbound.py
+# ==========================================================
+# Планировщик исходящих запросов (middleware сессии aiogram)
+# Токен-бакеты: глобальный ~30/с и на чат ~1/с; очередь с приоритетом;
+# TelegramRetryAfter обрабатывается здесь и только здесь.
+# Бакет чата расходуют только рассылки и напоминания (bulk_priority): ответы
+# пользователю идут в его темпе (а его темп держит входящий троттлинг) и ждут
+# на бакете чата лишь паузу после 429 — иначе ответ на тап (правка кнопок и
+# два сообщения) стоял бы ~2 с под блокировкой чата.
+# ==========================================================
+
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import logging
+import time
+from typing import Dict, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery
+
+log = logging.getLogger("bot.outbound")
+
+# Приоритеты: меньше — раньше
+PRIO_CALLBACK = 0
+PRIO_NORMAL = 1
+PRIO_BULK = 2
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("send_priority", default=PRIO_NORMAL)
+
+
+@contextlib.contextmanager
+def bulk_priority():
+    """Все отправки внутри блока идут после интерактивных (рассылки и т.п.)."""
+    token = _priority.set(PRIO_BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class SchedulerClosed(RuntimeError):
+    """Планировщик закрыт (бот удалён из реестра), пока запрос ждал слота."""
+
+
+class TokenBucket:
+    """Бакет с резервированием: reserve() сразу списывает токен и говорит,
+    сколько подождать, если токенов уже нет."""
+
+    __slots__ = ("rate", "capacity", "tokens", "ts")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.ts = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def hold(self, now: float) -> float:
+        """Сколько ждать, не списывая токен: бакет в минусе только после 429."""
+        tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def pause(self, now: float, seconds: float) -> None:
+        # 429 от Telegram: уводим бакет в минус на retry_after
+        self.reserve(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0,
+                 chat_burst: float = 3.0, max_retries: int = 3, chat_idle: float = 60.0):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.chat_idle = chat_idle
+        self.chats: Dict[int, TokenBucket] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._seq = itertools.count()
+        # метрики
+        self.sent = 0
+        self.retry_after_count = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    # ---------- очередь глобального лимита ----------
+    async def _pump(self) -> None:
+        queue = self._queue
+        while True:
+            _, _, fut = await queue.get()
+            if fut.done():
+                continue
+            try:
+                delay = self.global_bucket.reserve(time.monotonic())
+                if delay:
+                    await asyncio.sleep(delay)
+                # ждавший мог быть отменён, пока мы спали (таймаут, остановка)
+                if not fut.done():
+                    fut.set_result(None)
+            except asyncio.CancelledError:
+                if not fut.done():  # close() посреди ожидания: этот слот уже не из очереди
+                    fut.set_exception(SchedulerClosed("outbound scheduler closed"))
+                raise
+            except Exception as e:
+                log.warning("outbound pump: %s", e)
+
+    async def _global_slot(self, prio: int) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            # насос перезапускается на той же очереди: ждущие в ней не теряются;
+            # новая — только если прежний цикл событий уже закрыт (бенчи)
+            if self._queue is None or self._task is None or self._task.get_loop() is not loop:
+                self._queue = asyncio.PriorityQueue()
+            self._task = asyncio.create_task(self._pump())
+        fut = loop.create_future()
+        self._queue.put_nowait((prio, next(self._seq), fut))
+        await fut
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        b = self.chats.get(chat_id)
+        if b is None:
+            if len(self.chats) >= 10_000:
+                self._sweep(now)
+            b = self.chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return b
+
+    def _sweep(self, now: float) -> None:
+        idle = [c for c, b in self.chats.items() if now - b.ts > self.chat_idle]
+        for c in idle:
+            del self.chats[c]
+
+    # ---------- middleware ----------
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        is_callback = isinstance(method, AnswerCallbackQuery)
+        if chat_id is None and not is_callback:
+            return await make_request(bot, method)  # getMe, setWebhook и т.п.
+
+        prio = PRIO_CALLBACK if is_callback else _priority.get()
+        attempt = 0
+        while True:
+            t0 = time.monotonic()
+            if chat_id is not None:
+                if prio == PRIO_BULK:
+                    delay = self._chat_bucket(chat_id, t0).reserve(t0)
+                else:
+                    b = self.chats.get(chat_id)
+                    delay = b.hold(t0) if b is not None else 0.0
+                if delay:
+                    await asyncio.sleep(delay)
+            await self._global_slot(prio)
+            waited = time.monotonic() - t0
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after_count += 1
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.failed += 1
+                    raise
+                log.warning("429 on %s, retry after %ss", type(method).__name__, e.retry_after)
+                now = time.monotonic()
+                if chat_id is not None:
+                    self._chat_bucket(chat_id, now).pause(now, e.retry_after)
+                else:
+                    self.global_bucket.pause(now, e.retry_after)
+                continue
+            self.sent += 1
+            return result
+
+    def close(self) -> None:
+        """Остановить насос; ждущие слота получают SchedulerClosed, а не висят
+        вечно, держа за собой ключ CHAT_LOCKS."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        queue, self._queue = self._queue, None
+        while queue is not None and not queue.empty():
+            _, _, fut = queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(SchedulerClosed("outbound scheduler closed"))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "sent": self.sent,
+            "retry_after": self.retry_after_count,
+            "failed": self.failed,
+            "wait_seconds_total": round(self.wait_total, 3),
+            "wait_seconds_max": round(self.wait_max, 3),
+            "chats_tracked": len(self.chats),
+        }
+
+
+class PerBotOutbound(BaseRequestMiddleware):
+    """Одна сессия на много ботов: лимиты Telegram считаются на токен, поэтому
+    у каждого бота свой планировщик — создаётся при его первом запросе."""
+
+    def __init__(self, schedulers: Optional[Dict[int, OutboundScheduler]] = None, **limits):
+        self.schedulers = {} if schedulers is None else schedulers
+        self.limits = limits
+
+    def __call__(self, make_request, bot, method):
+        sched = self.schedulers.get(bot.id)
+        if sched is None:
+            sched = self.schedulers[bot.id] = OutboundScheduler(**self.limits)
+        return sched(make_request, bot, method)
+
+    def forget(self, bot_id: int) -> None:
+        sched = self.schedulers.pop(bot_id, None)
+        if sched is not None:
+            sched.close()
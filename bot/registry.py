@@ -0,0 +1,281 @@
+# bot/registry.py
+# ==========================================================
+# Реестр ботов: токен, политика уровней и вид теста по каждому боту
+# BOT_REGISTRY=<файл>.json — {"bots": [{"token": ..., "default": "B", ...}]},
+#   правится руками, перечитывается по mtime;
+# BOT_REGISTRY=<файл> — SQLite (можно тот же, что STATE_DB), правится CLI;
+# без BOT_REGISTRY — боты из BOT_TOKEN* с политикой по умолчанию.
+# Запущенный процесс перечитывает реестр сам (bot/tenants.py).
+# CLI: python -m bot.registry add --token T [--default B] [--allowed B,HARD] [--flow compact]
+#      python -m bot.registry list | set ID ... | disable ID | enable ID | remove ID | import-env
+# ==========================================================
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import sqlite3
+from dataclasses import dataclass, replace
+from typing import Dict, FrozenSet, List, Mapping, Optional
+
+from .adaptive import ADAPTIVE
+
+log = logging.getLogger("bot.registry")
+
+ALL_LEVELS = ("A", "B", "HARD", ADAPTIVE)
+# flow: "classic" — вердикт и следующий вопрос отдельными сообщениями,
+#       "compact" — одно сообщение на весь тест, правится на месте
+FLOWS = ("classic", "compact")
+DEFAULT_POLICY: Dict[str, object] = {"default": "A", "allowed": frozenset(ALL_LEVELS), "flow": "classic"}
+# Политики, зашитые в код до реестра (BOT_LEVEL_POLICY): без BOT_REGISTRY и при
+# import-env боты из BOT_TOKEN* получают их, а не политику по умолчанию
+LEGACY_POLICIES: Dict[int, Dict[str, object]] = {
+    # @tod_discern_bot
+    8222973157: {"default": "A", "allowed": frozenset(ALL_LEVELS), "flow": "classic"},
+    # @discernment_test_bot
+    8416181261: {"default": "B", "allowed": frozenset({"B", "HARD"}), "flow": "classic"},
+}
+
+
+def bot_id_of(token: str) -> int:
+    return int(token.split(":", 1)[0])
+
+
+@dataclass(frozen=True, slots=True)
+class BotConfig:
+    token: str
+    default: str = "A"
+    allowed: FrozenSet[str] = frozenset(ALL_LEVELS)
+    flow: str = "classic"
+    enabled: bool = True
+
+    def __post_init__(self):
+        head, _, secret = self.token.partition(":")
+        if not head.isdigit() or not secret:
+            raise ValueError("токен вида <bot_id>:<secret>")
+        object.__setattr__(self, "allowed", frozenset(self.allowed))
+        unknown = self.allowed - set(ALL_LEVELS)
+        if unknown or not self.allowed:
+            raise ValueError(f"уровни: {', '.join(ALL_LEVELS)}; получено {sorted(self.allowed)}")
+        if self.default not in self.allowed:
+            raise ValueError(f"уровень по умолчанию {self.default!r} не входит в allowed")
+        if self.flow not in FLOWS:
+            raise ValueError(f"flow: {' | '.join(FLOWS)}")
+
+    @property
+    def id(self) -> int:
+        return bot_id_of(self.token)
+
+    def policy(self) -> Dict[str, object]:
+        return {"default": self.default, "allowed": self.allowed, "flow": self.flow}
+
+    def to_dict(self) -> Dict:
+        return {"token": self.token, "default": self.default,
+                "allowed": [lv for lv in ALL_LEVELS if lv in self.allowed],
+                "flow": self.flow, "enabled": self.enabled}
+
+    @classmethod
+    def from_dict(cls, d: Mapping) -> "BotConfig":
+        return cls(
+            token=str(d["token"]),
+            default=str(d.get("default", "A")),
+            allowed=frozenset(d.get("allowed") or ALL_LEVELS),
+            flow=str(d.get("flow", "classic")),
+            enabled=bool(d.get("enabled", True)),
+        )
+
+
+# ---------- Источники ----------
+class BotRegistry:
+    """load() — все боты (и выключенные); changed() — дёшево: есть ли что перечитать."""
+
+    def load(self) -> Dict[int, BotConfig]:
+        raise NotImplementedError
+
+    def changed(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+class EnvRegistry(BotRegistry):
+    """BOT_TOKEN* из окружения — как было до реестра (с прежними политиками,
+    LEGACY_POLICIES); меняется только рестартом."""
+
+    def __init__(self, environ: Optional[Mapping[str, str]] = None):
+        self.environ = os.environ if environ is None else environ
+
+    def load(self) -> Dict[int, BotConfig]:
+        bots: Dict[int, BotConfig] = {}
+        for k, v in sorted(self.environ.items()):
+            if k.startswith("BOT_TOKEN") and v:
+                cfg = BotConfig(v, **LEGACY_POLICIES.get(bot_id_of(v), {}))
+                bots[cfg.id] = cfg
+        return bots
+
+
+class JsonRegistry(BotRegistry):
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime: Optional[int] = None
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def changed(self) -> bool:
+        return self._stat() != self._mtime
+
+    def load(self) -> Dict[int, BotConfig]:
+        mtime = self._stat()
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        rows = data.get("bots", []) if isinstance(data, dict) else data
+        bots: Dict[int, BotConfig] = {}
+        for i, row in enumerate(rows):
+            try:
+                cfg = BotConfig.from_dict(row)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"{self.path}: бот #{i}: {e}") from None
+            bots[cfg.id] = cfg
+        self._mtime = mtime
+        return bots
+
+
+class SqliteRegistry(BotRegistry):
+    """Таблица bots; изменения из CLI (другое соединение) видны по PRAGMA data_version."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bots ("
+            " bot_id INTEGER PRIMARY KEY, token TEXT NOT NULL,"
+            " default_level TEXT NOT NULL DEFAULT 'A', allowed TEXT NOT NULL,"
+            " flow TEXT NOT NULL DEFAULT 'classic', enabled INTEGER NOT NULL DEFAULT 1,"
+            " updated INTEGER NOT NULL)"
+        )
+        self._version: Optional[int] = None
+
+    def _data_version(self) -> int:
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self) -> bool:
+        return self._data_version() != self._version
+
+    def load(self) -> Dict[int, BotConfig]:
+        self._version = self._data_version()
+        bots: Dict[int, BotConfig] = {}
+        for bot_id, token, default, allowed, flow, enabled in self._db.execute(
+            "SELECT bot_id, token, default_level, allowed, flow, enabled FROM bots ORDER BY bot_id"
+        ):
+            try:
+                bots[bot_id] = BotConfig(token, default, frozenset(allowed.split(",")), flow, bool(enabled))
+            except ValueError as e:
+                log.warning("registry: bot %s skipped: %s", bot_id, e)
+        return bots
+
+    def get(self, bot_id: int) -> Optional[BotConfig]:
+        return self.load().get(bot_id)
+
+    def put(self, cfg: BotConfig) -> None:
+        d = cfg.to_dict()
+        self._db.execute(
+            "INSERT OR REPLACE INTO bots (bot_id, token, default_level, allowed, flow, enabled, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cfg.id, cfg.token, cfg.default, ",".join(d["allowed"]), cfg.flow, int(cfg.enabled),
+             int(time.time())),
+        )
+        self._version = None  # свои записи data_version не двигают
+
+    def remove(self, bot_id: int) -> bool:
+        cur = self._db.execute("DELETE FROM bots WHERE bot_id = ?", (bot_id,))
+        self._version = None
+        return cur.rowcount > 0
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def make_registry(path: Optional[str] = None) -> BotRegistry:
+    if not path:
+        return EnvRegistry()
+    if path.endswith(".json"):
+        return JsonRegistry(path)
+    return SqliteRegistry(path)
+
+
+# ---------- CLI ----------
+def _levels(s: str) -> FrozenSet[str]:
+    return frozenset(x.strip() for x in s.split(",") if x.strip())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    p = argparse.ArgumentParser(prog="python -m bot.registry")
+    p.add_argument("--db", default=os.environ.get("BOT_REGISTRY"), help="SQLite реестра (BOT_REGISTRY)")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    add = sub.add_parser("add", help="новый бот (или замена токена); запущенный процесс подхватит сам")
+    add.add_argument("--token", required=True)
+    st = sub.add_parser("set", help="поменять политику бота")
+    st.add_argument("id", type=int)
+    for sp in (add, st):
+        sp.add_argument("--default")
+        sp.add_argument("--allowed", type=_levels, help=f"через запятую из {','.join(ALL_LEVELS)}")
+        sp.add_argument("--flow", choices=FLOWS)
+    sub.add_parser("list")
+    for name in ("disable", "enable", "remove"):
+        sub.add_parser(name).add_argument("id", type=int)
+    sub.add_parser("import-env", help="перенести BOT_TOKEN* из окружения (уже известные не трогаются)")
+    args = p.parse_args(argv)
+    if not args.db or args.db.endswith(".json"):
+        p.error("нужен --db или BOT_REGISTRY (SQLite; JSON-реестр правится руками)")
+
+    reg = SqliteRegistry(args.db)
+    try:
+        if args.cmd in ("add", "set"):
+            if args.cmd == "add":
+                cfg = reg.get(bot_id_of(args.token)) or BotConfig(args.token)
+                cfg = replace(cfg, token=args.token)
+            else:
+                cfg = reg.get(args.id)
+                if cfg is None:
+                    p.error(f"бот {args.id} не найден")
+            changes = {k: v for k, v in (("default", args.default), ("allowed", args.allowed),
+                                         ("flow", args.flow)) if v}
+            if "allowed" in changes and "default" not in changes and cfg.default not in changes["allowed"]:
+                changes["default"] = next(lv for lv in ALL_LEVELS if lv in changes["allowed"])
+            try:
+                reg.put(replace(cfg, **changes))
+            except ValueError as e:
+                p.error(str(e))
+            print(cfg.id)
+        elif args.cmd == "list":
+            for cfg in reg.load().values():
+                print(f"{cfg.id:>12} {'on ' if cfg.enabled else 'off'} default={cfg.default}"
+                      f" allowed={','.join(cfg.to_dict()['allowed'])} flow={cfg.flow}")
+        elif args.cmd in ("disable", "enable"):
+            cfg = reg.get(args.id)
+            if cfg is None:
+                p.error(f"бот {args.id} не найден")
+            reg.put(replace(cfg, enabled=args.cmd == "enable"))
+        elif args.cmd == "remove":
+            if not reg.remove(args.id):
+                p.error(f"бот {args.id} не найден")
+        else:
+            known = reg.load()
+            for cfg in EnvRegistry().load().values():
+                if cfg.id not in known:
+                    reg.put(cfg)
+                    print(cfg.id)
+    finally:
+        reg.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,275 @@
+# bot/review.py
+# ==========================================================
+# Повторение промахов (/review): интервальное повторение по Лейтнеру
+# Промах в любом тесте кладёт задание в колоду пользователя (коробка 0);
+# верный ответ на повторении переносит его в следующую коробку с интервалом
+# длиннее, после последней задание выходит из колоды; промах — снова в 0.
+# Колода: карточки + куча по сроку — ближайшее повторение за O(log n).
+# Напоминания: колесо времени по слотам REVIEW_SLOT сек — тик забирает только
+# созревшие слоты и всех пользователей не перебирает. Текст — на языке
+# последнего обращения пользователя (UserState.lang).
+# ==========================================================
+
+import time
+import heapq
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from .i18n import texts
+from .outbound import bulk_priority
+
+log = logging.getLogger("bot.review")
+
+REVIEW = "REVIEW"  # псевдо-уровень в UserState.level
+# интервалы коробок, сек: 1, 3, 7, 16, 35 дней
+INTERVALS: Tuple[int, ...] = (86400, 3 * 86400, 7 * 86400, 16 * 86400, 35 * 86400)
+REMIND_EVERY = 86400  # не чаще раза в сутки, пока пользователь не повторил
+MUTE = 365 * 86400    # бот заблокирован — не напоминаем год или до первого ответа
+
+# (bot_id, chat_id)
+Key = Tuple[int, int]
+
+
+class Deck:
+    """Колода пользователя. cards — task_id -> срок << 3 | коробка (одно int
+    вместо кортежа на карточку); heap — (срок, task_id) с ленивым удалением:
+    устаревшая запись отбрасывается, когда оказывается наверху."""
+
+    __slots__ = ("cards", "heap", "reminded")
+
+    def __init__(self, cards: Optional[Dict[str, int]] = None, reminded: int = 0):
+        self.cards: Dict[str, int] = cards or {}
+        self.heap: List[Tuple[int, str]] = [(card >> 3, tid) for tid, card in self.cards.items()]
+        heapq.heapify(self.heap)
+        self.reminded = reminded  # когда напомнили последний раз
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def _schedule(self, task_id: str, box: int, now: float) -> None:
+        due = int(now) + INTERVALS[box]
+        self.cards[task_id] = due << 3 | box
+        heapq.heappush(self.heap, (due, task_id))
+        if len(self.heap) > 2 * len(self.cards) + 16:
+            self.heap = [(card >> 3, t) for t, card in self.cards.items()]
+            heapq.heapify(self.heap)
+
+    def miss(self, task_id: str, now: float) -> None:
+        self._schedule(task_id, 0, now)
+
+    def hit(self, task_id: str, now: float) -> None:
+        card = self.cards.get(task_id)
+        if card is None:
+            return
+        box = (card & 7) + 1
+        if box < len(INTERVALS):
+            self._schedule(task_id, box, now)
+        else:
+            del self.cards[task_id]  # выучено
+
+    def drop(self, task_id: str) -> None:
+        self.cards.pop(task_id, None)
+
+    def _top(self) -> Optional[Tuple[int, str]]:
+        heap, cards = self.heap, self.cards
+        while heap:
+            due, tid = heap[0]
+            card = cards.get(tid)
+            if card is not None and card >> 3 == due:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def next_due(self) -> int:
+        top = self._top()
+        return top[0] if top else 0
+
+    def due(self, now: float, n: int) -> List[str]:
+        """До n заданий со сроком ≤ now, самые просроченные первыми."""
+        out: List[Tuple[int, str]] = []
+        while len(out) < n:
+            top = self._top()
+            if top is None or top[0] > now:
+                break
+            out.append(heapq.heappop(self.heap))
+        for item in out:
+            heapq.heappush(self.heap, item)
+        return [tid for _, tid in out]
+
+    def unmute(self, now: float) -> None:
+        """Пользователь снова играет: снять паузу после блокировки бота (MUTE)."""
+        if self.reminded > now:
+            self.reminded = 0
+
+    def remind_at(self) -> int:
+        due = self.next_due()
+        return max(due, self.reminded + REMIND_EVERY) if due else 0
+
+    def boxes(self) -> Dict[int, int]:
+        out: Dict[int, int] = {}
+        for card in self.cards.values():
+            out[card & 7] = out.get(card & 7, 0) + 1
+        return out
+
+    # на диск (JSON) и в упакованную сессию (marshal) — одна и та же форма
+    def dump(self) -> List:
+        return [[[tid, card & 7, card >> 3] for tid, card in self.cards.items()], self.reminded]
+
+    @classmethod
+    def load(cls, raw) -> Optional["Deck"]:
+        if not raw:
+            return None
+        rows, reminded = raw
+        return cls({tid: due << 3 | box for tid, box, due in rows}, reminded)
+
+
+class ReviewWheel:
+    """Колесо времени: слот -> ключи сессий, которым пора напомнить.
+
+    Для ключа живёт одна запись — в самом раннем слоте; add() с более поздним
+    сроком ничего не делает (при срабатывании срок перепроверяется)."""
+
+    def __init__(self, slot: float = 60.0):
+        self.slot = slot
+        self.slots: Dict[int, Set[Key]] = {}
+        self.order: List[int] = []      # куча номеров слотов
+        self.at: Dict[Key, int] = {}    # ключ -> его слот
+
+    def __len__(self) -> int:
+        return len(self.at)
+
+    def add(self, key: Key, ts: float) -> None:
+        if not ts:
+            return
+        s = int(ts // self.slot)
+        cur = self.at.get(key)
+        if cur is not None and cur <= s:
+            return
+        if cur is not None:
+            self.slots[cur].discard(key)
+        self.at[key] = s
+        bucket = self.slots.get(s)
+        if bucket is None:
+            bucket = self.slots[s] = set()
+            heapq.heappush(self.order, s)
+        bucket.add(key)
+
+    def pop_due(self, now: float) -> List[Key]:
+        limit = int(now // self.slot)
+        out: List[Key] = []
+        while self.order and self.order[0] <= limit:
+            for key in self.slots.pop(heapq.heappop(self.order), ()):
+                del self.at[key]
+                out.append(key)
+        return out
+
+    def export(self) -> List[Tuple[int, int, int]]:
+        return [(b, c, int(s * self.slot)) for (b, c), s in self.at.items()]
+
+    def restore(self, rows: Iterable[Tuple[int, int, int]]) -> int:
+        n = 0
+        for b, c, ts in rows:
+            self.add((b, c), ts)
+            n += 1
+        return n
+
+
+class Reminders:
+    """Раз в slot секунд: созревшие ключи из колеса -> проверка колоды ->
+    напоминания пачкой, после интерактивных сообщений (bulk_priority)."""
+
+    def __init__(self, wheel: ReviewWheel, store, bot_for: Callable[[int], Optional[Bot]],
+                 owns: Callable[[Key], bool], batch: int = 10, workers: int = 8):
+        self.wheel = wheel
+        self.store = store
+        self.bot_for = bot_for
+        self.owns = owns        # воркер напоминает только своим чатам
+        self.batch = batch      # сколько заданий в одном повторении
+        self.workers = workers
+        self.sent = 0
+        self.muted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def collect(self, now: float) -> List[Tuple[Key, int, str]]:
+        """Кому напомнить сейчас, сколько у них созрело и на каком языке; колесо и колоды
+        обновляются сразу (повторный тик того же ключа не возьмёт)."""
+        out = []
+        for key in self.wheel.pop_due(now):
+            if not self.owns(key):
+                continue
+            st = self.store.get(*key)
+            deck = st.deck
+            if not deck:
+                continue
+            at = deck.remind_at()
+            if at > now:
+                self.wheel.add(key, at)  # повторил или напомнили недавно
+                continue
+            deck.reminded = int(now)
+            self.store.mark_dirty(*key)
+            self.wheel.add(key, deck.remind_at())
+            out.append((key, len(deck.due(now, self.batch)), st.lang))
+        return out
+
+    async def _send(self, key: Key, n: int, lang: str = "") -> None:
+        bot = self.bot_for(key[0])
+        if bot is None:
+            return
+        tr = texts(lang)  # язык последнего обращения пользователя
+        try:
+            await bot.send_message(key[1], tr.reminder(tasks=tr.count(n, tr.tasks)),
+                                   reply_markup=tr.remind_kb)
+            self.sent += 1
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            if isinstance(e, TelegramBadRequest) and "chat not found" not in str(e).lower():
+                log.warning("review reminder to %s failed: %s", key, e)
+                return
+            # отметка уходит на диск (blocked в user_index, срок в колоде): после
+            # вытеснения или рестарта заблокировавшему не напоминаем
+            st = self.store.get(*key)
+            if st.deck is not None:
+                st.deck.reminded = int(time.time()) + MUTE
+                self.wheel.add(key, st.deck.remind_at())
+            self.store.mark_blocked(*key)
+            self.muted += 1
+        except Exception as e:
+            log.warning("review reminder to %s failed: %s", key, e)
+
+    async def tick(self, now: Optional[float] = None) -> int:
+        jobs = self.collect(time.time() if now is None else now)
+        if not jobs:
+            return 0
+        sem = asyncio.Semaphore(self.workers)
+
+        async def one(key, n, lang):
+            async with sem:
+                await self._send(key, n, lang)
+
+        with bulk_priority():
+            await asyncio.gather(*(one(*job) for job in jobs))
+        log.info("review reminders: %d sent", len(jobs))
+        return len(jobs)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.wheel.slot)
+            try:
+                await self.tick()
+            except Exception as e:
+                log.warning("review reminders failed: %s", e)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"scheduled": len(self.wheel), "sent": self.sent, "muted": self.muted}
@@ -0,0 +1,56 @@
+# bot/sampling.py
+# ==========================================================
+# Выборка заданий без хранения списков
+# Сессия помнит только seed и cursor; i-е задание вычисляется за O(1)
+# псевдослучайной перестановкой (сеть Фейстеля с cycle-walking).
+# ==========================================================
+
+from array import array
+from typing import Dict, List, Sequence, Tuple
+
+_MASK64 = (1 << 64) - 1
+_ROUNDS = 4
+
+
+def mix(*values: int) -> int:
+    """splitmix64 по нескольким числам: ключи раундов, выбор вариантов."""
+    h = 0x9E3779B97F4A7C15
+    for v in values:
+        h = (h ^ (v & _MASK64)) * 0xBF58476D1CE4E5B9 & _MASK64
+        h = (h ^ (h >> 27)) * 0x94D049BB133111EB & _MASK64
+        h ^= h >> 31
+    return h
+
+
+def permute(i: int, n: int, key: int) -> int:
+    """Образ i в перестановке range(n), заданной ключом. O(1) в среднем:
+    домен — ближайшая чётная степень двойки ≥ n, лишние значения
+    проходятся повторно (в среднем < 4 итераций)."""
+    if n <= 1:
+        return 0
+    half = max(1, ((n - 1).bit_length() + 1) // 2)
+    mask = (1 << half) - 1
+    x = i
+    while True:
+        left, right = x >> half, x & mask
+        for r in range(_ROUNDS):
+            left, right = right, left ^ (mix(key, r, right) & mask)
+        x = (left << half) | right
+        if x < n:
+            return x
+
+
+def stratify(topics: Sequence[str]) -> Tuple[Tuple[Tuple[int, ...], ...], array, array]:
+    """Расписание прохода по пулу: позиция g -> (тема, ранг внутри темы).
+
+    Элемент r темы размера n_t стоит в точке (r + 0.5) / n_t, темы
+    сливаются по этим точкам — любое окно подряд идущих позиций содержит
+    темы пропорционально их размеру."""
+    groups: Dict[str, List[int]] = {}
+    for i, t in enumerate(topics):
+        groups.setdefault(t, []).append(i)
+    members = tuple(tuple(v) for v in groups.values())
+    points = sorted(
+        ((r + 0.5) / len(m), t, r) for t, m in enumerate(members) for r in range(len(m))
+    )
+    return members, array("H", (t for _, t, _ in points)), array("I", (r for _, _, r in points))
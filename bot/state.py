@@ -0,0 +1,495 @@
+# bot/state.py
+# ==========================================================
+# Состояние пользователя и хранилища сессий
+# Memory — как раньше; SQLite (WAL) — с отложенной пакетной записью
+# и индексом пользователей (user_index) для рассылок
+# Сессии без обращений дольше STATE_IDLE_TTL вытесняются из памяти:
+# Memory — в упакованные байты, SQLite — просто забываются (они уже на диске)
+# Колода повторения (bot/review.py) живёт в сессии и переживает reset()
+# ==========================================================
+
+import json
+import time
+import marshal
+import asyncio
+import contextlib
+import logging
+import sqlite3
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .events import LEVEL_CODES
+from .review import Deck
+
+log = logging.getLogger("bot.state")
+
+
+# ---------- Коды уровней ----------
+# В сессии уровень — малое целое. Коды общие с журналом ответов (bot/events.py);
+# уровень, которого там нет (новый банк), получает следующий номер в процессе.
+# На диск (dumps) уровень пишется именем — коды между процессами не переносятся.
+_LEVEL_NAMES: List[str] = sorted(LEVEL_CODES, key=LEVEL_CODES.get)
+_LEVEL_IDS: Dict[str, int] = {name: i for i, name in enumerate(_LEVEL_NAMES)}
+
+
+def level_code(name: str) -> int:
+    code = _LEVEL_IDS.get(name)
+    if code is None:
+        code = _LEVEL_IDS[name] = len(_LEVEL_NAMES)
+        _LEVEL_NAMES.append(name)
+    return code
+
+
+def level_names() -> Tuple[str, ...]:
+    """Таблица кодов процесса — сохраняется рядом с упакованными сессиями."""
+    return tuple(_LEVEL_NAMES)
+
+
+# ---------- Состояние пользователя ----------
+class UserState:
+    """Сессия чата. __slots__ и ленивые контейнеры: неактивная сессия —
+    один объект без словарей."""
+
+    __slots__ = ("code", "idx", "score", "total", "misses", "asked_at", "bank",
+                 "seed", "cursor", "skill", "pick", "recent", "deck", "lang")
+
+    def __init__(self, level: str = "A", idx: int = 0, score: int = 0, total: int = 0,
+                 misses: Optional[bytearray] = None, asked_at: float = 0.0, bank: str = "",
+                 seed: int = 0, cursor: Optional[Dict[str, int]] = None, skill: float = 1400.0,
+                 pick: int = -1, recent: Optional[List[int]] = None, deck=None,
+                 lang: str = ""):
+        self.code = level_code(level)  # уровень (см. level_code)
+        self.idx = idx
+        self.score = score
+        self.total = total
+        self.misses = misses      # счётчики промахов по номерам меток TaskBank.labels
+        self.asked_at = asked_at  # когда отправлен текущий вопрос (time.time())
+        self.bank = bank          # версия банка заданий, на которой начат тест
+        self.seed = seed          # порядок заданий пользователя (см. bot/sampling.py)
+        self.cursor: Optional[array] = None  # код уровня -> позиция в потоке на начало теста
+        for name, n in (cursor or {}).items():
+            self._advance(level_code(name), n)
+        self.skill = skill        # оценка навыка по Эло (bot/adaptive.py)
+        self.pick = pick          # адаптивный режим: текущее задание в DifficultyIndex
+        self.recent = recent      # адаптивный режим и /review: задания этого теста
+        self.deck: Optional[Deck] = Deck.load(deck)  # промахи на повторение
+        self.lang = lang          # язык интерфейса (bot/i18n.py), "" — DEFAULT_LOCALE
+
+    @property
+    def level(self) -> str:
+        return _LEVEL_NAMES[self.code]
+
+    @level.setter
+    def level(self, name: str) -> None:
+        self.code = level_code(name)
+
+    def __repr__(self) -> str:
+        return f"UserState(level={self.level!r}, idx={self.idx}, score={self.score}, total={self.total})"
+
+    def add_miss(self, label: int, labels: int) -> None:
+        """Промах по метке label; labels — сколько меток в банке теста."""
+        if self.misses is None:
+            self.misses = bytearray(labels)
+        if self.misses[label] < 255:
+            self.misses[label] += 1
+
+    def _advance(self, code: int, n: int) -> None:
+        cursor = self.cursor
+        if cursor is None:
+            cursor = self.cursor = array("I")
+        if code >= len(cursor):
+            cursor.extend(bytes(code + 1 - len(cursor)))
+        cursor[code] += n
+
+    def reset(self, level: Optional[str] = None):
+        # показанные задания сдвигают поток: следующий тест их не повторит
+        if self.idx:
+            shown = min(self.idx, self.total)  # idx = total + 1 — тест уже завершён
+            self._advance(self.code, shown)
+        if level:
+            self.level = level
+        self.idx = 0
+        self.score = 0
+        self.total = 0
+        self.misses = None
+        self.recent = None
+
+    def status(self) -> str:
+        """idle — тест не начат, active — брошен или идёт, done — дошёл до итога."""
+        if not self.idx:
+            return "idle"
+        return "done" if self.idx > self.total else "active"
+
+    def stream_base(self) -> int:
+        """Позиция первого вопроса текущего теста в потоке заданий уровня."""
+        cursor = self.cursor
+        return cursor[self.code] if cursor is not None and self.code < len(cursor) else 0
+
+    def stream_pos(self) -> int:
+        """Позиция текущего вопроса (idx ≥ 1) в потоке заданий уровня."""
+        return self.stream_base() + self.idx - 1
+
+    def dumps(self) -> str:
+        d = {f: getattr(self, f) for f in self.__slots__[1:]}
+        d["level"] = self.level
+        d["misses"] = list(self.misses) if self.misses is not None else None
+        d["cursor"] = {_LEVEL_NAMES[c]: n for c, n in enumerate(self.cursor or ()) if n} or None
+        d["deck"] = self.deck.dump() if self.deck else None
+        return json.dumps(d, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, raw: str) -> "UserState":
+        d = json.loads(raw)
+        misses = d.get("misses")
+        # старый формат — словарь {метка: число}; это сводка текущего теста, её не жалко
+        d["misses"] = bytearray(misses) if isinstance(misses, list) else None
+        return cls(**d)
+
+    # Упаковка для вытесненных сессий в памяти: в пределах процесса, коды как есть
+    def pack(self) -> bytes:
+        values = [getattr(self, f) for f in self.__slots__]
+        if self.cursor is not None:
+            values[self.__slots__.index("cursor")] = self.cursor.tobytes()
+        values[self.__slots__.index("deck")] = self.deck.dump() if self.deck else None
+        return marshal.dumps(tuple(values))
+
+    @classmethod
+    def unpack(cls, raw: bytes) -> "UserState":
+        st = cls.__new__(cls)
+        st.deck = None  # снимок от версии без колоды
+        st.lang = ""
+        for f, v in zip(cls.__slots__, marshal.loads(raw)):
+            setattr(st, f, v)
+        if st.misses is not None:
+            st.misses = bytearray(st.misses)
+        if st.cursor is not None:
+            cursor = array("I")
+            cursor.frombytes(st.cursor)
+            st.cursor = cursor
+        st.deck = Deck.load(st.deck)
+        return st
+
+    def recode(self, remap: List[int]) -> None:
+        """Коды уровней другого процесса -> коды этого (remap[старый] = новый)."""
+        self.code = remap[self.code]
+        if self.cursor is not None:
+            old, self.cursor = self.cursor, None
+            for code, n in enumerate(old):
+                if n:
+                    self._advance(remap[code], n)
+
+
+# Ключ: (bot_id, chat_id)
+Key = Tuple[int, int]
+
+
+# ---------- Интерфейс ----------
+class StateStore:
+    """get() возвращает живой объект; после изменения вызывай mark_dirty().
+
+    Вытеснение — два поколения вместо отметок времени: items — сессии,
+    которых касались с прошлого обхода, idle — остальные. Раз в idle_ttl
+    секунд idle уходит в _spill(), а items становится idle. Сессия без
+    обращений вытесняется через idle_ttl…2·idle_ttl секунд; на обращение
+    ничего сверх поиска в словаре не тратится."""
+
+    def __init__(self, idle_ttl: float = 0.0):
+        self.idle_ttl = idle_ttl
+        self.items: Dict[Key, UserState] = {}
+        self.idle: Dict[Key, UserState] = {}
+        self.dirty: Set[Key] = set()
+        self.evictions = 0
+        self._swept = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.items) + len(self.idle)
+
+    def get(self, bot_id: int, chat_id: int) -> UserState:
+        raise NotImplementedError
+
+    def mark_dirty(self, bot_id: int, chat_id: int) -> None:
+        pass
+
+    def mark_blocked(self, bot_id: int, chat_id: int) -> None:
+        """Чат заблокировал бота (напоминание не дошло): сохранить сессию вместе с
+        отметкой, чтобы после вытеснения или рестарта ему не слали снова."""
+        self.mark_dirty(bot_id, chat_id)
+
+    def _cached(self, k: Key) -> Optional[UserState]:
+        st = self.items.get(k)
+        if st is None:
+            st = self.idle.pop(k, None)
+            if st is not None:
+                self.items[k] = st
+        return st
+
+    def _peek(self, k: Key) -> UserState:
+        st = self.items.get(k)
+        return st if st is not None else self.idle[k]
+
+    def _spill(self, k: Key, st: UserState) -> None:
+        """Куда девается вытесненная сессия (по умолчанию — никуда)."""
+
+    def sweep(self) -> int:
+        # незаписанные изменения не вытесняем — вернутся в следующий обход
+        for k in self.dirty & self.idle.keys():
+            self.items[k] = self.idle.pop(k)
+        for k, st in self.idle.items():
+            self._spill(k, st)
+        n = len(self.idle)
+        self.idle, self.items = self.items, {}
+        self.evictions += n
+        return n
+
+    def maybe_sweep(self, now: Optional[float] = None) -> int:
+        if not self.idle_ttl:
+            return 0
+        now = time.monotonic() if now is None else now
+        if now - self._swept < self.idle_ttl:
+            return 0
+        self._swept = now
+        return self.sweep()
+
+    def stats(self) -> Dict[str, int]:
+        return {"resident": len(self), "evictions": self.evictions}
+
+    # Снимок при остановке (bot/lifecycle.py): только то, чего нет на диске
+    def export(self) -> Iterator[Tuple[Key, bytes]]:
+        return iter(())
+
+    def restore(self, rows: Iterable[Tuple[Key, bytes]], levels: Iterable[str]) -> int:
+        return 0
+
+    def reviews(self) -> List[Tuple[int, int, int]]:
+        """(bot_id, chat_id, когда напомнить) с диска — засев колеса при старте."""
+        return []
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryStateStore(StateStore):
+    """Вытесненные сессии хранятся упакованными (UserState.pack) — в разы
+    меньше живого объекта, поднимаются при следующем get()."""
+
+    def __init__(self, idle_ttl: float = 0.0):
+        super().__init__(idle_ttl)
+        self.cold: Dict[Key, bytes] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, bot_id: int, chat_id: int) -> UserState:
+        k = (bot_id, chat_id)
+        st = self._cached(k)
+        if st is None:
+            raw = self.cold.pop(k, None)
+            st = self.items[k] = UserState.unpack(raw) if raw is not None else UserState()
+        return st
+
+    def _spill(self, k: Key, st: UserState) -> None:
+        self.cold[k] = st.pack()
+
+    def stats(self) -> Dict[str, int]:
+        return {"resident": len(self), "spilled": len(self.cold), "evictions": self.evictions}
+
+    def export(self) -> Iterator[Tuple[Key, bytes]]:
+        for items in (self.items, self.idle):
+            for k, st in items.items():
+                yield k, st.pack()
+        yield from self.cold.items()
+
+    def restore(self, rows: Iterable[Tuple[Key, bytes]], levels: Iterable[str]) -> int:
+        remap = [level_code(name) for name in levels]
+        same = remap == list(range(len(remap)))
+        n = 0
+        for k, raw in rows:
+            if same:
+                self.cold[k] = raw  # распакуется при первом get()
+            else:
+                st = UserState.unpack(raw)
+                st.recode(remap)
+                self.cold[k] = st.pack()
+            n += 1
+        return n
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.idle_ttl)
+            self.maybe_sweep()
+
+    async def start(self) -> None:
+        if self._task is None and self.idle_ttl:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+class SqliteStateStore(StateStore):
+    """Горячие сессии в памяти, грязные сбрасываются в SQLite пачкой
+    раз в flush_interval секунд (write-behind)."""
+
+    def __init__(self, path: str, flush_interval: float = 0.5, idle_ttl: float = 0.0):
+        super().__init__(idle_ttl)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self.rows_written = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS user_state ("
+            " bot_id INTEGER NOT NULL, chat_id INTEGER NOT NULL, data TEXT NOT NULL,"
+            " PRIMARY KEY (bot_id, chat_id)) WITHOUT ROWID"
+        )
+        # Плоский индекс для выборок без разбора JSON; blocked ставят рассылки
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS user_index ("
+            " bot_id INTEGER NOT NULL, chat_id INTEGER NOT NULL, level TEXT NOT NULL,"
+            " status TEXT NOT NULL, updated INTEGER NOT NULL, blocked INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (bot_id, chat_id)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS user_index_status ON user_index (bot_id, status, chat_id)"
+        )
+        # срок напоминания о повторении (0 — колода пуста); база от прошлой версии — ALTER
+        cols = {row[1] for row in self._db.execute("PRAGMA table_info(user_index)")}
+        if "next_review" not in cols:
+            self._db.execute("ALTER TABLE user_index ADD COLUMN next_review INTEGER NOT NULL DEFAULT 0")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS user_index_review ON user_index (next_review)"
+            " WHERE next_review > 0"
+        )
+        self._backfill_index()
+        self.blocked: Set[Key] = set()  # blocked=1 в user_index со следующей записью
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _backfill_index(self) -> None:
+        # база от прошлой версии: индекс строится один раз из user_state
+        db = self._db
+        if db.execute("SELECT 1 FROM user_index LIMIT 1").fetchone():
+            return
+        now = int(time.time())
+        rows = []
+        for b, c, data in db.execute("SELECT bot_id, chat_id, data FROM user_state"):
+            st = UserState.loads(data)
+            rows.append((b, c, st.level, st.status(), now))
+        if not rows:
+            return
+        db.execute("BEGIN")
+        db.executemany(
+            "INSERT OR IGNORE INTO user_index (bot_id, chat_id, level, status, updated)"
+            " VALUES (?, ?, ?, ?, ?)", rows,
+        )
+        db.execute("COMMIT")
+
+    def get(self, bot_id: int, chat_id: int) -> UserState:
+        k = (bot_id, chat_id)
+        st = self._cached(k)
+        if st is None:
+            row = self._db.execute(
+                "SELECT data FROM user_state WHERE bot_id=? AND chat_id=?", k
+            ).fetchone()
+            st = UserState.loads(row[0]) if row else UserState()
+            self.items[k] = st
+        return st
+
+    def mark_dirty(self, bot_id: int, chat_id: int) -> None:
+        self.dirty.add((bot_id, chat_id))
+        if self.blocked:
+            self.blocked.discard((bot_id, chat_id))  # снова пишет боту
+
+    def mark_blocked(self, bot_id: int, chat_id: int) -> None:
+        self.mark_dirty(bot_id, chat_id)
+        self.blocked.add((bot_id, chat_id))
+
+    def reviews(self) -> List[Tuple[int, int, int]]:
+        return self._db.execute(
+            "SELECT bot_id, chat_id, next_review FROM user_index WHERE next_review > 0 AND blocked = 0"
+        ).fetchall()
+
+    def _write(self, rows, index_rows, blocked=()) -> None:
+        db = self._db
+        db.execute("BEGIN")
+        try:
+            db.executemany(
+                "INSERT INTO user_state (bot_id, chat_id, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (bot_id, chat_id) DO UPDATE SET data=excluded.data",
+                rows,
+            )
+            # пользователь снова пишет боту — значит, больше не заблокирован
+            db.executemany(
+                "INSERT INTO user_index (bot_id, chat_id, level, status, updated, blocked, next_review)"
+                " VALUES (?, ?, ?, ?, ?, 0, ?) ON CONFLICT (bot_id, chat_id) DO UPDATE SET"
+                " level=excluded.level, status=excluded.status, updated=excluded.updated, blocked=0,"
+                " next_review=excluded.next_review",
+                index_rows,
+            )
+            if blocked:
+                db.executemany(
+                    "UPDATE user_index SET blocked = 1 WHERE bot_id = ? AND chat_id = ?", blocked,
+                )
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    async def flush(self) -> int:
+        async with self._lock:
+            if not self.dirty:
+                return 0
+            keys, self.dirty = self.dirty, set()
+            blocked, self.blocked = self.blocked, set()
+            # сериализуем в цикле событий: хендлеры не меняют объекты посреди дампа
+            rows = [(b, c, self._peek((b, c)).dumps()) for b, c in keys]
+            now = int(time.time())
+            index_rows = [(b, c, st.level, st.status(), now, st.deck.remind_at() if st.deck else 0)
+                          for b, c in keys for st in (self._peek((b, c)),)]
+            try:
+                await asyncio.to_thread(self._write, rows, index_rows, list(blocked))
+            except Exception:
+                self.dirty |= keys  # повторим в следующий раз
+                self.blocked |= blocked
+                raise
+            self.flushes += 1
+            self.rows_written += len(rows)
+            return len(rows)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning("state flush failed: %s", e)
+            # записанные сессии можно забыть: get() поднимет их из базы
+            self.maybe_sweep()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # отмена не останавливает запись в потоке — ждём её конца под замком
+            async with self._lock:
+                self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+        self._db.close()
+
+
+def make_store(path: Optional[str], flush_interval: float = 0.5, idle_ttl: float = 0.0) -> StateStore:
+    if path:
+        return SqliteStateStore(path, flush_interval=flush_interval, idle_ttl=idle_ttl)
+    return MemoryStateStore(idle_ttl=idle_ttl)
@@ -0,0 +1,304 @@
+# bot/supervisor.py
+# ==========================================================
+# Супервизор воркеров: python -m bot.supervisor (Procfile: worker)
+# WORKERS<=1 — всё в одном процессе, как раньше.
+# polling: боты из реестра раскладываются по воркерам по хэшу bot_id;
+# webhook: фронт в супервизоре раздаёт апдейты воркерам по chat_id.
+# Реестр каждый процесс перечитывает сам — новый бот подхватывается без рестарта.
+# Упавшие воркеры перезапускаются, их статистика собирается здесь.
+# SIGTERM: воркеры дорабатывают начатое и пишут снимки (bot/lifecycle.py).
+# ==========================================================
+
+import os
+import time
+import signal
+import asyncio
+import logging
+import resource
+import contextlib
+import multiprocessing as mp
+from typing import Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+log = logging.getLogger("bot.supervisor")
+
+STATS_INTERVAL = float(os.environ.get("WORKER_STATS_INTERVAL", "5"))
+
+
+# ---------- Воркер (дочерний процесс) ----------
+def _worker_entry(shard: int, shards: int, inbox, stats_q) -> None:
+    if os.environ.get("EVENT_LOG"):
+        # у каждого воркера свой файл журнала; CLI принимает их списком
+        os.environ["EVENT_LOG"] += f".w{shard}"
+    if os.environ.get("RATINGS_DB"):
+        os.environ["RATINGS_DB"] += f".w{shard}"
+    if os.environ.get("STATE_SNAPSHOT"):
+        # шард чата не меняется, пока не меняется WORKERS — снимок вернётся к своим
+        os.environ["STATE_SNAPSHOT"] += f".w{shard}"
+    if inbox is not None:
+        # чаты одного бота раскиданы по воркерам: таблицы лидеров общие, через базу
+        os.environ["LEADERBOARD_SHARED"] = "1"
+    # порты одни на всех — в воркерах их не открываем
+    os.environ.pop("METRICS_PORT", None)
+    os.environ.pop("WEBAPP_PORT", None)
+    from . import bot as app
+    asyncio.run(_worker_main(app, shard, shards, inbox, stats_q))
+
+
+async def _worker_main(app, shard: int, shards: int, inbox, stats_q) -> None:
+    from aiogram.types import Update
+    from .apicalls import API_CALLS
+
+    processed = [0]
+
+    async def _count(handler, event, data):
+        processed[0] += 1
+        return await handler(event, data)
+
+    async def _report():
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            stats_q.put({
+                "shard": shard, "pid": os.getpid(), "ts": time.time(),
+                "updates": processed[0], "api_calls": sum(API_CALLS.values()),
+                "rss_max_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            })
+
+    reporter = asyncio.create_task(_report())
+    if inbox is None:
+        # polling своих ботов — обычный main() с фильтром по шарду
+        app.TENANTS.shard, app.TENANTS.shards = shard, shards
+        try:
+            await app.main(setup=lambda dp: dp.update.outer_middleware(_count))
+        finally:
+            reporter.cancel()
+        return
+
+    snapshot = os.environ.get("STATE_SNAPSHOT")
+    if snapshot:
+        app.load_snapshot(snapshot, app.STATE, app.HANDLED, app.LIFECYCLE, app.REVIEWS)
+    # напоминания о повторении — только своим чатам (база у воркеров общая)
+    app.REMINDERS.owns = lambda key: key[1] % shards == shard
+    app.REVIEWS.restore(r for r in app.STATE.reviews() if r[1] % shards == shard)
+    app.LIFECYCLE.install_signals()
+    await app.STATE.start()
+    await app.EVENTS.start()
+    await app.RATINGS.start()
+    await app.LEADERBOARDS.start()
+    app._install_bank_reload()
+    # все боты, свои чаты; Bot создаётся при первом апдейте своего бота
+    dp = app.build_dispatcher()
+    dp.update.outer_middleware(_count)
+    app.wire_tenants(dp)  # рассылки: аренда в базе не даст воркерам слать дважды
+    registry = app.make_registry(os.environ.get("BOT_REGISTRY"))
+    watch = None
+    try:
+        await app.TENANTS.open(registry, dp, app.make_session())
+        watch = asyncio.ensure_future(app.TENANTS.watch(float(os.environ.get("REGISTRY_POLL", "5"))))
+        if os.environ.get("REVIEW_REMINDERS", "1") != "0":
+            await app.REMINDERS.start()
+        loop = asyncio.get_running_loop()
+        app.LIFECYCLE.on_stop(lambda: inbox.put(None))  # SIGTERM: очередь больше не читаем
+        pending = set()
+        while True:
+            item = await loop.run_in_executor(None, inbox.get)
+            if item is None:
+                break
+            bot_id, raw = item
+            route = app.TENANTS.get(bot_id)
+            if route is None:
+                await app.TENANTS.reload()  # фронт увидел нового бота раньше нас
+                route = app.TENANTS.get(bot_id)
+                if route is None:
+                    log.warning("worker %d: update for unknown bot %s dropped", shard, bot_id)
+                    continue
+            bot, _ = route
+            task = app.TENANTS.feed(bot, Update.model_validate(raw, context={"bot": bot}))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending, timeout=app.LIFECYCLE.drain_timeout)
+    finally:
+        if watch is not None:
+            watch.cancel()
+        reporter.cancel()
+        await app.REMINDERS.close()
+        await app.LIFECYCLE.drain()
+        await app.TENANTS.close()
+        app.close_campaigns()
+        await app.LEADERBOARDS.close()
+        await app.RATINGS.close()
+        await app.EVENTS.close()
+        if snapshot:
+            app.save_snapshot(snapshot, app.STATE, app.HANDLED, app.LIFECYCLE, app.REVIEWS)
+        await app.STATE.close()
+        registry.close()
+
+
+# ---------- Супервизор ----------
+class Supervisor:
+    def __init__(self, bots: int, workers: int, fanout: bool,
+                 ctx: Optional[mp.context.BaseContext] = None,
+                 clock: Optional[Callable[[], float]] = None):
+        self.fanout = fanout
+        self.clock = clock or time.monotonic
+        # polling: лишние воркеры остались бы без ботов (новые боты — по тем же шардам)
+        self.n = workers if fanout else max(1, min(workers, bots))
+        self.ctx = ctx or mp.get_context("spawn")
+        self.procs: Dict[int, mp.Process] = {}
+        self.restarts: Dict[int, int] = {i: 0 for i in range(self.n)}
+        self.next_start: Dict[int, float] = {}
+        self.health: Dict[int, dict] = {}
+        self.stats_q = self.ctx.Queue()
+        self.inboxes = [self.ctx.Queue() for _ in range(self.n)] if fanout else [None] * self.n
+        self._stopping = False
+
+    def submit(self, bot_id: int, raw: dict) -> None:
+        from .webhook import chat_of
+        self.inboxes[chat_of(raw) % self.n].put((bot_id, raw))
+
+    def _spawn(self, shard: int) -> None:
+        p = self.ctx.Process(
+            target=_worker_entry,
+            args=(shard, self.n, self.inboxes[shard], self.stats_q),
+            name=f"bot-worker-{shard}",
+            daemon=True,
+        )
+        p.start()
+        self.procs[shard] = p
+        log.info("worker %d started (pid=%s)", shard, p.pid)
+
+    def start(self) -> None:
+        for shard in range(self.n):
+            self._spawn(shard)
+
+    def poll(self) -> None:
+        """Собрать статистику и перезапустить упавших (с экспоненциальной паузой)."""
+        while True:
+            try:
+                st = self.stats_q.get_nowait()
+            except Exception:
+                break
+            self.health[st["shard"]] = st
+        if self._stopping:
+            return
+        now = self.clock()
+        for shard, p in list(self.procs.items()):
+            if p.is_alive():
+                continue
+            if shard not in self.next_start:
+                self.restarts[shard] += 1
+                delay = min(30.0, 2.0 ** (self.restarts[shard] - 1))
+                log.warning("worker %d exited with %s, restart in %.0fs", shard, p.exitcode, delay)
+                self.next_start[shard] = now + delay
+            elif now >= self.next_start[shard]:
+                del self.next_start[shard]
+                self._spawn(shard)
+
+    def summary(self) -> dict:
+        return {
+            "workers": self.n,
+            "alive": sum(p.is_alive() for p in self.procs.values()),
+            "restarts": sum(self.restarts.values()),
+            "updates": sum(h["updates"] for h in self.health.values()),
+            "shards": self.health,
+        }
+
+    def stop(self, timeout: float = 30.0) -> None:
+        self._stopping = True
+        for q in self.inboxes:
+            if q is not None:
+                q.put(None)  # fan-out: доработать очередь и выйти
+        if not self.fanout:
+            for p in self.procs.values():
+                if p.is_alive():
+                    p.terminate()  # SIGTERM: polling закрывается, начатое дорабатывает
+        deadline = time.monotonic() + timeout
+        for p in self.procs.values():
+            p.join(max(0.0, deadline - time.monotonic()))
+            if p.is_alive():
+                p.kill()
+                p.join(1.0)
+
+    async def monitor(self) -> None:
+        last_log = time.monotonic()
+        while True:
+            self.poll()
+            if time.monotonic() - last_log >= STATS_INTERVAL:
+                last_log = time.monotonic()
+                s = self.summary()
+                log.info("workers alive=%d/%d restarts=%d updates=%d",
+                         s["alive"], s["workers"], s["restarts"], s["updates"])
+            await asyncio.sleep(0.5)
+
+
+async def _run_fanout_front(sup: Supervisor, registry, base_url: str) -> None:
+    import uvicorn
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from .tenants import Tenants
+    from .webhook import build_fanout_app
+
+    # фронт только регистрирует webhook'и по реестру; апдейты разбирают воркеры
+    front = Tenants()
+    front.webhook_url = base_url
+    front.webhook_secret = secret = os.environ.get("WEBHOOK_SECRET", "")
+    await front.open(registry, None, AiohttpSession())
+    watch = asyncio.ensure_future(front.watch(float(os.environ.get("REGISTRY_POLL", "5"))))
+    app = build_fanout_app(front.configs, sup.submit, secret=secret, health=sup.summary)
+    config = uvicorn.Config(
+        app, host="0.0.0.0", port=int(os.environ.get("PORT", "8080")), log_level="warning"
+    )
+    try:
+        await uvicorn.Server(config).serve()
+    finally:
+        watch.cancel()
+        await front.close()
+
+
+async def supervise(registry, bots: int, workers: int) -> None:
+    base_url = os.environ.get("WEBHOOK_BASE")
+    sup = Supervisor(bots, workers, fanout=bool(base_url))
+    sup.start()
+    monitor = asyncio.create_task(sup.monitor())
+    # uvicorn фронта ловит сигналы сам, а после выхода повторяет их —
+    # без своего обработчика повтор убил бы супервизор до остановки воркеров
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+    try:
+        if base_url:
+            await _run_fanout_front(sup, registry, base_url)
+        else:
+            await stop.wait()
+    finally:
+        monitor.cancel()
+        # запас сверх дренажа воркеров: им ещё писать снимки и закрывать базы
+        sup.stop(timeout=float(os.environ.get("SHUTDOWN_TIMEOUT", "25")) + 5)
+
+
+def main() -> None:
+    load_dotenv()
+    from . import bot as app
+
+    registry = app.make_registry(os.environ.get("BOT_REGISTRY"))
+    bots = sum(cfg.enabled for cfg in registry.load().values())
+    if not bots:
+        raise RuntimeError("Не найден ни один бот: задай BOT_REGISTRY или BOT_TOKEN*")
+    workers = int(os.environ.get("WORKERS", "1"))
+    if workers <= 1:
+        asyncio.run(app.main(registry))
+        return
+    log.info("Supervisor: %d worker(s) for %d bot(s)", workers, bots)
+    try:
+        asyncio.run(supervise(registry, bots, workers))
+    finally:
+        registry.close()
+
+
+if __name__ == "__main__":
+    with contextlib.suppress(KeyboardInterrupt, SystemExit):
+        main()
+    log.info("Stopped.")
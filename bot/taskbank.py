@@ -0,0 +1,462 @@
+# bot/taskbank.py
+# ==========================================================
+# Неизменяемый банк заданий из bot/banks/*.json
+# Вердикты, порядки вариантов и расписание тем готовы заранее.
+# Переводы — bot/banks/<lang>/*.json: те же id и варианты в том же порядке;
+# текст и вердикты экранированы для HTML при сборке (см. bot/i18n.py).
+# Тест — выборка из пула: сессия хранит seed и cursor (см. bot/sampling.py).
+# Собранный банк кэшируется в .cache/<хэш>.v<формат>.pickle; SIGHUP или BANK_WATCH
+# перечитывают файлы и атомарно подменяют текущую версию.
+# ==========================================================
+
+import os
+import html
+import glob
+import json
+import pickle
+import random
+import asyncio
+import hashlib
+import logging
+import itertools
+from array import array
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from .i18n import BASE_LOCALE, CATALOGS, TEXTS, Texts
+from .sampling import mix, permute, stratify
+
+log = logging.getLogger("bot.taskbank")
+
+BANK_DIR = os.environ.get("BANK_DIR") or os.path.join(os.path.dirname(__file__), "banks")
+
+# Сколько разных порядков вариантов готовить на задание
+MAX_ORDERS = 6
+
+# Версия формата кэша: меняется вместе с полями Task/LevelBank/TaskBank
+CACHE_FORMAT = 3
+
+
+class BankError(ValueError):
+    pass
+
+
+def _norm(s: str) -> str:
+    return (s or "").strip().casefold()
+
+
+def answers_kb(options: Iterable[str], pos: int = 0) -> InlineKeyboardMarkup:
+    # pos — номер вопроса: по нему отсекаются тапы по старым клавиатурам
+    # (в compact-режиме message_id вообще не меняется)
+    suffix = f":{pos}" if pos else ""
+    rows = [[InlineKeyboardButton(text=opt, callback_data=f"ans:{i}{suffix}")]
+            for i, opt in enumerate(options)]
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@lru_cache(maxsize=65536)
+def shuffled_kb(options: Tuple[str, ...], order: Tuple[int, ...], pos: int = 0) -> InlineKeyboardMarkup:
+    # кнопка i показывает options[order[i]]; в callback_data — номер кнопки
+    return answers_kb((options[j] for j in order), pos)
+
+
+def _esc(s: str) -> str:
+    return html.escape(s, quote=False)
+
+
+def _verdict(is_right: bool, answer: str, explain: str, tr: Texts) -> str:
+    text = f"{tr.verdict_right if is_right else tr.verdict_wrong} {tr.answer_is(answer=_esc(answer))}"
+    return f"{text}\n{_esc(explain)}" if explain else text
+
+
+def _orders(task_id: str, n: int) -> Tuple[Tuple[int, ...], ...]:
+    if n <= 3:
+        return tuple(itertools.permutations(range(n)))
+    rnd = random.Random(task_id)
+    out = {tuple(range(n))}
+    while len(out) < MAX_ORDERS:
+        perm = list(range(n))
+        rnd.shuffle(perm)
+        out.add(tuple(perm))
+    return tuple(sorted(out))
+
+
+@dataclass(frozen=True, slots=True)
+class Task:
+    id: str
+    text: str
+    text_html: str    # text, экранированный для parse_mode=HTML
+    options: Tuple[str, ...]
+    answer: str
+    answer_norm: str  # _norm(answer) — метка для статистики промахов
+    label: int        # номер метки в TaskBank.labels (счётчик в UserState.misses)
+    answer_idx: int   # индекс верного варианта, -1 если не найден
+    explain: str
+    xp: int
+    badge: Optional[str]
+    topic: str
+    orders: Tuple[Tuple[int, ...], ...]  # порядки показа вариантов
+    verdict_right: str
+    verdict_wrong: str
+
+    @classmethod
+    def from_dict(cls, d: dict, labels: Optional[Dict[str, int]] = None,
+                  lang: str = BASE_LOCALE) -> "Task":
+        options = tuple(d.get("options", ()))
+        answer = d.get("answer", "")
+        answer_norm = _norm(answer)
+        norms = [_norm(o) for o in options]
+        explain = d.get("explain", "")
+        task_id = str(d.get("id", ""))
+        return cls(
+            id=task_id,
+            text=d["text"],
+            text_html=_esc(d["text"]),
+            options=options,
+            answer=answer,
+            answer_norm=answer_norm,
+            label=labels.get(answer_norm, -1) if labels else -1,
+            answer_idx=norms.index(answer_norm) if answer_norm in norms else -1,
+            explain=explain,
+            xp=int(d.get("xp", 0)),
+            badge=d.get("badge"),
+            topic=d.get("topic", ""),
+            orders=_orders(task_id, len(options)),
+            verdict_right=_verdict(True, answer, explain, TEXTS[lang]),
+            verdict_wrong=_verdict(False, answer, explain, TEXTS[lang]),
+        )
+
+    def translated(self, d: dict, lang: str) -> "Task":
+        """Перевод: номер ответа, метка, тема и порядки — от исходного задания."""
+        explain = d.get("explain", "")
+        tr = TEXTS.get(lang) or TEXTS[BASE_LOCALE]
+        return replace(
+            self, text=d["text"], text_html=_esc(d["text"]), options=tuple(d["options"]),
+            answer=d["answer"], explain=explain,
+            verdict_right=_verdict(True, d["answer"], explain, tr),
+            verdict_wrong=_verdict(False, d["answer"], explain, tr),
+        )
+
+    def is_right(self, idx: int) -> bool:
+        return idx == self.answer_idx and idx >= 0
+
+
+class Question:
+    """Задание на конкретной позиции сессии: порядок кнопок уже выбран."""
+
+    __slots__ = ("task", "order")
+
+    def __init__(self, task: Task, order: Tuple[int, ...]):
+        self.task = task
+        self.order = order
+
+    def original(self, button: int) -> int:
+        # номер нажатой кнопки -> индекс варианта в банке (-1 — мусор)
+        return self.order[button] if 0 <= button < len(self.order) else -1
+
+    def keyboard(self, pos: int = 0) -> InlineKeyboardMarkup:
+        return shuffled_kb(self.task.options, self.order, pos)
+
+
+class LevelBank:
+    """Задания уровня + расписание выборки.
+
+    Поток заданий пользователя — бесконечная последовательность g = 0, 1, …
+    Каждый проход длиной total выдаёт все задания по разу в порядке,
+    заданном seed и номером прохода; внутри прохода темы чередуются
+    пропорционально размеру. Сессия берёт следующие sample позиций, так что
+    повторов нет, пока не исчерпан весь пул. Переводы (locales) выровнены с
+    tasks по номеру: на любом языке выпадает то же задание."""
+
+    __slots__ = ("level", "tasks", "total", "sample", "members", "sched_topic", "sched_rank",
+                 "locales")
+
+    def __init__(self, level: str, raw: Iterable[dict], sample: int = 0,
+                 labels: Optional[Dict[str, int]] = None):
+        self.level = level
+        self.tasks: Tuple[Task, ...] = tuple(Task.from_dict(d, labels) for d in raw)
+        self.total = len(self.tasks)
+        self.sample = min(sample, self.total) if sample > 0 else self.total
+        self.members: Tuple[Tuple[int, ...], ...]
+        self.sched_topic: array
+        self.sched_rank: array
+        self.members, self.sched_topic, self.sched_rank = stratify([t.topic for t in self.tasks])
+        self.locales: Dict[str, Tuple[Task, ...]] = {}  # язык -> tasks в переводе
+
+    def __len__(self) -> int:
+        return self.total
+
+    def draw(self, seed: int, g: int, lang: str = "") -> Question:
+        """g-я позиция потока пользователя с данным seed — O(1); lang — язык
+        задания (нет перевода — исходное)."""
+        rnd, g = divmod(g, self.total)
+        t = self.sched_topic[g]
+        members = self.members[t]
+        key = mix(seed, rnd, t)
+        task = (self.locales.get(lang) or self.tasks)[members[permute(self.sched_rank[g], len(members), key)]]
+        return Question(task, task.orders[mix(key, g) % len(task.orders)])
+
+
+class TaskBank:
+    __slots__ = ("levels", "default", "version", "labels", "translated", "label_names")
+
+    def __init__(self, levels: Dict[str, Iterable[dict]], default: str = "A", version: str = "",
+                 samples: Optional[Dict[str, int]] = None,
+                 translations: Optional[Dict[str, Dict[str, List[dict]]]] = None):
+        samples = samples or {}
+        raw = {k: list(v) for k, v in levels.items()}
+        # метки ответов всех уровней: промахи сессии — счётчики по их номерам
+        self.labels: Tuple[str, ...] = tuple(sorted(
+            {_norm(d.get("answer", "")) for tasks in raw.values() for d in tasks} - {""}
+        ))
+        ids = {label: i for i, label in enumerate(self.labels)}
+        self.levels: Dict[str, LevelBank] = {
+            k: LevelBank(k, v, samples.get(k, 0), ids) for k, v in raw.items()
+        }
+        self.default = default
+        self.version = version
+        # язык -> id задания -> перевод; язык -> названия меток для сводки
+        self.translated: Dict[str, Dict[str, Task]] = {}
+        self.label_names: Dict[str, Tuple[str, ...]] = {BASE_LOCALE: tuple(_esc(x) for x in self.labels)}
+        for lang, by_level in (translations or {}).items():
+            tasks: Dict[str, Task] = {}
+            names = list(self.label_names[BASE_LOCALE])
+            named = set()
+            for level, raw_tasks in by_level.items():
+                base = {t.id: t for t in self.levels[level].tasks}
+                for d in raw_tasks:
+                    t = tasks[d["id"]] = base[d["id"]].translated(d, lang)
+                    if t.label >= 0 and t.label not in named:
+                        names[t.label] = _esc(_norm(t.answer))
+                        named.add(t.label)
+            self.translated[lang] = tasks
+            self.label_names[lang] = tuple(names)
+            for level in self.levels.values():
+                if any(t.id in tasks for t in level.tasks):
+                    level.locales[lang] = tuple(tasks.get(t.id, t) for t in level.tasks)
+
+    def level(self, level: str) -> LevelBank:
+        bank = self.levels.get(level)
+        return bank if bank is not None else self.levels[self.default]
+
+    def labels_for(self, lang: str) -> Tuple[str, ...]:
+        names = self.label_names.get(lang)
+        return names if names is not None else self.label_names[BASE_LOCALE]
+
+
+# ---------- Загрузка и проверка ----------
+def validate_level(path: str, data: dict) -> Tuple[str, List[dict]]:
+    if not isinstance(data, dict) or not isinstance(data.get("level"), str):
+        raise BankError(f"{path}: нужен объект с полем level")
+    sample = data.get("sample", 0)
+    if not isinstance(sample, int) or sample < 0:
+        raise BankError(f"{path}: sample — целое ≥ 0")
+    tasks = data.get("tasks")
+    if not isinstance(tasks, list) or not tasks:
+        raise BankError(f"{path}: пустой или отсутствующий список tasks")
+    seen = set()
+    for n, t in enumerate(tasks, 1):
+        where = f"{path}: задание #{n} ({t.get('id', '?') if isinstance(t, dict) else '?'})"
+        if not isinstance(t, dict):
+            raise BankError(f"{where}: ожидается объект")
+        for field in ("id", "text", "answer"):
+            if not isinstance(t.get(field), str) or not t[field].strip():
+                raise BankError(f"{where}: поле {field} обязательно")
+        if t["id"] in seen:
+            raise BankError(f"{where}: повтор id")
+        seen.add(t["id"])
+        opts = t.get("options")
+        if not isinstance(opts, list) or len(opts) < 2 or not all(isinstance(o, str) for o in opts):
+            raise BankError(f"{where}: options — список из 2+ строк")
+        if _norm(t["answer"]) not in {_norm(o) for o in opts}:
+            raise BankError(f"{where}: answer нет среди options")
+        if len(opts) > 100:
+            raise BankError(f"{where}: слишком много вариантов")
+        if not isinstance(t.get("topic", ""), str):
+            raise BankError(f"{where}: topic — строка")
+    return data["level"], tasks
+
+
+def validate_translation(path: str, data: dict, levels: Dict[str, List[dict]]) -> Tuple[str, List[dict]]:
+    """Перевод уровня: задания по id исходного, варианты — в том же порядке."""
+    if not isinstance(data, dict) or data.get("level") not in levels:
+        raise BankError(f"{path}: level — один из {', '.join(levels)}")
+    tasks = data.get("tasks")
+    if not isinstance(tasks, list):
+        raise BankError(f"{path}: нужен список tasks")
+    base = {t["id"]: t for t in levels[data["level"]]}
+    seen = set()
+    for n, t in enumerate(tasks, 1):
+        where = f"{path}: задание #{n} ({t.get('id', '?') if isinstance(t, dict) else '?'})"
+        if not isinstance(t, dict) or t.get("id") not in base:
+            raise BankError(f"{where}: id нет в исходном уровне")
+        if t["id"] in seen:
+            raise BankError(f"{where}: повтор id")
+        seen.add(t["id"])
+        for field in ("text", "answer"):
+            if not isinstance(t.get(field), str) or not t[field].strip():
+                raise BankError(f"{where}: поле {field} обязательно")
+        if not isinstance(t.get("explain", ""), str):
+            raise BankError(f"{where}: explain — строка")
+        src = base[t["id"]]
+        opts = t.get("options")
+        if (not isinstance(opts, list) or len(opts) != len(src["options"])
+                or not all(isinstance(o, str) for o in opts)):
+            raise BankError(f"{where}: options — {len(src['options'])} строк(и), как в исходном")
+        want = [_norm(o) for o in src["options"]].index(_norm(src["answer"]))
+        norms = [_norm(o) for o in opts]
+        if _norm(t["answer"]) not in norms or norms.index(_norm(t["answer"])) != want:
+            raise BankError(f"{where}: answer — вариант №{want + 1}, как в исходном")
+    return data["level"], tasks
+
+
+def _read_sources(directory: str) -> Tuple[str, Dict[str, bytes]]:
+    """Уровни (*.json) и переводы (<lang>/*.json); версия — хэш файлов и
+    фраз вердиктов из каталогов (они входят в собранный банк)."""
+    sources = {}
+    for pattern in ("*.json", os.path.join("*", "*.json")):
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            with open(path, "rb") as f:
+                sources[path] = f.read()
+    if not any(os.path.dirname(p) == directory.rstrip(os.sep) for p in sources):
+        raise BankError(f"{directory}: нет файлов *.json")
+    h = hashlib.sha256()
+    for path, raw in sources.items():
+        h.update(os.path.relpath(path, directory).encode())
+        h.update(raw)
+    for code in sorted(CATALOGS):
+        cat = CATALOGS[code]
+        h.update(f"{code}\0{cat['verdict_right']}\0{cat['verdict_wrong']}\0{cat['answer_is']}".encode())
+    return h.hexdigest()[:12], sources
+
+
+def _cache_path(directory: str, version: str) -> str:
+    return os.path.join(directory, ".cache", f"{version}.v{CACHE_FORMAT}.pickle")
+
+
+def _load_cached(directory: str, version: str) -> Optional[TaskBank]:
+    try:
+        with open(_cache_path(directory, version), "rb") as f:
+            bank = pickle.load(f)
+    except Exception:
+        # битый файл или классы другой версии (AttributeError, TypeError,
+        # ImportError, …) — собираем из JSON заново
+        return None
+    return bank if isinstance(bank, TaskBank) and bank.version == version else None
+
+
+def load_bank(directory: str = BANK_DIR, use_cache: bool = True) -> TaskBank:
+    version, sources = _read_sources(directory)
+    cache = _cache_path(directory, version)
+    if use_cache:
+        bank = _load_cached(directory, version)
+        if bank is not None:
+            return bank
+
+    levels: Dict[str, List[dict]] = {}
+    samples: Dict[str, int] = {}
+    overlays: List[Tuple[str, str, dict]] = []
+    for path, raw in sources.items():
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            raise BankError(f"{path}: {e}") from None
+        lang = os.path.basename(os.path.dirname(os.path.relpath(path, directory)))
+        if lang:
+            overlays.append((path, lang, data))
+            continue
+        level, tasks = validate_level(path, data)
+        if level in levels:
+            raise BankError(f"{path}: уровень {level} уже описан в другом файле")
+        levels[level] = tasks
+        samples[level] = data.get("sample", 0)
+    translations: Dict[str, Dict[str, List[dict]]] = {}
+    for path, lang, data in overlays:
+        if lang == BASE_LOCALE:
+            raise BankError(f"{path}: {BASE_LOCALE} — язык исходных файлов")
+        if lang not in TEXTS:
+            log.warning("%s: no UI catalog for %s, translation skipped", path, lang)
+            continue
+        level, tasks = validate_translation(path, data, levels)
+        if level in translations.setdefault(lang, {}):
+            raise BankError(f"{path}: перевод уровня {level} уже есть")
+        translations[lang][level] = tasks
+    bank = TaskBank(levels, version=version, samples=samples, translations=translations)
+
+    if use_cache:
+        try:
+            os.makedirs(os.path.dirname(cache), exist_ok=True)
+            tmp = cache + f".{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(bank, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache)
+        except OSError as e:
+            log.warning("bank cache not written: %s", e)
+    return bank
+
+
+# ---------- Версии и горячая перезагрузка ----------
+class BankRegistry:
+    """Текущий банк + недавние версии: начатый тест доигрывается на той
+    версии, с которой стартовал (UserState.bank)."""
+
+    def __init__(self, directory: str = BANK_DIR, keep: int = 8):
+        self.directory = directory
+        self.keep = keep
+        self.current: TaskBank = load_bank(directory)
+        self.versions: Dict[str, TaskBank] = {self.current.version: self.current}
+
+    def get(self, version: str) -> TaskBank:
+        bank = self.versions.get(version)
+        if bank is None and version:
+            # после рестарта старая версия ещё лежит в кэше на диске
+            bank = _load_cached(self.directory, version)
+            if bank is not None:
+                self.versions[version] = bank
+        return bank or self.current
+
+    def _install(self, bank: TaskBank) -> bool:
+        if bank.version == self.current.version:
+            return False
+        self.versions[bank.version] = bank
+        while len(self.versions) > self.keep:
+            self.versions.pop(next(iter(self.versions)))
+        self.current = bank  # одно присваивание — атомарная подмена
+        log.info("task bank reloaded: version %s", bank.version)
+        return True
+
+    async def reload(self) -> bool:
+        try:
+            bank = await asyncio.to_thread(load_bank, self.directory)
+        except BankError as e:
+            log.error("task bank reload rejected: %s", e)
+            return False
+        except OSError as e:
+            # файл исчез посреди замены, нет прав и т.п. — остаёмся на прежнем банке;
+            # дописанный файл сменит mtime, и BANK_WATCH попробует снова
+            log.error("task bank reload failed, keeping %s: %s", self.current.version, e)
+            return False
+        return self._install(bank)
+
+    async def watch(self, interval: float) -> None:
+        """Опрос файлов: дешевле inotify-зависимости и работает на любом диске."""
+        def stamp():
+            return tuple((p, os.stat(p).st_mtime_ns)
+                         for pattern in ("*.json", os.path.join("*", "*.json"))
+                         for p in sorted(glob.glob(os.path.join(self.directory, pattern))))
+        last = stamp()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                now = stamp()
+            except OSError:
+                continue
+            if now != last:
+                last = now
+                await self.reload()
+
+
+BANKS = BankRegistry()
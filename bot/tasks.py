@@ -1,93 +0,0 @@
-# Уровень А — мини-тест (10 заданий)
-TASKS_A = [
-    {
-        "id": "A1",
-        "text": "«Исследование: зонты и лужи часто встречаются вместе. Зонты вызывают лужи». Что это?",
-        "options": ["Причина", "Следствие", "Корреляция"],
-        "answer": "Корреляция",
-        "xp": 10,
-        "badge": None,
-        "explain": "Совпадение по времени не доказывает причинность."
-    },
-    {
-        "id": "A2",
-        "text": "«Этот эксперт популярен и уважаем. Его мнение истинно». Что это?",
-        "options": ["Факт", "Аргумент", "Апелляция к авторитету"],
-        "answer": "Апелляция к авторитету",
-        "xp": 10,
-        "badge": None,
-        "explain": "Популярность или звание не заменяют доказательства."
-    },
-    {
-        "id": "A3",
-        "text": "«Ты критикуешь мою статью, потому что завидуешь». Что это?",
-        "options": ["Переход на личности", "Контраргумент", "Факт"],
-        "answer": "Переход на личности",
-        "xp": 10,
-        "badge": None,
-        "explain": "Атака на человека, а не на доводы."
-    },
-    {
-        "id": "A4",
-        "text": "«Если разрешим скейтборды во дворе — завтра начнутся гонки и аварии». Что это?",
-        "options": ["Скользкая дорожка", "Фальшивая дилемма", "Факт"],
-        "answer": "Скользкая дорожка",
-        "xp": 10,
-        "badge": None,
-        "explain": "Неподтверждённая цепочка всё хуже и хуже исходов."
-    },
-    {
-        "id": "A5",
-        "text": "«Либо ты за нас, либо против нас». Что это?",
-        "options": ["Фальшивая дилемма", "Корреляция", "Факт"],
-        "answer": "Фальшивая дилемма",
-        "xp": 10,
-        "badge": None,
-        "explain": "Игнорируются другие варианты."
-    },
-    {
-        "id": "A6",
-        "text": "«Мой дядя курил и прожил 95 лет. Значит, курение не вредно»",
-        "options": ["Ане́кдот вместо данных", "Научный факт", "Логическая ошибка"],
-        "answer": "Ане́кдот вместо данных",
-        "xp": 10,
-        "badge": None,
-        "explain": "Один случай не опровергает статистику."
-    },
-    {
-        "id": "A7",
-        "text": "«После новой диеты я стал спать лучше — значит, диета улучшает сон»",
-        "options": ["Post hoc (после — значит из-за)", "Корреляция", "Факт"],
-        "answer": "Post hoc (после — значит из-за)",
-        "xp": 10,
-        "badge": None,
-        "explain": "Последовательность не равна причинности."
-    },
-    {
-        "id": "A8",
-        "text": "«Мы нашли успешные стартапы — их стратегия идеальна!»",
-        "options": ["Выживший набор (survivorship bias)", "Причина", "Факт"],
-        "answer": "Выживший набор (survivorship bias)",
-        "xp": 10,
-        "badge": None,
-        "explain": "Игнорируются провалившиеся случаи."
-    },
-    {
-        "id": "A9",
-        "text": "«В нашем городе меньше камер — поэтому преступности больше»",
-        "options": ["Обратная причинность", "Апелляция к большинству", "Факт"],
-        "answer": "Обратная причинность",
-        "xp": 10,
-        "badge": None,
-        "explain": "Возможно, камеры ставят там, где уже больше преступности."
-    },
-    {
-        "id": "A10",
-        "text": "«Команда выигрывает. Каждый игрок — чемпион»",
-        "options": ["Ошибка композиции", "Логический факт", "Аргумент"],
-        "answer": "Ошибка композиции",
-        "xp": 10,
-        "badge": None,
-        "explain": "Свойство целого не переносится автоматически на части."
-    },
-]
@@ -1,93 +0,0 @@
-# Уровень B — альтернативный набор (10 заданий)
-TASKS_B = [
-    {
-        "id": "B1",
-        "text": "Реклама: «Наш напиток №1 по продажам, значит он полезный». Что это?",
-        "options": ["Факт", "Манипуляция", "Логическая ошибка"],
-        "answer": "Логическая ошибка",
-        "xp": 20,
-        "badge": None,
-        "explain": "Высокие продажи ≠ польза. Это ошибка подмены критерия."
-    },
-    {
-        "id": "B2",
-        "text": "«Учёные доказали, что кофе опасен. Раз все учёные так говорят — сомневаться не стоит». Что это?",
-        "options": ["Факт", "Аргумент к авторитету", "Мнение"],
-        "answer": "Аргумент к авторитету",
-        "xp": 25,
-        "badge": "Контекстный охотник",
-        "explain": "«Все учёные» — обобщение и апелляция к авторитету, а не факт."
-    },
-    {
-        "id": "B3",
-        "text": "«После ввода масок заболеваемость упала. Значит, маски — единственная причина снижения»",
-        "options": ["Post hoc", "Ложная единственная причина", "Корреляция", "Скользкая дорожка"],
-        "answer": "Ложная единственная причина",
-        "xp": 20,
-        "badge": None,
-        "explain": "Могли действовать несколько факторов одновременно."
-    },
-    {
-        "id": "B4",
-        "text": "«Мы увидели 5 положительных отзывов — продукт отличный»",
-        "options": ["Смещение выборки", "Факт", "Аргумент"],
-        "answer": "Смещение выборки",
-        "xp": 20,
-        "badge": None,
-        "explain": "Неизвестно, сколько было отрицательных отзывов и как собирали данные."
-    },
-    {
-        "id": "B5",
-        "text": "«Если запретим пиротехнику — то скоро запретим и праздничные огни, и концерты»",
-        "options": ["Скользкая дорожка", "Фальшивая дилемма", "Факт", "Корреляция"],
-        "answer": "Скользкая дорожка",
-        "xp": 20,
-        "badge": None,
-        "explain": "Навязывается каскад худших сценариев без обоснования."
-    },
-    {
-        "id": "B6",
-        "text": "«Ты не математик, значит твоя критика статистики неверна»",
-        "options": ["Переход на личности", "Красная селёдка", "Факт", "Композиция"],
-        "answer": "Переход на личности",
-        "xp": 20,
-        "badge": None,
-        "explain": "Компетентность обсуждается вместо самих аргументов и данных."
-    },
-    {
-        "id": "B7",
-        "text": "«В отчёте только успешные кейсы — значит, метод всегда работает»",
-        "options": ["Выживший набор", "Факт", "Причина", "Дилемма"],
-        "answer": "Выживший набор",
-        "xp": 20,
-        "badge": None,
-        "explain": "Провалы скрыты, делает вывод необоснованным."
-    },
-    {
-        "id": "B8",
-        "text": "«Если в районе много такси, значит там больше аварий. Такси опаснее личных авто»",
-        "options": ["Обратная причинность", "Корреляция", "Факт", "Ане́кдот"],
-        "answer": "Обратная причинность",
-        "xp": 20,
-        "badge": None,
-        "explain": "Возможно, такси больше, потому что район оживлённый, а аварии из-за трафика."
-    },
-    {
-        "id": "B9",
-        "text": "«Мы доказали гипотезу: мы не нашли опровержений»",
-        "options": ["Перекладывание бремени доказательства", "Факт", "Композиция", "Дихотомия"],
-        "answer": "Перекладывание бремени доказательства",
-        "xp": 25,
-        "badge": "Скептик",
-        "explain": "Нужно показывать подтверждающие данные, а не требовать опровержения."
-    },
-    {
-        "id": "B10",
-        "text": "«Каждый костюм сшит из отличной ткани, значит весь показ — шедевр»",
-        "options": ["Ошибка композиции", "Логический факт", "Фальшивая дилемма", "Post hoc"],
-        "answer": "Ошибка композиции",
-        "xp": 20,
-        "badge": None,
-        "explain": "Свойства частей не гарантируют свойств целого."
-    },
-]
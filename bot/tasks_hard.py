@@ -1,51 +0,0 @@
-# bot/tasks_hard.py
-# Уровень H — продвинутый (12+ заданий)
-
-TASKS_HARD = [
-    {
-        "id": "H1",
-        "text": "В группе из 12 человек трое заболели после встречи. Значит, встреча вызвала вспышку",
-        "options": ["Малый размер выборки", "Факт", "Композиция", "Скользкая дорожка"],
-        "answer": "Малый размер выборки",
-        "xp": 30,
-        "badge": None,
-        "explain": "Вывод по крошечной выборке ненадёжен; нужен контроль и статистика."
-    },
-    {
-        "id": "H2",
-        "text": "Не нашли доказательств вреда → значит это безопасно",
-        "options": ["Перекладывание бремени доказательства", "Факт", "Апелляция к авторитету", "Корреляция"],
-        "answer": "Перекладывание бремени доказательства",
-        "xp": 30,
-        "badge": None,
-        "explain": "Отсутствие доказательств ≠ доказательство отсутствия."
-    },
-    {
-        "id": "H3",
-        "text": "После обучения продажи выросли. Значит, курс точно сработал (и только он)",
-        "options": ["Ложная единственная причина", "Post hoc", "Композиция", "Фальшивая дилемма"],
-        "answer": "Ложная единственная причина",
-        "xp": 30,
-        "badge": None,
-        "explain": "Рост продаж может объясняться множеством факторов."
-    },
-    # ... остальные H4–H11 тут ...
-    {
-        "id": "H12",
-        "text": "Модель идеально описала прошлые данные → точно предскажет будущее",
-        "options": ["Переобучение (overfitting)", "Факт", "Корреляция", "Композиция"],
-        "answer": "Переобучение (overfitting)",
-        "xp": 35,
-        "badge": None,
-        "explain": "Нужно валидировать на отложенной выборке, а не только на обучающей."
-    },
-    {
-        "id": "H13",
-        "text": "Если два события произошли подряд → одно вызвало другое. Что это?",
-        "options": ["Post hoc", "Факт", "Композиция", "Ложная причина"],
-        "answer": "Post hoc",
-        "xp": 30,
-        "badge": None,
-        "explain": "Сама последовательность событий не доказывает причинность."
-    }
-]
@@ -0,0 +1,246 @@
+# bot/tenants.py
+# ==========================================================
+# Боты-арендаторы в одном процессе
+# Один Dispatcher и одна HTTP-сессия (пул соединений, SSL-контекст) на всех;
+# Bot создаётся при первом обращении, getMe — при первом апдейте.
+# Реестр (bot/registry.py) перечитывается раз в REGISTRY_POLL сек: новые боты
+# запускаются, удалённые и выключенные — останавливаются, смена политики
+# применяется на лету; остальные боты этого не замечают.
+# ==========================================================
+
+import zlib
+import asyncio
+import logging
+import contextlib
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramUnauthorizedError
+from aiogram.types import Update
+
+from .registry import DEFAULT_POLICY, BotConfig, BotRegistry
+
+log = logging.getLogger("bot.tenants")
+
+ALLOWED_UPDATES = ["message", "callback_query"]
+POLL_TIMEOUT = 10  # long polling getUpdates, сек
+
+
+def shard_of(bot_id: int, shards: int) -> int:
+    """Воркер бота в polling. Не bot_id % shards: id ботов по остатку
+    неравномерны (два чётных id при двух воркерах — оба на нулевом). Хэш, а не
+    место в списке, — чтобы добавление бота не перекладывало остальных."""
+    return zlib.crc32(bot_id.to_bytes(8, "little")) % shards if shards > 1 else 0
+
+
+class Tenants:
+    """bot_id -> (Bot, Dispatcher) для webhook-приложения и воркеров, плюс
+    polling и webhook-регистрация по составу реестра."""
+
+    def __init__(self, default=None):
+        self.default = default              # DefaultBotProperties для всех ботов
+        self.registry: Optional[BotRegistry] = None
+        self.dp: Optional[Dispatcher] = None
+        self.session: Optional[BaseSession] = None
+        self.shard, self.shards = 0, 1      # polling по воркерам: shard_of(bot_id)
+        self.configs: Dict[int, BotConfig] = {}
+        self.policies: Dict[int, Dict[str, object]] = {}
+        self.tokens: Dict[int, str] = {}    # живой вид для WebApp (подпись initData)
+        self.bots: Dict[int, Bot] = {}
+        self.polling = False
+        self.drop_pending = False
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret = ""
+        # на каждого запущенного бота (рассылки и т.п.): вернуть задачу — её отменят при остановке
+        self.on_attach: List[Callable[[Bot], Optional[asyncio.Task]]] = []
+        # бот удалён или перенастроен: сбросить кэши по bot_id
+        self.on_forget: List[Callable[[int], None]] = []
+        # только удалён (или сменил токен): освободить то, что живёт дольше политики
+        self.on_remove: List[Callable[[int], None]] = []
+        self._tasks: Dict[int, List[asyncio.Task]] = {}
+        self._feeding: Set[asyncio.Task] = set()
+        self._stopped: Optional[asyncio.Event] = None
+
+    # ---------- конфигурация ----------
+    def policy_for(self, bot_id: int) -> Dict[str, object]:
+        return self.policies.get(bot_id, DEFAULT_POLICY)
+
+    def mine(self, cfg: BotConfig) -> bool:
+        return cfg.enabled and shard_of(cfg.id, self.shards) == self.shard
+
+    def put(self, cfg: BotConfig) -> None:
+        """Конфигурация без запуска (бенчи, воркеры fan-out)."""
+        self.configs[cfg.id] = cfg
+        self.policies[cfg.id] = cfg.policy()
+        self.tokens[cfg.id] = cfg.token
+
+    # ---------- Bot по требованию ----------
+    def bot(self, bot_id: int) -> Optional[Bot]:
+        bot = self.bots.get(bot_id)
+        if bot is None:
+            cfg = self.configs.get(bot_id)
+            if cfg is None:
+                return None
+            bot = self.bots[bot_id] = Bot(token=cfg.token, session=self.session, default=self.default)
+        return bot
+
+    def get(self, bot_id: int) -> Optional[Tuple[Bot, Dispatcher]]:
+        bot = self.bot(bot_id)
+        return None if bot is None else (bot, self.dp)
+
+    def __len__(self) -> int:
+        return len(self.configs)
+
+    # ---------- реестр ----------
+    async def open(self, registry: BotRegistry, dp: Optional[Dispatcher], session: BaseSession) -> int:
+        self.registry, self.dp, self.session = registry, dp, session
+        self._stopped = asyncio.Event()
+        await self.reload()
+        return len(self.configs)
+
+    async def reload(self) -> None:
+        bots = await asyncio.to_thread(self.registry.load)
+        await self.apply({i: c for i, c in bots.items() if self.mine(c)})
+
+    async def apply(self, bots: Dict[int, BotConfig]) -> None:
+        for bot_id in [i for i in self.configs if i not in bots]:
+            log.info("bot id=%s removed", bot_id)
+            await self._detach(bot_id, unregister=True)
+            self._drop(bot_id)
+        started = []
+        for bot_id, cfg in bots.items():
+            old = self.configs.get(bot_id)
+            if old == cfg:
+                continue
+            if old is not None and old.token != cfg.token:
+                log.info("bot id=%s: token changed, restarting", bot_id)
+                await self._detach(bot_id)
+                self._drop(bot_id)
+                old = None
+            elif old is not None:
+                log.info("bot id=%s: policy updated", bot_id)
+                for forget in self.on_forget:
+                    forget(bot_id)
+            self.put(cfg)
+            if old is None:
+                started.append(bot_id)
+        # setWebhook/deleteWebhook сотен ботов — параллельно, а не по очереди
+        if started:
+            await asyncio.gather(*(self._attach(i) for i in started))
+            log.info("%d bot(s) started, %d total", len(started), len(self.configs))
+
+    async def watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.registry.changed):
+                    await self.reload()
+            except Exception as e:
+                log.warning("registry reload failed, keeping %d bot(s): %s", len(self.configs), e)
+
+    def _drop(self, bot_id: int) -> None:
+        self.configs.pop(bot_id, None)
+        self.policies.pop(bot_id, None)
+        self.tokens.pop(bot_id, None)
+        self.bots.pop(bot_id, None)
+        for forget in self.on_forget:
+            forget(bot_id)
+        for remove in self.on_remove:
+            remove(bot_id)
+
+    # ---------- запуск и остановка одного бота ----------
+    async def _attach(self, bot_id: int) -> None:
+        if self._stopped.is_set():
+            return  # реестр перечитан уже после SIGTERM
+        bot = self.bot(bot_id)
+        try:
+            if self.webhook_url:
+                await bot.set_webhook(
+                    f"{self.webhook_url.rstrip('/')}/webhook/{bot_id}",
+                    secret_token=self.webhook_secret or None,
+                    allowed_updates=ALLOWED_UPDATES,
+                )
+        except Exception as e:
+            log.error("bot id=%s: setWebhook failed: %s", bot_id, e)
+            return
+        tasks = self._tasks.setdefault(bot_id, [])
+        if self.polling:
+            tasks.append(asyncio.create_task(self._poll(bot), name=f"poll-{bot_id}"))
+        for hook in self.on_attach:
+            task = hook(bot)
+            if task is not None:
+                tasks.append(task)
+
+    async def _detach(self, bot_id: int, unregister: bool = False) -> None:
+        for task in self._tasks.pop(bot_id, ()):
+            task.cancel()
+        bot = self.bots.get(bot_id)
+        if unregister and self.webhook_url and bot is not None:
+            # иначе Telegram будет слать апдейты удалённого бота и получать 404
+            with contextlib.suppress(Exception):
+                await bot.delete_webhook()
+
+    # ---------- polling ----------
+    async def _poll(self, bot: Bot) -> None:
+        # Апдейты, накопившиеся за рестарт, не выбрасываем: повторы отсекут
+        # снимок (LIFECYCLE, HANDLED) и проверка номера вопроса
+        with contextlib.suppress(Exception):
+            await bot.delete_webhook(drop_pending_updates=self.drop_pending)
+        log.info("Polling bot id=%s", bot.id)
+        offset: Optional[int] = None
+        backoff = 1.0
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT,
+                                                allowed_updates=ALLOWED_UPDATES,
+                                                request_timeout=POLL_TIMEOUT + 30)
+            except asyncio.CancelledError:
+                raise
+            except TelegramUnauthorizedError:
+                log.error("bot id=%s: token rejected, polling stopped", bot.id)
+                return
+            except Exception as e:
+                # TelegramConflictError — этот токен опрашивает ещё кто-то
+                log.warning("bot id=%s: getUpdates failed (%s), retry in %.0fs", bot.id, e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(30.0, backoff * 2)
+                continue
+            backoff = 1.0
+            for update in updates:
+                offset = update.update_id + 1
+                self.feed(bot, update)
+
+    def feed(self, bot: Bot, update: Update) -> asyncio.Task:
+        task = asyncio.create_task(self._feed(bot, update))
+        self._feeding.add(task)
+        task.add_done_callback(self._feeding.discard)
+        return task
+
+    async def _feed(self, bot: Bot, update: Update) -> None:
+        try:
+            await self.dp.feed_update(bot, update)
+        except Exception:
+            log.exception("bot id=%s: update %s failed", bot.id, update.update_id)
+
+    async def run(self) -> None:
+        """Ждёт stop(); боты тем временем опрашиваются в своих задачах."""
+        await self._stopped.wait()
+
+    def stop(self) -> None:
+        """Приём закрыт: polling и фоновые задачи ботов отменяются; начатые
+        апдейты дорабатывают (их ждёт LIFECYCLE.drain)."""
+        for bot_id in list(self._tasks):
+            for task in self._tasks.pop(bot_id):
+                task.cancel()
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def close(self) -> None:
+        self.stop()
+        if self.session is not None:
+            await self.session.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"configured": len(self.configs), "instantiated": len(self.bots),
+                "running": len(self._tasks)}
@@ -0,0 +1,197 @@
+# bot/throttle.py
+# ==========================================================
+# Входящий троттлинг: апдейты одного пользователя (bot_id, user_id)
+# Скользящее окно — два соседних фиксированных окна со взвешиванием:
+# prev * (доля окна впереди) + cur. Счётчики пользователя, номер окна и момент
+# последнего перезапуска теста упакованы в одно int. Записи живут в двух
+# поколениях: за окно без апдейтов запись уходит в старое, ещё за одно —
+# выбрасывается целиком; ни таймеров, ни обходов по пользователям.
+# Превысил лимит — штрафная коробка на THROTTLE_PENALTY сек: все апдейты
+# отбрасываются до хендлеров и исходящих вызовов. Повторный /start, «Пройти
+# ещё раз» (отдельно — повторный /review, повторный выбор уровня) чаще раза
+# в THROTTLE_COLLAPSE сек схлопываются: тест уже начат, второй раз его не шлём.
+# Схлопнутый тап кнопки и тап, отправивший в коробку, получают
+# answerCallbackQuery — иначе у клиента крутится индикатор загрузки; тапы из
+# коробки — нет: ответ ушёл бы вне очереди (PRIO_CALLBACK) на каждый тап флуда.
+# ==========================================================
+
+import time
+import logging
+from typing import Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message
+
+log = logging.getLogger("bot.throttle")
+
+# Упаковка записи: счётчики по 16 бит, номер окна — 32, вид перезапуска — 2,
+# его момент — в мс часов
+_COUNT = 0xFFFF
+_PREV_SHIFT = 16
+_WIN_SHIFT = 32
+_KIND_SHIFT = 64
+_STAMP_SHIFT = 66
+_WIN_MASK = 0xFFFFFFFF
+
+# Виды перезапуска: после них бот заново шлёт интро и первый вопрос.
+# Выбор уровня — свой вид: «/start → Сменить уровень → уровень» не схлопывается
+QUIZ, REVIEW, LEVEL = 1, 2, 3
+RESTART_COMMANDS = {"/start": QUIZ, "/review": REVIEW}
+RESTART_CALLBACKS = {"again": QUIZ, "review": REVIEW}
+RESTART_PREFIXES = ("setlvl:",)  # -> LEVEL
+
+
+def restart_of(event) -> int:
+    """Вид перезапуска (start_quiz — QUIZ или LEVEL, start_review — REVIEW), 0 — не перезапуск."""
+    if isinstance(event, Message):
+        text = event.text
+        return RESTART_COMMANDS.get(text.split(maxsplit=1)[0].split("@", 1)[0], 0) if text else 0
+    if isinstance(event, CallbackQuery):
+        data = event.data or ""
+        return RESTART_CALLBACKS.get(data) or (LEVEL if data.startswith(RESTART_PREFIXES) else 0)
+    return 0
+
+
+class Throttle:
+    """Лимит limit апдейтов за скользящее окно window сек на пользователя.
+
+    check() — True, если апдейт пропускать. Причина отказа — в last:
+    "boxed" (лимит превышен этим апдейтом), "limited" (пользователь в коробке)
+    или "collapsed" (повторный перезапуск)."""
+
+    __slots__ = ("window", "limit", "collapse", "penalty", "_clock", "_win", "young", "old",
+                 "boxed", "last", "passed", "collapsed", "limited", "penalties")
+
+    def __init__(self, window: float = 10.0, limit: int = 30, collapse: float = 3.0,
+                 penalty: float = 60.0, clock: Optional[Callable[[], float]] = None):
+        self.window = window
+        self.limit = min(limit, _COUNT)
+        self.collapse = min(collapse, window)  # отметка перезапуска живёт не дольше записи
+        self.penalty = penalty
+        self._clock = clock or time.monotonic
+        self._win = 0
+        self.young: Dict[int, int] = {}  # ключ -> упакованная запись, окно сейчас
+        self.old: Dict[int, int] = {}    # …и прошлое окно
+        self.boxed: Dict[int, float] = {}  # ключ -> до какого момента в коробке
+        self.last = ""
+        self.passed = 0
+        self.collapsed = 0
+        self.limited = 0
+        self.penalties = 0
+
+    def __len__(self) -> int:
+        return len(self.young) + len(self.old)
+
+    def _rotate(self, win: int, now: float) -> None:
+        self.old = self.young if win == self._win + 1 else {}
+        self.young = {}
+        self._win = win
+        if self.boxed:
+            self.boxed = {k: t for k, t in self.boxed.items() if t > now}
+
+    def check(self, bot_id: int, user_id: int, restart: int = 0) -> bool:
+        now = self._clock()
+        key = bot_id << 64 | user_id
+        boxed = self.boxed.get(key)
+        if boxed is not None:
+            if now < boxed:
+                self.limited += 1
+                self.last = "limited"
+                return False
+            del self.boxed[key]
+
+        win = int(now // self.window)
+        if win != self._win:
+            self._rotate(win, now)
+        young = self.young
+        rec = young.get(key)
+        if rec is None:
+            rec = self.old.pop(key, 0)
+        w = rec >> _WIN_SHIFT & _WIN_MASK
+        cur = rec & _COUNT
+        if w == win & _WIN_MASK:
+            prev = rec >> _PREV_SHIFT & _COUNT
+        elif w == (win - 1) & _WIN_MASK:
+            prev, cur = cur, 0
+        else:
+            prev = cur = 0
+        kind = rec >> _KIND_SHIFT & 3
+        stamp = rec >> _STAMP_SHIFT
+        ms = int(now * 1000)
+
+        # доля прошлого окна, ещё попадающая в скользящее окно
+        weight = 1.0 - (now - win * self.window) / self.window
+        if prev * weight + cur >= self.limit:
+            self.boxed[key] = now + self.penalty
+            young.pop(key, None)
+            self.penalties += 1
+            self.limited += 1
+            self.last = "boxed"
+            log.info("throttle: %s/%s boxed for %.0f s", bot_id, user_id, self.penalty)
+            return False
+        cur += cur < _COUNT
+        ok = True
+        if restart:
+            if kind == restart and ms - stamp < self.collapse * 1000:
+                ok = False
+            else:
+                kind, stamp = restart, ms
+        young[key] = (stamp << _STAMP_SHIFT | kind << _KIND_SHIFT
+                      | (win & _WIN_MASK) << _WIN_SHIFT | prev << _PREV_SHIFT | cur)
+        if ok:
+            self.passed += 1
+            self.last = ""
+        else:
+            self.collapsed += 1
+            self.last = "collapsed"
+        return ok
+
+    def release(self, bot_id: int, user_id: int) -> bool:
+        """Досрочно выпустить из коробки (ручной разбор жалобы)."""
+        return self.boxed.pop(bot_id << 64 | user_id, None) is not None
+
+    def clear(self) -> None:
+        self.young.clear()
+        self.old.clear()
+        self.boxed.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"passed": self.passed, "collapsed": self.collapsed, "limited": self.limited,
+                "penalties": self.penalties}
+
+    def sizes(self) -> Dict[str, int]:
+        return {"tracked": len(self), "boxed": len(self.boxed)}
+
+
+class ThrottleMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update, до ChatSerialMiddleware: лишние апдейты не
+    встают в очередь чата и не доходят до хендлеров; схлопнутый тап кнопки
+    только гасит индикатор загрузки. При попадании в коробку (только в этот
+    момент) — одно сообщение на языке пользователя."""
+
+    def __init__(self, throttle: Throttle, notice: bool = True):
+        self.throttle = throttle
+        self.notice = notice
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")  # ставит встроенный UserContextMiddleware
+        if user is None:
+            return await handler(event, data)
+        th = self.throttle
+        bot = data["bot"]
+        inner = event.message or event.callback_query
+        if th.check(bot.id, user.id, restart_of(inner) if inner is not None else 0):
+            return await handler(event, data)
+        if event.callback_query is not None and th.last != "limited":
+            try:
+                await event.callback_query.answer()
+            except Exception as e:
+                log.warning("throttle: answerCallbackQuery failed: %s", e)
+        chat = data.get("event_chat")
+        tr = data.get("tr")
+        if self.notice and th.last == "boxed" and chat is not None and tr is not None:
+            try:
+                await bot.send_message(chat.id, tr.throttled(seconds=f"{th.penalty:.0f}"))
+            except Exception as e:
+                log.warning("throttle notice to %s failed: %s", chat.id, e)
+        return None
@@ -0,0 +1,181 @@
+# bot/webapp.py
+# ==========================================================
+# Telegram WebApp (Mini App): тест по HTTP на том же движке и STATE, что чат
+# GET  /webapp                   — страница (webapp/index.html)
+# POST /webapp/{bot_id}/start    — новый тест, вопросы пачкой
+# POST /webapp/{bot_id}/answers  — ответы пачкой: вердикты, следующие вопросы, итог
+# Пользователь — из подписанного initData; сессия общая с чатом (chat_id = user_id).
+# Язык — language_code из initData: задания, вердикты и итог из того же каталога,
+# что в чате; строки самой страницы приходят в ответе start (texts).
+# engine — модуль bot.bot (передаётся явно: при `python -m bot.bot` это __main__).
+# ==========================================================
+
+import os
+import hmac
+import json
+import time
+import hashlib
+import logging
+from types import ModuleType
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from .adaptive import ADAPTIVE
+from .i18n import CATALOGS, TEXTS, resolve
+from .review import REVIEW
+from .state import UserState
+from .taskbank import Question
+
+log = logging.getLogger("bot.webapp")
+
+INDEX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "webapp", "index.html")
+MAX_AGE = int(os.environ.get("WEBAPP_MAX_AGE", "86400"))  # срок жизни initData, сек
+
+
+# строки страницы на язык: шаблоны с {pos}/{total}/{score}/{error} подставляет JS
+PAGE_TEXTS: Dict[str, Dict[str, str]] = {
+    code: {"question": cat["webapp_question"], "score": cat["webapp_score"],
+           "again": cat["again_button"], "failed": cat["webapp_failed"]}
+    for code, cat in CATALOGS.items()
+}
+
+
+class WebAppAuthError(ValueError):
+    pass
+
+
+def check_init_data(init_data: str, token: str, max_age: int = MAX_AGE,
+                    now: Optional[float] = None) -> Dict:
+    """Проверка подписи initData по алгоритму Telegram; возвращает user."""
+    fields = dict(parse_qsl(init_data, keep_blank_values=True))
+    got = fields.pop("hash", "")
+    if not got:
+        raise WebAppAuthError("нет hash")
+    check = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    want = hmac.new(secret, check.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(got, want):
+        raise WebAppAuthError("неверная подпись")
+    auth_date = int(fields.get("auth_date", "0") or 0)
+    if max_age and (now or time.time()) - auth_date > max_age:
+        raise WebAppAuthError("initData устарели")
+    try:
+        user = json.loads(fields["user"])
+        int(user["id"])
+    except (KeyError, TypeError, ValueError):
+        raise WebAppAuthError("нет user") from None
+    return user
+
+
+class StartBody(BaseModel):
+    initData: str
+    level: Optional[str] = None
+
+
+class Answer(BaseModel):
+    pos: int
+    option: int  # номер варианта в том порядке, в каком он показан
+
+
+class AnswersBody(BaseModel):
+    initData: str
+    answers: List[Answer]
+
+
+def _question_json(pos: int, total: int, q: Question) -> Dict:
+    task = q.task
+    return {"pos": pos, "total": total, "text": task.text,
+            "options": [task.options[j] for j in q.order]}
+
+
+def questions_batch(engine: ModuleType, st: UserState) -> List[Dict]:
+    """Оставшиеся вопросы теста (на языке st.lang). Адаптивный — только
+    текущий: следующий зависит от ответа."""
+    if st.idx > st.total:
+        return []
+    if st.level == ADAPTIVE:
+        return [_question_json(st.idx, st.total, engine.current_question(st))]
+    if st.level == REVIEW:
+        return [_question_json(p, st.total, engine.review_question(st, p))
+                for p in range(st.idx, st.total + 1)]
+    level = engine.get_tasks_by_level(st.level, st.bank)
+    first = st.stream_pos()
+    return [_question_json(p, st.total, level.draw(st.seed, first + p - st.idx, st.lang))
+            for p in range(st.idx, st.total + 1)]
+
+
+def mount_webapp(app: FastAPI, engine: ModuleType, tokens: Dict[int, str]) -> FastAPI:
+    """tokens: bot_id -> токен (им подписан initData этого бота)."""
+
+    def user_of(bot_id: int, init_data: str) -> Dict:
+        token = tokens.get(bot_id)
+        if token is None:
+            raise HTTPException(status_code=404)
+        try:
+            return check_init_data(init_data, token)
+        except WebAppAuthError as e:
+            raise HTTPException(status_code=401, detail=str(e))
+
+    @app.get("/webapp")
+    async def index():
+        return FileResponse(INDEX, media_type="text/html")
+
+    @app.post("/webapp/{bot_id}/start")
+    async def start(bot_id: int, body: StartBody):
+        user = user_of(bot_id, body.initData)
+        uid = int(user["id"])
+        tr = TEXTS[resolve(user.get("language_code"))]
+        policy = engine.policy_for(bot_id)
+        key = (bot_id, uid)
+        await engine.CHAT_LOCKS.acquire(key)  # тот же замок, что у апдейтов этого чата
+        try:
+            st = engine.STATE.get(bot_id, uid)
+            st.lang = tr.code
+            if body.level and body.level in policy.get("allowed", set(engine.ALL_LEVELS)):
+                st.reset(level=body.level)
+            engine.begin_quiz(st, policy)
+            engine.STATE.mark_dirty(bot_id, uid)
+            return {"level": st.level, "total": st.total, "questions": questions_batch(engine, st),
+                    "texts": PAGE_TEXTS[tr.code]}
+        finally:
+            engine.CHAT_LOCKS.release(key)
+
+    @app.post("/webapp/{bot_id}/answers")
+    async def answers(bot_id: int, body: AnswersBody):
+        user = user_of(bot_id, body.initData)
+        uid = int(user["id"])
+        name = " ".join(filter(None, (user.get("first_name"), user.get("last_name"))))
+        tr = TEXTS[resolve(user.get("language_code"))]
+        key = (bot_id, uid)
+        await engine.CHAT_LOCKS.acquire(key)
+        try:
+            st = engine.STATE.get(bot_id, uid)
+            st.lang = tr.code
+            results, summary = [], None
+            for a in body.answers:
+                if st.idx > st.total or a.pos != st.idx:
+                    continue  # повтор или чужая позиция — как устаревший тап в чате
+                q = engine.current_question(st)
+                right = engine.grade(st, q, a.option, bot_id, uid)
+                results.append({"pos": a.pos, "right": right,
+                                "verdict": engine.render_verdict(right, q.task)})
+                if st.idx < st.total:
+                    engine.next_question(st)
+                else:
+                    summary = engine.finish_quiz(st, bot_id, uid, name, tr)
+            engine.STATE.mark_dirty(bot_id, uid)
+            return {"results": results, "score": st.score, "questions": questions_batch(engine, st),
+                    "summary": summary}
+        finally:
+            engine.CHAT_LOCKS.release(key)
+
+    return app
+
+
+def build_webapp(engine: ModuleType, tokens: Dict[int, str]) -> FastAPI:
+    """Отдельное приложение для polling-режима (WEBAPP_PORT)."""
+    return mount_webapp(FastAPI(docs_url=None, redoc_url=None, openapi_url=None), engine, tokens)
@@ -0,0 +1,94 @@
+# bot/webhook.py
+# ==========================================================
+# Webhook-приём: одно ASGI-приложение на все боты
+# POST /webhook/{bot_id} -> нужный Dispatcher.feed_update
+# ==========================================================
+
+import hmac
+import logging
+from typing import Callable, Container, Dict, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from .metrics import REGISTRY
+
+log = logging.getLogger("bot.webhook")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def _check_secret(request: Request, secret: str) -> None:
+    if secret:
+        got = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(got, secret):
+            raise HTTPException(status_code=401)
+
+
+def chat_of(raw: dict) -> int:
+    """chat_id апдейта без полной валидации (для шардинга по чатам)."""
+    for kind in ("message", "edited_message", "callback_query"):
+        obj = raw.get(kind)
+        if obj is None:
+            continue
+        msg = obj.get("message") if kind == "callback_query" else obj
+        if msg and "chat" in msg:
+            return int(msg["chat"]["id"])
+        return int(obj.get("from", {}).get("id", 0))
+    return 0
+
+
+def build_app(routes: Dict[int, Tuple[Bot, Dispatcher]], secret: str = "") -> FastAPI:
+    """routes — dict или Tenants (нужны get(bot_id) и len): состав ботов
+    может меняться на ходу."""
+    app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+    app.state.routes = routes
+
+    @app.post("/webhook/{bot_id}")
+    async def webhook(bot_id: int, request: Request):
+        _check_secret(request, secret)
+        route = routes.get(bot_id)
+        if route is None:
+            raise HTTPException(status_code=404)
+        bot, dp = route
+        update = Update.model_validate(await request.json(), context={"bot": bot})
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            # Отдаём 200, иначе Telegram будет повторять апдейт бесконечно
+            log.exception("update %s failed", update.update_id)
+        return {"ok": True}
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"ok": True, "bots": len(routes)}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return REGISTRY.render()
+
+    return app
+
+
+def build_fanout_app(known: Container[int], submit: Callable[[int, dict], None],
+                     secret: str = "", health: Optional[Callable[[], dict]] = None) -> FastAPI:
+    """Фронт для нескольких воркеров: апдейт не разбирается, а отдаётся
+    submit(bot_id, raw) — тот раскладывает по воркерам по chat_id.
+    known — живой набор bot_id (TENANTS.configs фронта)."""
+    app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
+
+    @app.post("/webhook/{bot_id}")
+    async def webhook(bot_id: int, request: Request):
+        _check_secret(request, secret)
+        if bot_id not in known:
+            raise HTTPException(status_code=404)
+        submit(bot_id, await request.json())
+        return {"ok": True}
+
+    @app.get("/healthz")
+    async def healthz():
+        return health() if health else {"ok": True}
+
+    return app